@@ -1,16 +1,63 @@
-from fastapi import Depends, HTTPException, status, Request
+import secrets
+import time
+from typing import Optional
+from uuid import UUID
+from fastapi import Depends, Header, HTTPException, status, Request
 from jose import jwt, JWTError
-from sqlmodel import Session
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import make_transient_to_detached
+from sqlmodel import Session, select
+from app.core.cache import TTLCache, register_cache
 from app.core.config import settings
 from app.core.db import get_session
-from app.models.base import User, UserRole
+from app.models.base import User, UserRole, PatientProfile, DoctorProfile
 from pydantic import BaseModel
 
+# Resolved users by subject id. Entries are detached column snapshots, merged into the
+# request session without a SELECT; writes to a user or their profile invalidate them.
+user_cache = register_cache(TTLCache("users", settings.USER_CACHE_MAXSIZE, settings.USER_CACHE_TTL_SECONDS))
+# Decoded claims by raw token string, so repeat requests skip the signature check.
+token_claims_cache = register_cache(TTLCache("token_claims", settings.TOKEN_CACHE_MAXSIZE, settings.TOKEN_CACHE_TTL_SECONDS))
+# User.token_version by subject id; bounds how long a revoked token keeps working on other workers.
+token_version_cache = register_cache(TTLCache("token_versions", settings.USER_CACHE_MAXSIZE, settings.TOKEN_VERSION_CACHE_SECONDS))
+
 class TokenPayload(BaseModel):
-    sub: str = None
-    role: str = None
+    sub: UUID
+    role: UserRole
+    ver: int = 0  # User.token_version at issue time; bumping the column revokes older tokens
+    exp: int
+
+    @property
+    def id(self) -> UUID:
+        return self.sub
+
+def _decode_token(token: str) -> TokenPayload:
+    claims = token_claims_cache.get(token)
+    if claims is not None and claims.exp > time.time():
+        return claims
+    try:
+        payload = jwt.decode(token, settings.JWT_SECRET, algorithms=[settings.JWT_ALGORITHM])
+        claims = TokenPayload(**payload)
+    except (JWTError, Exception):
+        raise HTTPException(status_code=401, detail="Invalid token")
+    token_claims_cache.set(token, claims, ttl_seconds=min(settings.TOKEN_CACHE_TTL_SECONDS, claims.exp - time.time()))
+    return claims
+
+def _current_token_version(session: Session, user_id: UUID) -> Optional[int]:
+    key = str(user_id)
+    version = token_version_cache.get(key)
+    if version is None:
+        version = session.exec(select(User.token_version).where(User.id == user_id)).first()
+        if version is not None:
+            token_version_cache.set(key, version)
+    return version
 
-def get_current_user(request: Request, session: Session = Depends(get_session)):
+def get_current_claims(request: Request, session: Session = Depends(get_session)) -> Optional[TokenPayload]:
+    """
+    Verified token claims (subject id and role) without loading the User row.
+    Use this for handlers that only need current_user.id / .role; the only DB access
+    is the token_version check, cached for TOKEN_VERSION_CACHE_SECONDS.
+    """
     # Allow preflight requests without auth
     if request.method == "OPTIONS":
         return None
@@ -19,22 +66,62 @@ def get_current_user(request: Request, session: Session = Depends(get_session)):
     if not auth:
         raise HTTPException(status_code=401, detail="Not authenticated")
 
-    token = auth.replace("Bearer ", "")
-    
-    try:
-        payload = jwt.decode(token, settings.JWT_SECRET, algorithms=[settings.JWT_ALGORITHM])
-        token_data = TokenPayload(**payload)
-    except (JWTError, Exception):
-        raise HTTPException(status_code=401, detail="Invalid token")
-    
-    user = session.get(User, token_data.sub)
+    claims = _decode_token(auth.replace("Bearer ", ""))
+    version = _current_token_version(session, claims.sub)
+    if version is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    if claims.ver != version:
+        raise HTTPException(status_code=401, detail="Token has been revoked")
+    return claims
+
+def get_current_user(claims: Optional[TokenPayload] = Depends(get_current_claims), session: Session = Depends(get_session)):
+    """The full User row, for handlers that need more than the token claims."""
+    if claims is None:
+        return None
+
+    key = str(claims.sub)
+    cached = user_cache.get(key)
+    if cached is not None:
+        return session.merge(cached, load=False)
+
+    user = session.get(User, claims.sub)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    
+    user_cache.set(key, _detached_copy(user))
     return user
 
+def _detached_copy(user: User) -> User:
+    snapshot = User(**{attr.key: getattr(user, attr.key) for attr in inspect(User).column_attrs})
+    make_transient_to_detached(snapshot)
+    return snapshot
+
+def invalidate_user(user_id):
+    """Drops a cached user; call after changing a user's role, token_version or profile outside an ORM flush."""
+    user_cache.invalidate(str(user_id))
+    token_version_cache.invalidate(str(user_id))
+
+@event.listens_for(Session, "after_flush")
+def _collect_user_writes(session, flush_context):
+    for obj in (*session.dirty, *session.deleted):
+        if isinstance(obj, User):
+            session.info.setdefault("user_cache_stale", set()).add(obj.id)
+        elif isinstance(obj, (PatientProfile, DoctorProfile)):
+            session.info.setdefault("user_cache_stale", set()).add(obj.user_id)
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_written_users(session):
+    for user_id in session.info.pop("user_cache_stale", ()):
+        invalidate_user(user_id)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_user_writes(session):
+    session.info.pop("user_cache_stale", None)
+
 def RoleChecker(allowed_roles: list[UserRole]):
-    def _role_checker(user: User = Depends(get_current_user)):
+    """Authorizes from the signed role claim; returns the claims, not the User row."""
+    def _role_checker(user: TokenPayload = Depends(get_current_claims)):
+        if user is None:
+            return None
         if user.role not in allowed_roles:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
@@ -42,3 +129,9 @@ def RoleChecker(allowed_roles: list[UserRole]):
             )
         return user
     return _role_checker
+
+def require_internal_token(x_internal_token: Optional[str] = Header(None)):
+    """Guards operational endpoints: X-Internal-Token must match INTERNAL_API_TOKEN."""
+    expected = settings.INTERNAL_API_TOKEN
+    if not expected or not x_internal_token or not secrets.compare_digest(x_internal_token, expected):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Internal endpoints require a valid X-Internal-Token")
@@ -0,0 +1,95 @@
+import base64
+import json
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+from uuid import UUID
+
+from fastapi import HTTPException, Query, Response
+from sqlalchemy import and_, or_
+
+from app.core.config import settings
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+# (column, descending) pairs, most significant first; the last one must be unique (usually the PK).
+SortKeys = Sequence[Tuple[Any, bool]]
+
+
+@dataclass
+class PageParams:
+    limit: int
+    cursor: Optional[str]
+
+
+def page_params(
+    limit: Optional[int] = Query(None, ge=1, description="Page size, capped at PAGE_SIZE_MAX"),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from the previous page's X-Next-Cursor header"),
+) -> PageParams:
+    return PageParams(limit=min(limit or settings.PAGE_SIZE_DEFAULT, settings.PAGE_SIZE_MAX), cursor=cursor)
+
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"d": value.isoformat()}
+    if isinstance(value, UUID):
+        return {"u": value.hex}
+    if hasattr(value, "value"):  # str-valued Enums
+        return value.value
+    return value
+
+
+def _decode_value(value: Any) -> Any:
+    if isinstance(value, dict):
+        if "d" in value:
+            return datetime.fromisoformat(value["d"])
+        if "u" in value:
+            return UUID(value["u"])
+        raise ValueError("unknown cursor value")
+    return value
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    raw = json.dumps([_encode_value(v) for v in values], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> List[Any]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = [_decode_value(v) for v in json.loads(raw)]
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if len(values) != size:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values
+
+
+def _after(keys: SortKeys, values: Sequence[Any]):
+    # (k1, k2, ...) strictly after the cursor row, honouring each key's direction.
+    # Expanded into OR-ed prefixes because row-value comparison can't mix ASC and DESC.
+    clauses = []
+    for i, (column, descending) in enumerate(keys):
+        prefix = [keys[j][0] == values[j] for j in range(i)]
+        clauses.append(and_(*prefix, column < values[i] if descending else column > values[i]))
+    return or_(*clauses)
+
+
+def paginate(statement, keys: SortKeys, page: PageParams):
+    """Adds the keyset predicate, ORDER BY and LIMIT (one extra row to detect a next page)."""
+    if page.cursor:
+        statement = statement.where(_after(keys, decode_cursor(page.cursor, len(keys))))
+    return (
+        statement
+        .order_by(*[column.desc() if descending else column.asc() for column, descending in keys])
+        .limit(page.limit + 1)
+    )
+
+
+def finish_page(rows: Sequence[Any], row_key: Callable[[Any], Sequence[Any]], page: PageParams, response: Response) -> List[Any]:
+    """Trims the look-ahead row and, if there was one, sets the X-Next-Cursor header."""
+    rows = list(rows)
+    if len(rows) > page.limit:
+        rows = rows[:page.limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(row_key(rows[-1]))
+    return rows
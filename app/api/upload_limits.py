@@ -0,0 +1,65 @@
+from starlette.exceptions import HTTPException
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+
+# Multipart boundaries and part headers on top of the audio bytes themselves
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+
+def _too_large_detail() -> str:
+    return f"Audio exceeds the {settings.MAX_UPLOAD_BYTES} byte upload limit"
+
+
+class UploadSizeLimitMiddleware:
+    """
+    Answers 413 for audio uploads over MAX_UPLOAD_BYTES (plus multipart overhead):
+    straight away when the Content-Length says so, otherwise (chunked uploads, or a
+    Content-Length that undercounts) as soon as that many body bytes have been received,
+    so the rest is never spooled.
+    Plain ASGI so other requests don't pay for BaseHTTPMiddleware.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["method"] != "POST" or not scope["path"].endswith("/upload"):
+            await self.app(scope, receive, send)
+            return
+
+        limit = settings.MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD_BYTES
+        for name, value in scope["headers"]:
+            if name == b"content-length":
+                if value.isdigit() and int(value) > limit:
+                    await JSONResponse({"detail": _too_large_detail()}, status_code=413)(scope, receive, send)
+                    return
+                break
+
+        received = 0
+        response_started = False
+
+        async def counting_receive() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # FastAPI re-raises Starlette HTTPExceptions from body parsing as they are
+                    raise HTTPException(status_code=413, detail=_too_large_detail())
+            return message
+
+        async def tracking_send(message: Message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, counting_receive, tracking_send)
+        except HTTPException as exc:
+            # Raised outside a route's exception handling (e.g. from a plain Starlette endpoint)
+            if exc.status_code != 413 or response_started:
+                raise
+            await JSONResponse({"detail": exc.detail}, status_code=413)(scope, receive, send)
@@ -1,41 +1,43 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response
 from sqlmodel import Session, select
 from typing import List, Dict, Any
 from uuid import UUID
 from datetime import datetime
-from app.core.db import get_session
-from app.models.base import Consultation, PatientProfile, User, UserRole, ConsultationStatus, Appointment
-from app.api.deps import RoleChecker
+from app.core.db import get_session, get_read_session
+from app.models.base import Consultation, PatientProfile, User, UserRole, ConsultationStatus, Appointment, TriageQueueEntry
+from app.api.deps import TokenPayload, RoleChecker
+from app.api.pagination import PageParams, page_params, paginate, finish_page
+from app.services.queue_service import TriageQueueService, QUEUE_SORT_KEYS, queue_sort_key
 
 router = APIRouter()
 
 @router.get("/triage_queue", response_model=List[Dict[str, Any]])
 def get_triage_queue(
-    session: Session = Depends(get_session),
-    current_user: User = Depends(RoleChecker([UserRole.FRONT_DESK, UserRole.DOCTOR]))
+    response: Response,
+    page: PageParams = Depends(page_params),
+    session: Session = Depends(get_read_session),
+    current_user: TokenPayload = Depends(RoleChecker([UserRole.FRONT_DESK, UserRole.DOCTOR]))
 ):
     """
     Returns the live triage queue for admin/doctor use.
     Sorted by urgency_score DESC and created_at ASC.
+    Reads the materialized triage_queue table (no join).
+    Follow the X-Next-Cursor header for the next page.
     """
-    statement = (
-        select(Consultation, PatientProfile)
-        .join(PatientProfile, Consultation.patient_id == PatientProfile.user_id)
-        .where(Consultation.status != ConsultationStatus.COMPLETED)
-        .order_by(Consultation.urgency_score.desc(), Consultation.created_at.asc())
-    )
-    results = session.exec(statement).all()
+    statement = select(TriageQueueEntry).where(TriageQueueEntry.status != ConsultationStatus.COMPLETED)
+    results = session.exec(paginate(statement, QUEUE_SORT_KEYS, page)).all()
+    results = finish_page(results, queue_sort_key, page, response)
     
     queue = []
-    for consultation, profile in results:
+    for entry in results:
         queue.append({
-            "id": str(consultation.id),
-            "appointment_id": str(consultation.appointment_id),
-            "name": f"{profile.first_name} {profile.last_name}",
-            "phone": profile.phone_number or "N/A",
-            "triageScore": consultation.urgency_score or 5,
-            "symptoms": consultation.notes or "No symptoms provided",
-            "checkInTime": consultation.created_at.isoformat()
+            "id": str(entry.consultation_id),
+            "appointment_id": str(entry.appointment_id),
+            "name": entry.patient_name,
+            "phone": entry.phone or "N/A",
+            "triageScore": entry.urgency_score or 5,
+            "symptoms": entry.symptoms or "No symptoms provided",
+            "checkInTime": entry.checked_in_at.isoformat()
         })
     return queue
 
@@ -44,7 +46,7 @@ def assign_doctor(
     appointment_id: UUID,
     payload: Dict[str, UUID],
     session: Session = Depends(get_session),
-    current_user: User = Depends(RoleChecker([UserRole.FRONT_DESK]))
+    current_user: TokenPayload = Depends(RoleChecker([UserRole.FRONT_DESK]))
 ):
     doctor_id = payload.get("doctor_id")
     if not doctor_id:
@@ -67,6 +69,9 @@ def assign_doctor(
         appointment.doctor_name = f"Dr. {doctor.doctor_profile.first_name} {doctor.doctor_profile.last_name}"
         
     session.add(appointment)
+    session.exec(TriageQueueService.update_for_appointment(
+        appointment_id, doctor_id=doctor_id, doctor_name=appointment.doctor_name
+    ))
     session.commit()
     return {"message": "Patient assigned successfully", "doctor_name": appointment.doctor_name}
 
@@ -74,7 +79,7 @@ def assign_doctor(
 def bulk_check_in(
     payload: Dict[str, Any],
     session: Session = Depends(get_session),
-    current_user: User = Depends(RoleChecker([UserRole.FRONT_DESK]))
+    current_user: TokenPayload = Depends(RoleChecker([UserRole.FRONT_DESK]))
 ):
     patient_id = payload.get("patient_id")
     doctor_id = payload.get("doctor_id")
@@ -110,6 +115,11 @@ def bulk_check_in(
         notes=notes
     )
     session.add(consultation)
+
+    profile = session.exec(select(PatientProfile).where(PatientProfile.user_id == patient_id)).first()
+    entry = TriageQueueService.apply(None, consultation, profile, appointment)
+    if entry:
+        session.add(entry)
     session.commit()
     session.refresh(consultation)
     
@@ -1,10 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Response, status
 from sqlmodel import Session, select
 from app.core.db import get_session
 from app.models.base import Appointment, User, UserRole, AppointmentStatus
-from app.api.deps import get_current_user
+from app.api.deps import TokenPayload, get_current_claims
+from app.api.pagination import PageParams, page_params, paginate, finish_page
 from app.schemas.appointment import AppointmentCreate
+from app.services.queue_service import TriageQueueService
 from datetime import datetime, timezone
+from typing import Optional
 from uuid import UUID
 
 router = APIRouter()
@@ -13,7 +16,7 @@ router = APIRouter()
 def create_appointment(
     payload: AppointmentCreate,
     session: Session = Depends(get_session),
-    current_user: User = Depends(get_current_user)
+    current_user: TokenPayload = Depends(get_current_claims)
 ):
     # Validate user is a patient
     if current_user.role != UserRole.PATIENT:
@@ -56,23 +59,42 @@ def create_appointment(
 
 @router.get("/me")
 def get_my_appointments(
+    response: Response,
+    scheduled_from: Optional[datetime] = None,
+    scheduled_to: Optional[datetime] = None,
+    status: Optional[AppointmentStatus] = None,
+    page: PageParams = Depends(page_params),
     session: Session = Depends(get_session),
-    current_user: User = Depends(get_current_user)
+    current_user: TokenPayload = Depends(get_current_claims)
 ):
+    """
+    Appointments visible to the caller, oldest scheduled first.
+    Paginated by (scheduled_at, id); follow the X-Next-Cursor header for the next page.
+    """
     if current_user.role == UserRole.PATIENT:
         statement = select(Appointment).where(Appointment.patient_id == current_user.id)
     elif current_user.role == UserRole.DOCTOR:
         statement = select(Appointment).where(Appointment.doctor_id == current_user.id)
     else:
         statement = select(Appointment)
-    return session.exec(statement).all()
+
+    if scheduled_from:
+        statement = statement.where(Appointment.scheduled_at >= scheduled_from)
+    if scheduled_to:
+        statement = statement.where(Appointment.scheduled_at < scheduled_to)
+    if status:
+        statement = statement.where(Appointment.status == status)
+
+    keys = [(Appointment.scheduled_at, False), (Appointment.id, False)]
+    results = session.exec(paginate(statement, keys, page)).all()
+    return finish_page(results, lambda a: (a.scheduled_at, a.id), page, response)
 
 @router.patch("/{id}/status")
 def update_status(
     id: UUID,
     new_status: AppointmentStatus,
     session: Session = Depends(get_session),
-    current_user: User = Depends(get_current_user)
+    current_user: TokenPayload = Depends(get_current_claims)
 ):
     if current_user.role not in [UserRole.DOCTOR, UserRole.FRONT_DESK]:
         raise HTTPException(status_code=403, detail="Insufficient permissions")
@@ -84,5 +106,6 @@ def update_status(
     appointment.status = new_status
     appointment.updated_at = datetime.now(timezone.utc)
     session.add(appointment)
+    session.exec(TriageQueueService.update_for_appointment(id, appointment_status=new_status))
     session.commit()
     return {"message": f"Status updated to {new_status}"}
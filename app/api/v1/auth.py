@@ -1,8 +1,12 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlmodel import Session, select
-from app.core.db import get_session
-from app.core.security import get_password_hash, verify_password, create_access_token
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.core.db import get_async_session
+from app.api.deps import get_current_user
+from app.core.security import (
+    create_access_token, get_password_hash_async, verify_and_update_password_async, PasswordHashQueueFull,
+)
 from app.models.base import User, PatientProfile, DoctorProfile, UserRole
 from pydantic import BaseModel, EmailStr, Field
 from typing import Optional
@@ -25,22 +29,35 @@ class Token(BaseModel):
     token_type: str
     role: str
 
+def _hashing_busy() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Authentication is busy, please retry",
+        headers={"Retry-After": "1"},
+    )
+
 @router.post("/signup", response_model=dict)
-def signup(user_in: UserCreate, session: Session = Depends(get_session)):
+async def signup(user_in: UserCreate, session: AsyncSession = Depends(get_async_session)):
     # Check if user exists
-    user_db = session.exec(select(User).where(User.email == user_in.email)).first()
+    user_db = (await session.exec(select(User).where(User.email == user_in.email))).first()
     if user_db:
         raise HTTPException(status_code=400, detail="User already exists")
     
+    # Hash in the process pool; the event loop keeps serving other requests meanwhile
+    try:
+        password_hash = await get_password_hash_async(user_in.password)
+    except PasswordHashQueueFull:
+        raise _hashing_busy()
+
     # Create User
     new_user = User(
         email=user_in.email,
-        password_hash=get_password_hash(user_in.password),
+        password_hash=password_hash,
         role=user_in.role
     )
     session.add(new_user)
-    session.commit()
-    session.refresh(new_user)
+    await session.commit()
+    await session.refresh(new_user)
     
     # Create Profile based on Role
     if new_user.role == UserRole.PATIENT:
@@ -67,51 +84,38 @@ def signup(user_in: UserCreate, session: Session = Depends(get_session)):
         session.add(new_profile)
     # FRONT_DESK or others might not have a profile or a different one - skipping for now or handle as needed
     
-    session.commit()
+    await session.commit()
     
     return {"message": "User created successfully", "user_id": str(new_user.id)}
 
 @router.post("/login", response_model=Token)
-def login(form_data: OAuth2PasswordRequestForm = Depends(), session: Session = Depends(get_session)):
-    user = session.exec(select(User).where(User.email == form_data.username)).first()
-    if not user or not verify_password(form_data.password, user.password_hash):
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), session: AsyncSession = Depends(get_async_session)):
+    user = (await session.exec(select(User).where(User.email == form_data.username))).first()
+    valid, new_hash = False, None
+    if user:
+        try:
+            valid, new_hash = await verify_and_update_password_async(form_data.password, user.password_hash)
+        except PasswordHashQueueFull:
+            raise _hashing_busy()
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
         )
+
+    # Stored hash predates the current PASSWORD_HASH_ROUNDS; upgrade it while we have the plaintext
+    if new_hash:
+        user.password_hash = new_hash
+        session.add(user)
+        await session.commit()
     
-    access_token = create_access_token(subject=user.id, role=user.role.value)
+    access_token = create_access_token(subject=user.id, role=user.role.value, token_version=user.token_version)
     return {
         "access_token": access_token,
         "token_type": "bearer",
         "role": user.role.value
     }
 
-from fastapi.security import OAuth2PasswordBearer
-from jose import JWTError, jwt
-from app.core.config import settings
-
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/login")
-
-def get_current_user(token: str = Depends(oauth2_scheme), session: Session = Depends(get_session)) -> User:
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
-    try:
-        payload = jwt.decode(token, settings.JWT_SECRET, algorithms=[settings.JWT_ALGORITHM])
-        user_id: str = payload.get("sub")
-        if user_id is None:
-            raise credentials_exception
-    except JWTError:
-        raise credentials_exception
-        
-    user = session.get(User, user_id)
-    if user is None:
-        raise credentials_exception
-    return user
-
 @router.get("/me", response_model=User)
 def read_users_me(current_user: User = Depends(get_current_user)):
     return current_user
@@ -1,13 +1,22 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Response
+from sqlalchemy.exc import IntegrityError
 from sqlmodel import Session, select
-from app.core.db import get_session
-from app.models.base import Consultation, ConsultationStatus, Appointment, User, UserRole, AudioFile, SOAPNote, AudioUploaderType
-from app.api.deps import get_current_user, RoleChecker
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.core.db import get_session, get_async_session
+from app.models.base import (
+    Consultation, ConsultationStatus, Appointment, User, UserRole, AudioFile, SOAPNote, AudioUploaderType, PatientProfile,
+)
+from app.api.deps import TokenPayload, get_current_claims, RoleChecker
+from app.api.pagination import PageParams, page_params, paginate, finish_page
+from app.services.queue_service import TriageQueueService
+from app.services.job_queue import JobQueueService, notify_enqueued
+from app.services.audio_storage import AudioStorageService, UploadTooLarge
+from app.core.config import settings
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
 from typing import Optional, List, Any
 from uuid import UUID, uuid4
 import os
-import shutil
 
 router = APIRouter()
 
@@ -37,7 +46,7 @@ class ConsultationRead(BaseModel):
 def create_consultation(
     consultation_in: ConsultationCreate,
     session: Session = Depends(get_session),
-    current_user: User = Depends(RoleChecker([UserRole.DOCTOR, UserRole.FRONT_DESK]))
+    current_user: TokenPayload = Depends(RoleChecker([UserRole.DOCTOR, UserRole.FRONT_DESK]))
 ):
     # Verify appointment
     appointment = session.get(Appointment, consultation_in.appointment_id)
@@ -58,17 +67,54 @@ def create_consultation(
         notes=consultation_in.notes
     )
     session.add(new_consultation)
+
+    profile = session.exec(select(PatientProfile).where(PatientProfile.user_id == new_consultation.patient_id)).first()
+    entry = TriageQueueService.apply(None, new_consultation, profile, appointment)
+    if entry:
+        session.add(entry)
     session.commit()
     session.refresh(new_consultation)
     return new_consultation
 
 from sqlalchemy.orm import selectinload
 
+# Declared before /{id} so that "me" isn't parsed as a consultation id
+@router.get("/me", response_model=List[ConsultationRead])
+def get_my_consultations(
+    response: Response,
+    status: Optional[ConsultationStatus] = None,
+    page: PageParams = Depends(page_params),
+    session: Session = Depends(get_session),
+    current_user: TokenPayload = Depends(get_current_claims)
+):
+    """
+    Consultations visible to the caller, oldest first.
+    Paginated by (created_at, id); follow the X-Next-Cursor header for the next page.
+    """
+    if current_user.role == UserRole.PATIENT:
+        statement = select(Consultation).where(Consultation.patient_id == current_user.id)
+    elif current_user.role == UserRole.DOCTOR:
+        statement = select(Consultation).where(Consultation.doctor_id == current_user.id)
+    else:
+        statement = select(Consultation)
+    if status:
+        statement = statement.where(Consultation.status == status)
+
+    keys = [(Consultation.created_at, False), (Consultation.id, False)]
+    results = session.exec(
+        paginate(statement, keys, page).options(
+            selectinload(Consultation.audio_file), 
+            selectinload(Consultation.soap_note),
+            selectinload(Consultation.appointment)
+        )
+    ).all()
+    return finish_page(results, lambda c: (c.created_at, c.id), page, response)
+
 @router.get("/{id}", response_model=ConsultationRead) # Returning DB model direct for now, includes relationships
 def get_consultation(
     id: UUID,
     session: Session = Depends(get_session),
-    current_user: User = Depends(get_current_user)
+    current_user: TokenPayload = Depends(get_current_claims)
 ):
     consultation = session.exec(
         select(Consultation)
@@ -92,42 +138,27 @@ def get_consultation(
          
     return consultation
 
-@router.get("/me", response_model=List[ConsultationRead])
-def get_my_consultations(
-    session: Session = Depends(get_session),
-    current_user: User = Depends(get_current_user)
-):
-    if current_user.role == UserRole.PATIENT:
-        statement = select(Consultation).where(Consultation.patient_id == current_user.id)
-    elif current_user.role == UserRole.DOCTOR:
-        statement = select(Consultation).where(Consultation.doctor_id == current_user.id)
-    else:
-        statement = select(Consultation)
-        
-    results = session.exec(
-        statement.options(
-            selectinload(Consultation.audio_file), 
-            selectinload(Consultation.soap_note),
-            selectinload(Consultation.appointment)
-        )
-    ).all()
-    return results
-
 @router.post("/{id}/upload")
 async def upload_audio(
     id: UUID,
-    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
-    session: Session = Depends(get_session),
-    current_user: User = Depends(RoleChecker([UserRole.DOCTOR, UserRole.PATIENT, UserRole.FRONT_DESK]))
+    session: AsyncSession = Depends(get_async_session),
+    current_user: TokenPayload = Depends(RoleChecker([UserRole.DOCTOR, UserRole.PATIENT, UserRole.FRONT_DESK]))
 ):
-    consultation = session.get(Consultation, id)
+    consultation = await session.get(Consultation, id)
     if not consultation:
         raise HTTPException(status_code=404, detail="Consultation not found")
         
     # Validation
-    if not file.filename.endswith(('.wav', '.mp3', '.m4a')):
+    if not file.filename.lower().endswith(('.wav', '.mp3', '.m4a', '.aac')):
         raise HTTPException(status_code=400, detail="Invalid file format")
+    if file.size is not None and file.size > settings.MAX_UPLOAD_BYTES:
+        raise HTTPException(status_code=413, detail=f"Audio exceeds the {settings.MAX_UPLOAD_BYTES} byte upload limit")
+    # Checked before writing anything; the unique indexes still back this up against a racing upload
+    if await JobQueueService.active_job(session, id):
+        raise HTTPException(status_code=409, detail="Processing is already queued for this consultation")
+    if (await session.exec(select(AudioFile.id).where(AudioFile.consultation_id == id))).first():
+        raise HTTPException(status_code=409, detail="Audio was already uploaded for this consultation")
 
     # Save File
     file_id = uuid4()
@@ -135,8 +166,11 @@ async def upload_audio(
     safe_filename = f"{file_id}{file_ext}"
     file_path = os.path.join(UPLOAD_DIR, safe_filename)
     
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+    # Chunked copy in a worker thread; size, hash (transcript cache key) and WAV duration in one pass
+    try:
+        stored = await run_in_threadpool(AudioStorageService.save, file.file, file_path, settings.MAX_UPLOAD_BYTES)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
         
     # Create AudioFile Record
     if current_user.role == UserRole.DOCTOR:
@@ -152,17 +186,59 @@ async def upload_audio(
         uploaded_by=uploader_type,
         file_name=file.filename,
         file_url=file_path,
-        mime_type=file.content_type
+        mime_type=file.content_type,
+        file_size=stored.size,
+        duration=stored.duration,
+        content_sha256=stored.sha256
     )
-    session.add(audio_file)
-    
-    # Update Status
+    try:
+        session.add(audio_file)
+
+        # Update Status
+        consultation.status = ConsultationStatus.IN_PROGRESS
+        session.add(consultation)
+        await session.exec(TriageQueueService.update_for_consultation(id, status=ConsultationStatus.IN_PROGRESS))
+        # Durable job, committed with the upload; a pipeline worker picks it up
+        JobQueueService.enqueue(session, consultation.id)
+        await session.commit()
+    except IntegrityError:
+        # A concurrent upload for this consultation committed first; don't leave this one's audio behind
+        await session.rollback()
+        os.remove(file_path)
+        raise HTTPException(status_code=409, detail="Audio was already uploaded for this consultation")
+    notify_enqueued()
+
+    return {"message": "Audio uploaded, processing started", "audio_id": file_id}
+
+@router.post("/{id}/retry")
+async def retry_processing(
+    id: UUID,
+    session: AsyncSession = Depends(get_async_session),
+    current_user: TokenPayload = Depends(RoleChecker([UserRole.DOCTOR, UserRole.FRONT_DESK]))
+):
+    """
+    Re-queues AI processing for a FAILED consultation. The pipeline resumes after the
+    last checkpointed stage, so a Gemini failure does not re-transcribe the audio.
+    """
+    consultation = await session.get(Consultation, id)
+    if not consultation:
+        raise HTTPException(status_code=404, detail="Consultation not found")
+    if consultation.status != ConsultationStatus.FAILED:
+        raise HTTPException(status_code=409, detail=f"Only FAILED consultations can be retried (status is {consultation.status.value})")
+    audio_file = (await session.exec(select(AudioFile).where(AudioFile.consultation_id == id))).first()
+    if not audio_file:
+        raise HTTPException(status_code=400, detail="No audio uploaded for this consultation")
+    if await JobQueueService.active_job(session, id):
+        raise HTTPException(status_code=409, detail="Processing is already queued for this consultation")
+
     consultation.status = ConsultationStatus.IN_PROGRESS
+    consultation.requires_manual_review = False
     session.add(consultation)
-    session.commit()
-    
-    # Trigger Background Task
-    from app.services.consultation_processor import process_consultation_flow
-    background_tasks.add_task(process_consultation_flow, consultation.id)
+    await session.exec(TriageQueueService.update_for_consultation(
+        id, status=ConsultationStatus.IN_PROGRESS, requires_manual_review=False
+    ))
+    JobQueueService.enqueue(session, id)
+    await session.commit()
+    notify_enqueued()
 
-    return {"message": "Audio uploaded, processing started", "audio_id": file_id}
+    return {"message": "Processing re-queued", "resume_after": consultation.processing_stage.value}
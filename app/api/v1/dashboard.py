@@ -1,37 +1,41 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Response
 from sqlmodel import Session, select
 from typing import List, Dict, Any
 from datetime import datetime
-from app.core.db import get_session
-from app.models.base import Consultation, PatientProfile, ConsultationStatus
+from app.core.db import get_read_session
+from app.api.pagination import PageParams, page_params, paginate, finish_page
+from app.services.queue_service import QUEUE_SORT_KEYS, queue_sort_key
+from app.models.base import ConsultationStatus, TriageQueueEntry
 
 router = APIRouter()
 
 @router.get("/queue/failed", response_model=List[Dict[str, Any]])
-def get_failed_queue(session: Session = Depends(get_session)):
+def get_failed_queue(
+    response: Response,
+    page: PageParams = Depends(page_params),
+    session: Session = Depends(get_read_session)
+):
     """
     Returns patients whose AI processing failed and require manual review.
+    Newest first; follow the X-Next-Cursor header for the next page.
     """
-    query = (
-        select(Consultation, PatientProfile)
-        .join(PatientProfile, Consultation.patient_id == PatientProfile.user_id)
-        .where(Consultation.requires_manual_review == True)
-        .order_by(Consultation.created_at.desc())
-    )
-    results = session.exec(query).all()
+    query = select(TriageQueueEntry).where(TriageQueueEntry.requires_manual_review == True)
+    keys = [(TriageQueueEntry.checked_in_at, True), (TriageQueueEntry.consultation_id, True)]
+    results = session.exec(paginate(query, keys, page)).all()
+    results = finish_page(results, lambda e: (e.checked_in_at, e.consultation_id), page, response)
     
     queue = []
-    for consult, profile in results:
+    for entry in results:
         # Calculate wait time
         wait_time = "N/A"
-        if consult.created_at:
-             delta = datetime.utcnow() - consult.created_at
+        if entry.checked_in_at:
+             delta = datetime.utcnow() - entry.checked_in_at
              minutes = int(delta.total_seconds() / 60)
              wait_time = f"{minutes} min"
 
         queue.append({
-            "patient_name": f"{profile.first_name} {profile.last_name}",
-            "consultation_id": str(consult.id),
+            "patient_name": entry.patient_name,
+            "consultation_id": str(entry.consultation_id),
             "reason": "AI Processing Failed (Quota/Error)",
             "wait_time": wait_time,
             "status": "REQUIRES_REVIEW"
@@ -39,36 +43,37 @@ def get_failed_queue(session: Session = Depends(get_session)):
     return queue
 
 @router.get("/queue", response_model=List[Dict[str, Any]])
-def get_patient_queue(session: Session = Depends(get_session)):
+def get_patient_queue(
+    response: Response,
+    page: PageParams = Depends(page_params),
+    session: Session = Depends(get_read_session)
+):
     """
     Returns the prioritized patient queue for the dashboard.
     Sorting Logic:
     1. Urgency Score (DESC) - Critical patients first.
     2. Wait Time (ASC) - First come first served within same urgency.
+    Follow the X-Next-Cursor header for the next page.
     """
-    query = (
-        select(Consultation, PatientProfile)
-        .join(PatientProfile, Consultation.patient_id == PatientProfile.user_id)
-        .where(Consultation.status == ConsultationStatus.COMPLETED)
-        .order_by(Consultation.urgency_score.desc(), Consultation.created_at.asc())
-    )
-    results = session.exec(query).all()
+    query = select(TriageQueueEntry).where(TriageQueueEntry.status == ConsultationStatus.COMPLETED)
+    results = session.exec(paginate(query, QUEUE_SORT_KEYS, page)).all()
+    results = finish_page(results, queue_sort_key, page, response)
     
     queue = []
-    for consultation, patient in results:
+    for entry in results:
         # Calculate approximate wait time since creation
         wait_time_min = 0
-        if consultation.created_at:
-            delta = datetime.utcnow() - consultation.created_at
+        if entry.checked_in_at:
+            delta = datetime.utcnow() - entry.checked_in_at
             wait_time_min = int(delta.total_seconds() / 60)
 
         queue.append({
-            "consultation_id": str(consultation.id),
-            "patient_name": f"{patient.first_name} {patient.last_name}",
-            "urgency_score": consultation.urgency_score or 0,
-            "triage_category": consultation.triage_category,
+            "consultation_id": str(entry.consultation_id),
+            "patient_name": entry.patient_name,
+            "urgency_score": entry.urgency_score or 0,
+            "triage_category": entry.triage_category,
             "wait_time_minutes": wait_time_min,
-            "safety_warnings": len(consultation.safety_warnings) if consultation.safety_warnings else 0
+            "safety_warnings": entry.safety_warning_count
         })
     
     return queue
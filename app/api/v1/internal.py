@@ -0,0 +1,38 @@
+from fastapi import APIRouter, Depends
+from typing import Dict, Any
+from app.api.deps import require_internal_token
+from app.core.cache import cache_stats
+from app.core.db import engine, async_engine, replica_engine
+from app.core.pool import pool_status
+from app.services.rate_limiter import provider_stats
+from app.services.assemblyai_client import assemblyai_client
+
+# Operational stats; not for users. Every route needs X-Internal-Token.
+router = APIRouter(dependencies=[Depends(require_internal_token)])
+
+@router.get("/db/pool", response_model=Dict[str, Any])
+def get_pool_stats():
+    """
+    Live connection pool statistics for sizing DB_POOL_SIZE / DB_MAX_OVERFLOW
+    against measured load: occupancy, overflow, timeouts and checkout latency.
+    """
+    stats = {
+        "primary": pool_status(engine.pool),
+        "primary_async": pool_status(async_engine.sync_engine.pool),
+    }
+    if replica_engine is not None:
+        stats["replica"] = pool_status(replica_engine.pool)
+    return stats
+
+@router.get("/caches", response_model=Dict[str, Any])
+def get_cache_stats():
+    """Size and hit-rate counters for this worker's in-process caches."""
+    return cache_stats()
+
+@router.get("/providers", response_model=Dict[str, Any])
+def get_provider_stats():
+    """
+    AssemblyAI / Gemini limiter state for this worker (in flight, queued, queue-wait times)
+    and what the AssemblyAI poller has learned about queue time and processing speed.
+    """
+    return {**provider_stats(), "assemblyai_polling": assemblyai_client.polling.stats()}
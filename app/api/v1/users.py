@@ -1,11 +1,17 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from sqlmodel import Session, select
-from app.core.db import get_session
+from app.core.db import get_session, get_read_session
 from app.models.base import User, PatientProfile, UserRole
-from app.api.deps import get_current_user
+from app.api.deps import TokenPayload, get_current_claims
+from app.api.pagination import (
+    NEXT_CURSOR_HEADER, PageParams, page_params, paginate, finish_page, encode_cursor, decode_cursor,
+)
+from app.services.doctor_directory import doctor_directory
+from app.services.queue_service import TriageQueueService
 from pydantic import BaseModel
 from typing import Optional, List
 from datetime import datetime
+from uuid import UUID
 
 router = APIRouter()
 
@@ -25,7 +31,7 @@ class PatientProfileUpdate(BaseModel):
 def update_my_profile(
     profile_in: PatientProfileUpdate,
     session: Session = Depends(get_session),
-    current_user: User = Depends(get_current_user)
+    current_user: TokenPayload = Depends(get_current_claims)
 ):
     """
     Update the current logged-in user's profile.
@@ -50,6 +56,7 @@ def update_my_profile(
         
     profile.updated_at = datetime.utcnow()
     session.add(profile)
+    session.exec(TriageQueueService.update_for_patient(profile))
     session.commit()
     session.refresh(profile)
     return profile
@@ -57,7 +64,7 @@ def update_my_profile(
 @router.get("/me/profile")
 def get_my_profile(
     session: Session = Depends(get_session),
-    current_user: User = Depends(get_current_user)
+    current_user: TokenPayload = Depends(get_current_claims)
 ):
     if current_user.role == UserRole.PATIENT:
         profile = session.exec(select(PatientProfile).where(PatientProfile.user_id == current_user.id)).first()
@@ -74,45 +81,45 @@ def get_my_profile(
 
 @router.get("/doctors", response_model=List[dict])
 def list_doctors(
-    session: Session = Depends(get_session)
+    request: Request,
+    specialization: Optional[str] = None,
+    is_available: Optional[bool] = None,
+    page: PageParams = Depends(page_params),
 ):
     """
     Returns a list of all doctors with their profiles.
+    Served from the in-process doctor directory (no DB round trip) with an ETag;
+    paginated by user id, follow the X-Next-Cursor header for the next page.
     """
-    from app.models.base import DoctorProfile
-    
-    query = (
-        select(User, DoctorProfile)
-        .join(DoctorProfile, User.id == DoctorProfile.user_id)
-        .where(User.role == UserRole.DOCTOR)
-    )
-    results = session.exec(query).all()
-    
-    doctors = []
-    for user, profile in results:
-        doctors.append({
-            "id": str(user.id),
-            "email": user.email,
-            "first_name": profile.first_name,
-            "last_name": profile.last_name,
-            "specialization": profile.specialization,
-            "clinic_address": profile.clinic_address,
-            "image": f"https://images.unsplash.com/photo-1559839734-2b71ea197ec2?w=150&h=150&fit=crop&crop=face" # Placeholder
-        })
-    return doctors
+    after = decode_cursor(page.cursor, 1)[0] if page.cursor else None
+    if after is not None and not isinstance(after, UUID):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    directory_page = doctor_directory.page(specialization, is_available, page.limit, after)
+
+    headers = {"ETag": directory_page.etag}
+    if directory_page.next_user_id is not None:
+        headers[NEXT_CURSOR_HEADER] = encode_cursor([directory_page.next_user_id])
+    if request.headers.get("If-None-Match") == directory_page.etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=directory_page.body, media_type="application/json", headers=headers)
+
 @router.get("/patients", response_model=List[dict])
 def list_patients(
-    session: Session = Depends(get_session)
+    response: Response,
+    page: PageParams = Depends(page_params),
+    session: Session = Depends(get_read_session)
 ):
     """
     Returns a list of all patients with their profiles.
+    Paginated by user id; follow the X-Next-Cursor header for the next page.
     """
     query = (
         select(User, PatientProfile)
         .join(PatientProfile, User.id == PatientProfile.user_id)
         .where(User.role == UserRole.PATIENT)
     )
-    results = session.exec(query).all()
+    results = session.exec(paginate(query, [(User.id, False)], page)).all()
+    results = finish_page(results, lambda row: (row[0].id,), page, response)
     
     patients = []
     for user, profile in results:
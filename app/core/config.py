@@ -11,8 +11,105 @@ class Settings(BaseSettings):
     GOOGLE_API_KEY: Optional[str] = None
     GEMINI_API_KEY: Optional[str] = None
     UPLOAD_DIR: str = "uploads"
+    MAX_UPLOAD_BYTES: int = 200 * 1024 * 1024 # audio uploads over this get 413
     CORS_ORIGINS: List[str] = ["*"]
     PORT: int = 8000
+    # Required as X-Internal-Token on /api/v1/internal/*; unset disables those endpoints
+    INTERNAL_API_TOKEN: Optional[str] = None
+
+    # Connection pool (ignored for SQLite, which uses its own pool classes)
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: float = 30.0
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+
+    # Optional read replica for read-only dashboards and listings
+    DATABASE_REPLICA_URL: Optional[str] = None
+    # Requests from a caller who wrote within this window still read from the primary
+    DATABASE_REPLICA_STALENESS_SECONDS: float = 5.0
+    # Create and stamp the schema on an empty database at startup (dev/test convenience)
+    DB_AUTO_CREATE_SCHEMA: bool = True
+
+    # Keyset pagination on list endpoints
+    PAGE_SIZE_DEFAULT: int = 100
+    PAGE_SIZE_MAX: int = 500
+
+    # Doctor directory cache: reloaded on local writes; the TTL bounds staleness from other workers
+    DOCTOR_DIRECTORY_TTL_SECONDS: float = 60.0
+
+    # get_current_user cache of resolved users, per worker
+    USER_CACHE_MAXSIZE: int = 10000
+    USER_CACHE_TTL_SECONDS: float = 60.0
+    # Decoded-token cache, and how long a token_version bump may take to reach other workers
+    TOKEN_CACHE_MAXSIZE: int = 10000
+    TOKEN_CACHE_TTL_SECONDS: float = 300.0
+    TOKEN_VERSION_CACHE_SECONDS: float = 30.0
+
+    # Password hashing: PBKDF2-SHA256 rounds (changing it rehashes on next login) and the hashing process pool
+    PASSWORD_HASH_ROUNDS: int = 29000
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_MAX_PENDING: int = 64
+
+    # processing_jobs queue for the AI pipeline
+    JOB_QUEUE_INPROCESS_WORKER: bool = True # drain jobs inside the API process; turn off when running separate workers
+    JOB_WORKER_CONCURRENCY: int = 2
+    JOB_POLL_INTERVAL_SECONDS: float = 2.0
+    JOB_LEASE_SECONDS: float = 300.0
+    JOB_MAX_ATTEMPTS: int = 3
+    JOB_RETRY_BACKOFF_SECONDS: float = 30.0
+    WORKER_PROCESSES: Optional[int] = None # python -m app.worker; defaults to one per core
+
+    # Provider admission control, per process: calls in flight and a token bucket on request rate
+    ASSEMBLYAI_MAX_CONCURRENT: int = 5
+    ASSEMBLYAI_REQUESTS_PER_MINUTE: float = 60.0
+    ASSEMBLYAI_BURST: int = 5
+    GEMINI_MAX_CONCURRENT: int = 4
+    GEMINI_REQUESTS_PER_MINUTE: float = 15.0
+    GEMINI_BURST: int = 2
+    PROVIDER_QUOTA_COOLDOWN_SECONDS: float = 10.0 # all queued calls pause this long after a 429
+
+    # Audio normalization before STT: mono, resampled; compressed formats re-encoded to Opus via ffmpeg if installed
+    AUDIO_NORMALIZE_ENABLED: bool = True
+    AUDIO_TARGET_SAMPLE_RATE: int = 16000
+    AUDIO_OPUS_BITRATE: str = "32k"
+    AUDIO_FFMPEG_BINARY: str = "ffmpeg"
+    AUDIO_PREPROCESS_WORKERS: int = 2
+    # Silence trimming (compressed formats need ffmpeg): silences longer than MIN_SILENCE are cut down to KEEP_SILENCE
+    AUDIO_VAD_ENABLED: bool = False
+    AUDIO_VAD_MIN_SILENCE_MS: int = 1500
+    AUDIO_VAD_KEEP_SILENCE_MS: int = 400
+    AUDIO_VAD_MARGIN_DB: float = 12.0 # frames this far above the noise floor count as speech
+
+    # AssemblyAI over REST with httpx (no thread per in-flight job); false uses the SDK in a thread.
+    # With it on, ASSEMBLYAI_MAX_CONCURRENT can be raised to what the account allows.
+    ASSEMBLYAI_ASYNC_CLIENT: bool = True
+    ASSEMBLYAI_BASE_URL: str = "https://api.assemblyai.com"
+    ASSEMBLYAI_HTTP_MAX_CONNECTIONS: int = 20
+    ASSEMBLYAI_HTTP_TIMEOUT_SECONDS: float = 60.0
+    ASSEMBLYAI_POLL_MIN_SECONDS: float = 1.0
+    ASSEMBLYAI_POLL_MAX_SECONDS: float = 15.0
+
+    # Long recordings as parallel chunks cut at quiet points (compressed formats need ffmpeg); recordings
+    # up to 1.5x STT_CHUNK_SECONDS stay one job
+    STT_CHUNKING_ENABLED: bool = False
+    STT_CHUNK_SECONDS: float = 300.0
+    STT_CHUNK_OVERLAP_SECONDS: float = 8.0 # transcribed by both neighbours; used to match speaker labels
+    STT_CHUNK_MAX_PARALLEL: int = 4 # per recording; ASSEMBLYAI_MAX_CONCURRENT still bounds the process
+
+    # Transcript compaction before the SOAP prompt: merged turns, no fillers, collapsed redactions.
+    # Over the budget (estimated tokens; 0 = unlimited) and not map-reduced, turns are omitted from the middle outwards.
+    SOAP_COMPACT_TRANSCRIPT: bool = True
+    SOAP_TRANSCRIPT_TOKEN_BUDGET: int = 30000
+    # Longer transcripts go map-reduce instead: findings per segment in parallel, then one merge call
+    SOAP_MAP_REDUCE_ENABLED: bool = True
+    SOAP_MAP_REDUCE_THRESHOLD_TOKENS: int = 24000
+    SOAP_SEGMENT_TOKENS: int = 8000
+    SOAP_MAP_MAX_PARALLEL: int = 4 # per consultation; GEMINI_MAX_CONCURRENT still bounds the process
+
+    # SOAP generation result cache (soap_cache table), bounded by entries and by total JSON size; 0 disables it
+    SOAP_CACHE_MAX_ENTRIES: int = 5000
+    SOAP_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
 
     class Config:
         env_file = ".env"
@@ -1,10 +1,184 @@
+import logging
+import threading
+import time
+from typing import Dict, Optional
+from fastapi import Request
+from jose import jwt
+from sqlalchemy import event, inspect, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
 from sqlmodel import create_engine, Session, SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
 from app.core.config import settings
+from app.core.pool import InstrumentedQueuePool, InstrumentedAsyncQueuePool
+
+logger = logging.getLogger(__name__)
+
+# Alembic head this code expects; bump together with every new file in migrations/versions/.
+SCHEMA_REVISION = "0012"
+
+# Async drivers used for each sync backend in DATABASE_URL
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+def _pool_options(url: str, poolclass) -> dict:
+    # SQLite picks its own pool class (singleton/static for in-memory DBs); only size real servers.
+    if url.startswith("sqlite"):
+        return {}
+    return {
+        "poolclass": poolclass,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+
+
+def to_async_url(url: str) -> str:
+    """
+    Maps a sync DATABASE_URL (psycopg2 / pysqlite) onto its asyncio driver.
+    URLs that already name an async driver are returned unchanged.
+    """
+    parsed = make_url(url)
+    driver = ASYNC_DRIVERS.get(parsed.get_backend_name())
+    if not driver or parsed.drivername == driver:
+        return url
+    return parsed.set(drivername=driver).render_as_string(hide_password=False)
+
+
+engine = create_engine(
+    settings.DATABASE_URL,
+    echo=False,
+    **_pool_options(settings.DATABASE_URL, InstrumentedQueuePool),
+)
+
+async_engine = create_async_engine(
+    to_async_url(settings.DATABASE_URL),
+    echo=False,
+    **_pool_options(settings.DATABASE_URL, InstrumentedAsyncQueuePool),
+)
+
+replica_engine = None
+if settings.DATABASE_REPLICA_URL:
+    replica_engine = create_engine(
+        settings.DATABASE_REPLICA_URL,
+        echo=False,
+        **_pool_options(settings.DATABASE_REPLICA_URL, InstrumentedQueuePool),
+    )
+
+
+# --- Read-your-writes tracking ---
+# Callers that committed a write recently are pinned to the primary so they never
+# read a replica that hasn't replayed it yet. Tracking is per worker process.
+_last_write_at: Dict[str, float] = {}
+_last_write_lock = threading.Lock()
+_LAST_WRITE_PRUNE_SIZE = 10000
+
+
+def _writer_key(request: Request) -> Optional[str]:
+    auth = request.headers.get("Authorization")
+    if auth:
+        # Only used for routing, never for authorization, so an unverified read is enough.
+        try:
+            subject = jwt.get_unverified_claims(auth.replace("Bearer ", "")).get("sub")
+            if subject:
+                return f"user:{subject}"
+        except Exception:
+            pass
+    return f"client:{request.client.host}" if request.client else None
+
+
+def mark_write(key: Optional[str]):
+    if not key:
+        return
+    now = time.monotonic()
+    with _last_write_lock:
+        _last_write_at[key] = now
+        if len(_last_write_at) > _LAST_WRITE_PRUNE_SIZE:
+            cutoff = now - settings.DATABASE_REPLICA_STALENESS_SECONDS
+            for stale_key in [k for k, t in _last_write_at.items() if t < cutoff]:
+                del _last_write_at[stale_key]
+
+
+def wrote_recently(key: Optional[str]) -> bool:
+    if not key:
+        return False
+    with _last_write_lock:
+        written_at = _last_write_at.get(key)
+    return written_at is not None and time.monotonic() - written_at < settings.DATABASE_REPLICA_STALENESS_SECONDS
+
+
+@event.listens_for(Session, "after_flush")
+def _flag_pending_write(session, flush_context):
+    session.info["has_writes"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _record_committed_write(session):
+    if session.info.pop("has_writes", False):
+        mark_write(session.info.get("writer_key"))
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending_write(session):
+    session.info.pop("has_writes", None)
+
+
+def _stamp_schema(conn, revision: str):
+    conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS alembic_version "
+        "(version_num VARCHAR(32) NOT NULL, CONSTRAINT alembic_version_pkc PRIMARY KEY (version_num))"
+    ))
+    conn.execute(text("DELETE FROM alembic_version"))
+    conn.execute(text("INSERT INTO alembic_version (version_num) VALUES (:rev)"), {"rev": revision})
+
+
+def _register_models():
+    # create_all only knows the tables whose models have been imported; don't rely on the caller
+    import app.models.base  # noqa: F401
 
-engine = create_engine(settings.DATABASE_URL, echo=False)
 
 def init_db():
-    SQLModel.metadata.create_all(engine)
+    """Creates the current schema and stamps it, so check_schema() accepts the database."""
+    _register_models()
+    with engine.begin() as conn:
+        SQLModel.metadata.create_all(conn)
+        _stamp_schema(conn, SCHEMA_REVISION)
+
+
+def check_schema():
+    """
+    Startup check: one query against alembic_version instead of create_all on every boot.
+    An empty database is created and stamped when DB_AUTO_CREATE_SCHEMA is on;
+    any other mismatch refuses to start until `alembic upgrade head` has been run.
+    """
+    with engine.connect() as conn:
+        try:
+            current = conn.execute(text("SELECT version_num FROM alembic_version")).scalar()
+        except Exception:
+            conn.rollback()
+            current = None
+        if current == SCHEMA_REVISION:
+            return
+
+        if current is None and not inspect(conn).get_table_names():
+            if not settings.DB_AUTO_CREATE_SCHEMA:
+                raise RuntimeError("Database is empty and DB_AUTO_CREATE_SCHEMA is off; run `alembic upgrade head`.")
+            logger.info("Empty database: creating schema at revision %s", SCHEMA_REVISION)
+            _register_models()
+            SQLModel.metadata.create_all(conn)
+            _stamp_schema(conn, SCHEMA_REVISION)
+            conn.commit()
+            return
+
+    raise RuntimeError(
+        f"Database schema is at revision {current or 'unversioned'}, code expects {SCHEMA_REVISION}; "
+        "run `alembic upgrade head`."
+    )
 
 def test_connection():
     from sqlalchemy import text
@@ -12,6 +186,25 @@ def test_connection():
         session.exec(text("SELECT 1"))
 
 
-def get_session():
+def get_session(request: Request):
     with Session(engine) as session:
+        session.info["writer_key"] = _writer_key(request)
+        yield session
+
+
+async def get_async_session(request: Request):
+    # expire_on_commit=False: expired attributes would need a lazy load, which AsyncSession can't do implicitly.
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        session.sync_session.info["writer_key"] = _writer_key(request)
+        yield session
+
+
+def get_read_session(request: Request):
+    """
+    Session for read-only endpoints. Uses DATABASE_REPLICA_URL when configured,
+    unless the caller wrote within DATABASE_REPLICA_STALENESS_SECONDS.
+    Falls back to the primary when no replica is configured.
+    """
+    use_primary = replica_engine is None or wrote_recently(_writer_key(request))
+    with Session(engine if use_primary else replica_engine) as session:
         yield session
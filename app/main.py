@@ -1,7 +1,14 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.api.v1 import auth, users, appointments, consultations, dashboard, admin
-from app.core.db import init_db
+from app.api.upload_limits import UploadSizeLimitMiddleware
+from app.api.v1 import auth, users, appointments, consultations, dashboard, admin, internal
+from app.core.db import check_schema
+from app.core.security import shutdown_hash_pool
+from app.services.job_queue import start_inprocess_worker, stop_inprocess_worker
+from app.services.audio_preprocess import shutdown_audio_pool
+from app.services.llm_service import shutdown_gemini_pool
+from app.services.assemblyai_client import assemblyai_client
+from app.services.doctor_directory import doctor_directory
 
 app = FastAPI()
 
@@ -12,7 +19,10 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
+# Rejects oversized audio uploads by Content-Length, or by bytes received, before the body is spooled
+app.add_middleware(UploadSizeLimitMiddleware)
 
 # Routers
 app.include_router(auth.router, prefix="/api/v1/auth", tags=["Auth"])
@@ -21,7 +31,21 @@ app.include_router(appointments.router, prefix="/api/v1/appointments", tags=["Ap
 app.include_router(consultations.router, prefix="/api/v1/consultations", tags=["Consultations"])
 app.include_router(dashboard.router, prefix="/api/v1/dashboard", tags=["Dashboard"])
 app.include_router(admin.router, prefix="/api/v1/admin", tags=["Admin"])
+app.include_router(internal.router, prefix="/api/v1/internal", tags=["Internal"])
 
 @app.on_event("startup")
 def startup():
-    init_db()
+    check_schema()
+    doctor_directory.load()
+
+@app.on_event("startup")
+async def start_job_worker():
+    start_inprocess_worker()
+
+@app.on_event("shutdown")
+async def shutdown():
+    await stop_inprocess_worker()
+    await assemblyai_client.aclose()
+    shutdown_hash_pool()
+    shutdown_audio_pool()
+    shutdown_gemini_pool()
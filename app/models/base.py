@@ -4,7 +4,7 @@ from typing import List, Optional
 from uuid import UUID, uuid4
 from sqlmodel import Field, SQLModel, Relationship, JSON, Column
 
-from sqlalchemy import Enum as SAEnum
+from sqlalchemy import Enum as SAEnum, Index
 
 class UserRole(str, Enum):
     PATIENT = "PATIENT"
@@ -25,6 +25,7 @@ class User(SQLModel, table=True):
     email: str = Field(unique=True, index=True)
     password_hash: str
     role: UserRole = Field(sa_column=Column(SAEnum(UserRole, native_enum=False), index=True))
+    token_version: int = Field(default=0, sa_column_kwargs={"server_default": "0"})
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
@@ -104,6 +105,11 @@ class Appointment(SQLModel, table=True):
     )
     consultation: Optional["Consultation"] = Relationship(back_populates="appointment", sa_relationship_kwargs={"uselist": False})
 
+# /appointments/me keyset pagination: per-role filter, then (scheduled_at, id)
+_appointments = Appointment.__table__
+Index("ix_appointments_patient_scheduled", _appointments.c.patient_id, _appointments.c.scheduled_at, _appointments.c.id)
+Index("ix_appointments_doctor_scheduled", _appointments.c.doctor_id, _appointments.c.scheduled_at, _appointments.c.id)
+
 class ConsultationStatus(str, Enum):
     SCHEDULED = "SCHEDULED"
     IN_PROGRESS = "IN_PROGRESS"
@@ -111,6 +117,16 @@ class ConsultationStatus(str, Enum):
     CANCELLED = "CANCELLED"
     FAILED = "FAILED"
 
+class ProcessingStage(str, Enum):
+    """Last pipeline stage checkpointed for a consultation; a retry resumes after it."""
+    PENDING = "PENDING"
+    TRANSCRIBED = "TRANSCRIBED"
+    SOAP_GENERATED = "SOAP_GENERATED"
+    TRIAGED = "TRIAGED"
+    SAFETY_CHECKED = "SAFETY_CHECKED"
+
+PROCESSING_STAGE_ORDER = list(ProcessingStage)
+
 class TriageCategory(str, Enum):
     CRITICAL = "CRITICAL"
     HIGH = "HIGH"
@@ -137,6 +153,10 @@ class Consultation(SQLModel, table=True):
     )
     safety_warnings: Optional[List[dict]] = Field(default=None, sa_column=Column(JSON))
     requires_manual_review: bool = Field(default=False)
+    processing_stage: ProcessingStage = Field(
+        default=ProcessingStage.PENDING,
+        sa_column=Column(SAEnum(ProcessingStage, native_enum=False), nullable=False, default=ProcessingStage.PENDING, server_default=ProcessingStage.PENDING.value),
+    )
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
@@ -144,6 +164,103 @@ class Consultation(SQLModel, table=True):
     audio_file: Optional["AudioFile"] = Relationship(back_populates="consultation", sa_relationship_kwargs={"uselist": False})
     soap_note: Optional["SOAPNote"] = Relationship(back_populates="consultation", sa_relationship_kwargs={"uselist": False})
 
+# Listing indexes (see migrations/versions/0003_pagination_indexes.py)
+_consultations = Consultation.__table__
+# /consultations/me keyset pagination: per-role filter, then (created_at, id)
+Index("ix_consultations_patient_created", _consultations.c.patient_id, _consultations.c.created_at, _consultations.c.id)
+Index("ix_consultations_doctor_created", _consultations.c.doctor_id, _consultations.c.created_at, _consultations.c.id)
+Index("ix_consultations_created", _consultations.c.created_at, _consultations.c.id)
+# The queue endpoints read triage_queue (see its indexes below), not consultations;
+# 0012 dropped the consultations queue indexes from 0001.
+
+class TriageQueueEntry(SQLModel, table=True):
+    """
+    Denormalized, read-optimized copy of the live queue: one row per consultation
+    with the patient's name/phone already joined in. Maintained by the write paths
+    through TriageQueueService; the queue endpoints read only this table.
+    """
+    __tablename__ = "triage_queue"
+    consultation_id: UUID = Field(foreign_key="consultations.id", primary_key=True)
+    appointment_id: UUID = Field(index=True)
+    patient_id: UUID = Field(index=True)
+    doctor_id: Optional[UUID] = None
+    doctor_name: Optional[str] = None
+    patient_name: str
+    phone: Optional[str] = None
+    status: ConsultationStatus = Field(
+        sa_column=Column(SAEnum(ConsultationStatus, native_enum=False), nullable=False)
+    )
+    appointment_status: Optional[AppointmentStatus] = Field(
+        default=None, sa_column=Column(SAEnum(AppointmentStatus, native_enum=False), nullable=True)
+    )
+    urgency_score: int = Field(default=0) # 0 = not triaged yet
+    triage_category: Optional[TriageCategory] = Field(
+        default=None, sa_column=Column(SAEnum(TriageCategory, native_enum=False), nullable=True)
+    )
+    symptoms: Optional[str] = None
+    safety_warning_count: int = Field(default=0)
+    requires_manual_review: bool = Field(default=False)
+    checked_in_at: datetime
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+_triage_queue = TriageQueueEntry.__table__
+Index(
+    "ix_triage_queue_status_urgency_checkin",
+    _triage_queue.c.status, _triage_queue.c.urgency_score.desc(), _triage_queue.c.checked_in_at,
+)
+Index(
+    "ix_triage_queue_open_urgency_checkin",
+    _triage_queue.c.urgency_score.desc(), _triage_queue.c.checked_in_at,
+    postgresql_where=_triage_queue.c.status != ConsultationStatus.COMPLETED.value,
+    sqlite_where=_triage_queue.c.status != ConsultationStatus.COMPLETED.value,
+)
+Index(
+    "ix_triage_queue_manual_review_checkin",
+    _triage_queue.c.checked_in_at,
+    postgresql_where=_triage_queue.c.requires_manual_review == True,
+    sqlite_where=_triage_queue.c.requires_manual_review == True,
+)
+
+class JobStatus(str, Enum):
+    QUEUED = "QUEUED"
+    RUNNING = "RUNNING"
+    SUCCEEDED = "SUCCEEDED"
+    FAILED = "FAILED"
+
+class ProcessingJob(SQLModel, table=True):
+    """
+    Durable work item for the AI pipeline. Claimed with FOR UPDATE SKIP LOCKED and
+    held under a lease; a worker that dies lets the lease expire and another reclaims it.
+    See JobQueueService.
+    """
+    __tablename__ = "processing_jobs"
+    id: UUID = Field(default_factory=uuid4, primary_key=True)
+    consultation_id: UUID = Field(foreign_key="consultations.id", index=True)
+    status: JobStatus = Field(
+        sa_column=Column(SAEnum(JobStatus, native_enum=False), nullable=False, default=JobStatus.QUEUED)
+    )
+    attempts: int = Field(default=0)
+    max_attempts: int = Field(default=3)
+    available_at: datetime = Field(default_factory=datetime.utcnow) # not before (retry backoff)
+    lease_owner: Optional[str] = None
+    lease_expires_at: Optional[datetime] = None
+    last_error: Optional[str] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+_processing_jobs = ProcessingJob.__table__
+# Claim scan: QUEUED jobs in due order, and RUNNING jobs by lease expiry (reclaim)
+Index("ix_processing_jobs_status_available", _processing_jobs.c.status, _processing_jobs.c.available_at)
+Index("ix_processing_jobs_status_lease", _processing_jobs.c.status, _processing_jobs.c.lease_expires_at)
+# At most one live job per consultation, so a double upload can't process twice
+Index(
+    "uq_processing_jobs_active_consultation",
+    _processing_jobs.c.consultation_id,
+    unique=True,
+    postgresql_where=_processing_jobs.c.status.in_([JobStatus.QUEUED.value, JobStatus.RUNNING.value]),
+    sqlite_where=_processing_jobs.c.status.in_([JobStatus.QUEUED.value, JobStatus.RUNNING.value]),
+)
+
 class AudioUploaderType(str, Enum):
     PATIENT = "PATIENT"
     DOCTOR = "DOCTOR"
@@ -162,10 +279,46 @@ class AudioFile(SQLModel, table=True):
     duration: Optional[float] = None
     mime_type: Optional[str] = None
     transcription: Optional[str] = None # Text field
+    # Kept so a resumed run can rebuild the speaker-labelled prompt without re-transcribing
+    transcript_utterances: Optional[List[dict]] = Field(default=None, sa_column=Column(JSON))
+    transcript_confidence: Optional[float] = None
+    content_sha256: Optional[str] = Field(default=None, index=True) # hex digest of the uploaded bytes
+    uploaded_size: Optional[int] = None # bytes sent to the STT provider after normalization (file_size is the original)
     uploaded_at: datetime = Field(default_factory=datetime.utcnow)
 
     consultation: Consultation = Relationship(back_populates="audio_file")
 
+class TranscriptCacheEntry(SQLModel, table=True):
+    """
+    Provider transcripts by audio content: key = sha256(audio bytes) + STT config
+    fingerprint, so identical audio sent with identical settings is transcribed once.
+    """
+    __tablename__ = "transcript_cache"
+    content_sha256: str = Field(primary_key=True)
+    config_fingerprint: str = Field(primary_key=True)
+    text: Optional[str] = None
+    utterances: Optional[List[dict]] = Field(default=None, sa_column=Column(JSON))
+    confidence: Optional[float] = None
+    provider_transcript_id: Optional[str] = None
+    hit_count: int = Field(default=0)
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    last_hit_at: Optional[datetime] = None
+
+class SoapCacheEntry(SQLModel, table=True):
+    """
+    Parsed SOAP generations keyed by sha256(prompt version, model, formatted transcript,
+    patient context). Bounded by SOAP_CACHE_MAX_ENTRIES, least recently used evicted first.
+    """
+    __tablename__ = "soap_cache"
+    cache_key: str = Field(primary_key=True)
+    model_name: str
+    prompt_version: str
+    result_json: dict = Field(sa_column=Column(JSON, nullable=False))
+    size_bytes: int
+    hit_count: int = Field(default=0)
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    last_used_at: datetime = Field(default_factory=datetime.utcnow, index=True)
+
 class SOAPNote(SQLModel, table=True):
     __tablename__ = "soap_notes"
     id: UUID = Field(default_factory=uuid4, primary_key=True)
@@ -186,6 +339,11 @@ class AILog(SQLModel, table=True):
     consultation_id: Optional[UUID] = Field(foreign_key="consultations.id", nullable=True)
     model_version: str
     status: str # SUCCESS, FAIL
-    latency_ms: Optional[float] = None
+    latency_ms: Optional[float] = None # whole SOAP stage: model_latency_ms + overhead_ms
+    model_latency_ms: Optional[float] = None # inside the Gemini call; None when served from cache
+    overhead_ms: Optional[float] = None # prompt building, cache, limiter queueing, retries, parsing
     error_message: Optional[str] = None
+    cache_hit: Optional[bool] = None # served from soap_cache without a model call
+    transcript_tokens_before: Optional[int] = None # estimated, transcript as transcribed
+    transcript_tokens_after: Optional[int] = None # estimated, as sent after compaction
     created_at: datetime = Field(default_factory=datetime.utcnow)
@@ -0,0 +1,162 @@
+"""
+AssemblyAI over its REST API with httpx: upload, submit and poll as coroutines on a
+shared connection pool, so an in-flight transcription costs no thread (the SDK's
+transcriber.transcribe() blocks one for the whole job, polling included).
+
+Poll timing adapts: jobs are expected to finish after the observed queue time plus
+audio duration x the observed real-time factor, so we poll sparsely early on and
+densely around the expected finish instead of every few seconds throughout.
+"""
+import asyncio
+import threading
+import time
+from typing import Any, AsyncIterator, Dict, Optional
+
+import httpx
+
+from app.core.config import settings
+
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+
+
+class AssemblyAIError(Exception):
+    pass
+
+
+class PollingModel:
+    """
+    Running estimates (EWMA) of how long jobs sit queued and how fast they process,
+    per process. next_delay() aims polls at the expected completion time.
+    """
+
+    def __init__(self, queue_seconds: float = 3.0, realtime_factor: float = 0.25,
+                 processing_seconds: float = 30.0, alpha: float = 0.3):
+        self.queue_seconds = queue_seconds
+        self.realtime_factor = realtime_factor  # processing seconds per second of audio
+        self.processing_seconds = processing_seconds  # for audio of unknown duration
+        self.alpha = alpha
+        self._lock = threading.Lock()
+        self.completed = 0
+        self.polls = 0
+
+    def expected_seconds(self, audio_seconds: Optional[float]) -> float:
+        if audio_seconds:
+            return self.queue_seconds + self.realtime_factor * audio_seconds
+        return self.queue_seconds + self.processing_seconds
+
+    def next_delay(self, elapsed: float, expected: float) -> float:
+        """Half the remaining expected time; once overdue, back off with how late the job is."""
+        remaining = expected - elapsed
+        delay = remaining / 2 if remaining > 0 else (elapsed - expected) / 2
+        return min(max(delay, settings.ASSEMBLYAI_POLL_MIN_SECONDS), settings.ASSEMBLYAI_POLL_MAX_SECONDS)
+
+    def count_poll(self):
+        with self._lock:
+            self.polls += 1
+
+    def observe(self, audio_seconds: Optional[float], queued: Optional[float], processing: float):
+        with self._lock:
+            a = self.alpha
+            self.completed += 1
+            if queued is not None:
+                self.queue_seconds += a * (queued - self.queue_seconds)
+            self.processing_seconds += a * (processing - self.processing_seconds)
+            if audio_seconds:
+                self.realtime_factor += a * (processing / audio_seconds - self.realtime_factor)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "completed": self.completed,
+                "polls": self.polls,
+                "queue_seconds": round(self.queue_seconds, 2),
+                "realtime_factor": round(self.realtime_factor, 3),
+                "processing_seconds": round(self.processing_seconds, 2),
+            }
+
+
+class AssemblyAIClient:
+    def __init__(self, base_url: Optional[str] = None, api_key: Optional[str] = None,
+                 transport: Optional[httpx.AsyncBaseTransport] = None, sleep=asyncio.sleep):
+        self.base_url = base_url or settings.ASSEMBLYAI_BASE_URL
+        self.api_key = api_key or settings.ASSEMBLYAI_API_KEY
+        self.transport = transport
+        self.polling = PollingModel()
+        self._sleep = sleep
+        # httpx clients bind to a loop; recreated if used from another one (like ProviderLimiter)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def _http(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._loop is not loop:
+            self._loop = loop
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers={"authorization": self.api_key},
+                timeout=httpx.Timeout(settings.ASSEMBLYAI_HTTP_TIMEOUT_SECONDS),
+                limits=httpx.Limits(
+                    max_connections=settings.ASSEMBLYAI_HTTP_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.ASSEMBLYAI_HTTP_MAX_CONNECTIONS,
+                ),
+                transport=self.transport,
+            )
+        return self._client
+
+    async def aclose(self):
+        if self._client is not None and self._loop is asyncio.get_running_loop():
+            await self._client.aclose()
+        self._client, self._loop = None, None
+
+    @staticmethod
+    async def _file_chunks(path: str) -> AsyncIterator[bytes]:
+        with open(path, "rb") as f:
+            while True:
+                chunk = await asyncio.to_thread(f.read, UPLOAD_CHUNK_BYTES)
+                if not chunk:
+                    return
+                yield chunk
+
+    async def upload(self, path: str) -> str:
+        response = await self._http().post("/v2/upload", content=self._file_chunks(path))
+        response.raise_for_status()
+        return response.json()["upload_url"]
+
+    async def submit(self, audio_url: str, params: Dict[str, Any]) -> str:
+        response = await self._http().post("/v2/transcript", json={"audio_url": audio_url, **params})
+        response.raise_for_status()
+        return response.json()["id"]
+
+    async def wait(self, transcript_id: str, audio_seconds: Optional[float] = None) -> Dict[str, Any]:
+        """Polls until the transcript completes; raises AssemblyAIError if it errors."""
+        submitted = time.monotonic()
+        started_processing: Optional[float] = None
+        expected = self.polling.expected_seconds(audio_seconds)
+        while True:
+            await self._sleep(self.polling.next_delay(time.monotonic() - submitted, expected))
+            response = await self._http().get(f"/v2/transcript/{transcript_id}")
+            response.raise_for_status()
+            transcript = response.json()
+            self.polling.count_poll()
+
+            status = transcript["status"]
+            now = time.monotonic()
+            if status == "processing" and started_processing is None:
+                started_processing = now
+                # Queue time is known now; re-aim at the finish
+                expected = (now - submitted) + self.polling.realtime_factor * audio_seconds if audio_seconds else expected
+            elif status == "completed":
+                queued = started_processing - submitted if started_processing is not None else None
+                self.polling.observe(audio_seconds, queued, now - (started_processing or submitted))
+                return transcript
+            elif status == "error":
+                raise AssemblyAIError(f"Transcription failed: {transcript.get('error')}")
+
+    async def transcribe(self, path: str, params: Dict[str, Any], audio_seconds: Optional[float] = None) -> Dict[str, Any]:
+        """Upload, submit and wait; returns the completed transcript JSON."""
+        audio_url = await self.upload(path)
+        transcript_id = await self.submit(audio_url, params)
+        return await self.wait(transcript_id, audio_seconds)
+
+
+assemblyai_client = AssemblyAIClient()
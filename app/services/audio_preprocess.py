@@ -0,0 +1,494 @@
+"""
+Audio normalization before speech-to-text: downmix to mono and resample to
+AUDIO_TARGET_SAMPLE_RATE. Speech recognition gains nothing from stereo 44.1/48 kHz,
+so this cuts what we upload to the provider several times over. Optionally
+(AUDIO_VAD_ENABLED) long silences are trimmed as well, with an offset map to put
+transcript timestamps back on the original audio's clock; compressed formats are
+decoded to PCM with ffmpeg for that.
+
+Codecs are looked up by file extension. WAV is handled here with NumPy and the
+stdlib; other formats use ffmpeg when it is installed and are otherwise sent as-is.
+The work runs in a small process pool so the resampling doesn't hold the GIL of
+the process running the pipeline.
+"""
+import asyncio
+import logging
+import multiprocessing
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import wave
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from bisect import bisect_right
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# codec(source_path, dest_base, target_rate) -> path of the normalized file, or None to send the source as-is.
+# dest_base has no extension; the codec picks one matching what it writes.
+Codec = Callable[[str, str, int], Optional[str]]
+
+_codecs: Dict[str, Codec] = {}
+
+
+def register_codec(extensions: Iterable[str], codec: Codec):
+    """Registers `codec` for the given extensions (".wav", ...). Register at import time so pool workers see it."""
+    for ext in extensions:
+        _codecs[ext.lower()] = codec
+
+
+# --- WAV (NumPy) ---
+
+READ_BLOCK_FRAMES = 1 << 18
+FILTER_TAPS = 101
+FILTER_BLOCK = 1 << 16
+
+
+def _pcm_to_float(raw: bytes, sample_width: int) -> np.ndarray:
+    if sample_width == 1:
+        return (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128) / 128
+    if sample_width == 2:
+        return np.frombuffer(raw, dtype="<i2").astype(np.float32) / 32768
+    if sample_width == 3:
+        b = np.frombuffer(raw, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+        ints = b[:, 0] | (b[:, 1] << 8) | (b[:, 2] << 16)
+        ints = np.where(ints & 0x800000, ints - (1 << 24), ints)
+        return ints.astype(np.float32) / (1 << 23)
+    if sample_width == 4:
+        return np.frombuffer(raw, dtype="<i4").astype(np.float32) / (1 << 31)
+    raise ValueError(f"Unsupported sample width {sample_width}")
+
+
+def _lowpass(signal: np.ndarray, cutoff: float) -> np.ndarray:
+    """Windowed-sinc low-pass (cutoff in cycles/sample), applied by FFT overlap-add; same length as the input."""
+    n = np.arange(FILTER_TAPS) - (FILTER_TAPS - 1) / 2
+    taps = 2 * cutoff * np.sinc(2 * cutoff * n) * np.hamming(FILTER_TAPS)
+    taps /= taps.sum()
+
+    nfft = 1 << int(np.ceil(np.log2(FILTER_BLOCK + FILTER_TAPS - 1)))
+    spectrum = np.fft.rfft(taps, nfft)
+    out = np.zeros(len(signal) + FILTER_TAPS - 1, dtype=np.float32)
+    for start in range(0, len(signal), FILTER_BLOCK):
+        block = signal[start:start + FILTER_BLOCK]
+        filtered = np.fft.irfft(np.fft.rfft(block, nfft) * spectrum, nfft)[:len(block) + FILTER_TAPS - 1]
+        out[start:start + len(filtered)] += filtered
+    delay = (FILTER_TAPS - 1) // 2
+    return out[delay:delay + len(signal)]
+
+
+def resample(signal: np.ndarray, source_rate: int, target_rate: int) -> np.ndarray:
+    """Band-limits to 0.45 * target_rate, then interpolates at the target sample times."""
+    if source_rate == target_rate or len(signal) == 0:
+        return signal
+    if target_rate < source_rate:
+        signal = _lowpass(signal, 0.45 * target_rate / source_rate)
+    n_out = int(len(signal) * target_rate / source_rate)
+    positions = np.arange(n_out, dtype=np.float64) * (source_rate / target_rate)
+    return np.interp(positions, np.arange(len(signal)), signal).astype(np.float32)
+
+
+def read_wav_mono(path: str):
+    """(mono float32 samples in [-1, 1), sample rate). Raises wave.Error for non-PCM files."""
+    with wave.open(path, "rb") as wav:
+        channels, width, rate = wav.getnchannels(), wav.getsampwidth(), wav.getframerate()
+        blocks = []
+        while True:
+            raw = wav.readframes(READ_BLOCK_FRAMES)
+            if not raw:
+                break
+            samples = _pcm_to_float(raw, width)
+            blocks.append(samples.reshape(-1, channels).mean(axis=1) if channels > 1 else samples)
+    mono = np.concatenate(blocks) if blocks else np.zeros(0, dtype=np.float32)
+    return mono, rate
+
+
+def write_wav_pcm16(path: str, samples: np.ndarray, rate: int):
+    pcm = np.clip(np.round(samples * 32767), -32768, 32767).astype("<i2")
+    with wave.open(path, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(pcm.tobytes())
+
+
+def normalize_wav(source_path: str, dest_base: str, target_rate: int) -> Optional[str]:
+    try:
+        with wave.open(source_path, "rb") as wav:
+            channels, width, rate = wav.getnchannels(), wav.getsampwidth(), wav.getframerate()
+    except (wave.Error, EOFError):
+        return None  # compressed or extensible WAV: leave it to the provider
+    if channels == 1 and width <= 2 and rate <= target_rate:
+        return None  # already as small as this codec makes it
+    samples, rate = read_wav_mono(source_path)
+    dest = dest_base + ".wav"
+    write_wav_pcm16(dest, resample(samples, rate, min(rate, target_rate)), min(rate, target_rate))
+    return dest
+
+
+# --- Compressed formats (ffmpeg) ---
+
+def normalize_with_ffmpeg(source_path: str, dest_base: str, target_rate: int) -> Optional[str]:
+    """Mono Opus at AUDIO_OPUS_BITRATE; None when ffmpeg isn't installed or can't read the file."""
+    binary = shutil.which(settings.AUDIO_FFMPEG_BINARY)
+    if binary is None:
+        return None
+    dest = dest_base + ".ogg"
+    completed = subprocess.run(
+        [binary, "-nostdin", "-v", "error", "-y", "-i", source_path,
+         "-ac", "1", "-ar", str(target_rate), "-c:a", "libopus", "-b:a", settings.AUDIO_OPUS_BITRATE, dest],
+        capture_output=True,
+    )
+    return dest if completed.returncode == 0 else None
+
+
+def decode_with_ffmpeg(source_path: str, dest_base: str, target_rate: int) -> Optional[str]:
+    """Mono 16-bit PCM WAV at target_rate, for the stages that need samples (VAD, chunking)."""
+    binary = shutil.which(settings.AUDIO_FFMPEG_BINARY)
+    if binary is None:
+        return None
+    dest = dest_base + ".wav"
+    completed = subprocess.run(
+        [binary, "-nostdin", "-v", "error", "-y", "-i", source_path,
+         "-ac", "1", "-ar", str(target_rate), "-c:a", "pcm_s16le", dest],
+        capture_output=True,
+    )
+    return dest if completed.returncode == 0 else None
+
+
+register_codec([".wav"], normalize_wav)
+register_codec([".mp3", ".m4a", ".aac"], normalize_with_ffmpeg)
+
+
+def normalize_file(source_path: str, dest_base: str, target_rate: int) -> Optional[str]:
+    """Runs the codec for source_path's extension. Executes in the preprocessing pool."""
+    codec = _codecs.get(os.path.splitext(source_path)[1].lower())
+    return codec(source_path, dest_base, target_rate) if codec else None
+
+
+# --- Silence trimming (energy VAD) ---
+
+VAD_FRAME_MS = 30
+VAD_PAD_MS = 200  # speech is extended by this much on both sides before deciding what is silence
+VAD_ABSOLUTE_FLOOR_DB = -60.0
+
+# [[output_ms, original_ms], ...]: each kept stretch of audio, where it starts in the
+# trimmed file and where it came from in the original, sorted by output_ms.
+OffsetMap = List[List[int]]
+
+
+def _runs(mask: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Start and end (exclusive) indices of the True runs in mask."""
+    edges = np.diff(np.concatenate(([0], mask.astype(np.int8), [0])))
+    return np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+
+
+def frame_energy_db(samples: np.ndarray, rate: int) -> np.ndarray:
+    """Energy of each VAD_FRAME_MS frame in dBFS (a trailing partial frame is ignored)."""
+    frame = max(1, rate * VAD_FRAME_MS // 1000)
+    n_frames = len(samples) // frame
+    frames = samples[:n_frames * frame].reshape(n_frames, frame).astype(np.float64)
+    return 10 * np.log10(np.mean(frames ** 2, axis=1) + 1e-12)
+
+
+def speech_frames(samples: np.ndarray, rate: int, margin_db: float) -> np.ndarray:
+    """
+    Per-frame speech mask. A frame is speech when its energy is margin_db above the
+    recording's noise floor (10th percentile), capped so a recording that is nearly
+    all speech doesn't have its quieter half classed as silence.
+    """
+    energy_db = frame_energy_db(samples, rate)
+    if len(energy_db) == 0:
+        return np.ones(0, dtype=bool)
+    noise_floor, loud = np.percentile(energy_db, [10, 95])
+    threshold = max(min(noise_floor + margin_db, loud - 15.0), VAD_ABSOLUTE_FLOOR_DB)
+    speech = energy_db > threshold
+
+    pad = VAD_PAD_MS // VAD_FRAME_MS
+    return np.convolve(speech, np.ones(2 * pad + 1), mode="same") > 0
+
+
+def trim_silence(samples: np.ndarray, rate: int, min_silence_ms: int, keep_silence_ms: int,
+                 margin_db: float) -> Tuple[np.ndarray, OffsetMap]:
+    """
+    Shortens every silence longer than min_silence_ms to keep_silence_ms (half kept at
+    each edge, so pauses still read as pauses). Returns the trimmed samples and the
+    offset map; the map is empty when nothing was removed.
+    """
+    speech = speech_frames(samples, rate, margin_db)
+    frame = max(1, rate * VAD_FRAME_MS // 1000)
+    min_silence = min_silence_ms // VAD_FRAME_MS
+    keep_half = keep_silence_ms // VAD_FRAME_MS // 2
+
+    starts, ends = _runs(~speech)
+    long_runs = (ends - starts) > max(min_silence, 2 * keep_half)
+    if not long_runs.any() or not speech.any():
+        return samples, []
+
+    # Mark [start + keep_half, end - keep_half) of each long silence for removal
+    marks = np.zeros(len(speech) + 1, dtype=np.int32)
+    np.add.at(marks, starts[long_runs] + keep_half, 1)
+    np.add.at(marks, ends[long_runs] - keep_half, -1)
+    keep = np.cumsum(marks)[:-1] == 0
+
+    kept_starts, kept_ends = _runs(keep)
+    sample_starts = kept_starts * frame
+    sample_ends = np.where(kept_ends == len(keep), len(samples), kept_ends * frame)  # tail past the last frame
+    lengths = sample_ends - sample_starts
+    output_starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+
+    trimmed = np.concatenate([samples[a:b] for a, b in zip(sample_starts, sample_ends)])
+    offset_map = [
+        [int(round(out * 1000 / rate)), int(round(orig * 1000 / rate))]
+        for out, orig in zip(output_starts, sample_starts)
+    ]
+    return trimmed, offset_map
+
+
+def to_original_ms(t_ms: Optional[int], offset_map: OffsetMap) -> Optional[int]:
+    """Maps a timestamp in the trimmed audio back to the original recording."""
+    if t_ms is None or not offset_map:
+        return t_ms
+    i = max(0, bisect_right([out for out, _ in offset_map], t_ms) - 1)
+    out, orig = offset_map[i]
+    return orig + (t_ms - out)
+
+
+def trim_silence_wav(source_path: str, dest_base: str, min_silence_ms: int, keep_silence_ms: int,
+                     margin_db: float) -> Optional[Tuple[str, OffsetMap, float]]:
+    """(trimmed path, offset map, seconds removed), or None when there is nothing worth removing."""
+    try:
+        samples, rate = read_wav_mono(source_path)
+    except (wave.Error, EOFError):
+        return None
+    trimmed, offset_map = trim_silence(samples, rate, min_silence_ms, keep_silence_ms, margin_db)
+    if not offset_map:
+        return None
+    dest = dest_base + ".wav"
+    write_wav_pcm16(dest, trimmed, rate)
+    return dest, offset_map, (len(samples) - len(trimmed)) / rate
+
+
+# --- Chunking for parallel transcription ---
+
+CHUNK_CUT_SEARCH_SECONDS = 15.0  # how far from the ideal boundary to look for a quiet cut point
+CHUNK_CUT_SMOOTHING_MS = 300  # cut in the middle of a quiet stretch, not on a single quiet frame
+
+
+@dataclass
+class AudioChunk:
+    """
+    One piece of the prepared audio. Times are ms in the prepared audio: the file
+    covers [start_ms, start_ms + its length) including overlap with its neighbours,
+    and owns utterances whose midpoint falls in [own_start_ms, own_end_ms).
+    """
+    path: str
+    start_ms: int
+    own_start_ms: int
+    own_end_ms: int
+
+
+def plan_chunks(samples: np.ndarray, rate: int, chunk_seconds: float,
+                overlap_seconds: float) -> List[Tuple[int, int, int, int]]:
+    """
+    (start, end, own_start, own_end) sample ranges splitting the audio near every
+    chunk_seconds at its quietest point. Empty when the audio is short enough for one job.
+    """
+    n = len(samples)
+    target = int(chunk_seconds * rate)
+    if n <= target * 1.5:
+        return []
+
+    frame = max(1, rate * VAD_FRAME_MS // 1000)
+    smoothing = max(1, CHUNK_CUT_SMOOTHING_MS // VAD_FRAME_MS)
+    energy = np.convolve(frame_energy_db(samples, rate), np.ones(smoothing) / smoothing, mode="same")
+    target_frames = target // frame
+    # Never look further than a quarter chunk either way, so every chunk is at least ~3/4 of the target
+    search = min(int(CHUNK_CUT_SEARCH_SECONDS * 1000 // VAD_FRAME_MS), target_frames // 4)
+
+    cuts = []
+    position = 0
+    while n - position > target * 1.5:
+        ideal = position // frame + target_frames
+        lo = max(position // frame + target_frames // 2, ideal - search)
+        hi = min(len(energy), ideal + search + 1)
+        if hi > lo:
+            window = np.arange(lo, hi)
+            # Quietest point; a tiny distance penalty breaks ties (flat audio) towards the ideal cut
+            cut = int(window[np.argmin(energy[lo:hi] + 1e-3 * np.abs(window - ideal))]) * frame
+        else:
+            cut = ideal * frame
+        cuts.append(cut)
+        position = cut
+
+    bounds = [0] + cuts + [n]
+    overlap = int(overlap_seconds * rate)
+    return [
+        (max(0, bounds[i] - overlap), min(n, bounds[i + 1] + overlap), bounds[i], bounds[i + 1])
+        for i in range(len(bounds) - 1)
+    ]
+
+
+def split_wav(source_path: str, dest_base: str, chunk_seconds: float, overlap_seconds: float) -> List[AudioChunk]:
+    try:
+        samples, rate = read_wav_mono(source_path)
+    except (wave.Error, EOFError):
+        return []
+    chunks = []
+    for i, (start, end, own_start, own_end) in enumerate(plan_chunks(samples, rate, chunk_seconds, overlap_seconds)):
+        path = f"{dest_base}-{i:03d}.wav"
+        write_wav_pcm16(path, samples[start:end], rate)
+        ms = lambda sample: int(round(sample * 1000 / rate))  # noqa: E731
+        chunks.append(AudioChunk(path, ms(start), ms(own_start), ms(own_end)))
+    return chunks
+
+
+def prepare_file(source_path: str, workdir: str, target_rate: Optional[int], vad: Optional[Dict[str, float]],
+                 chunking: Optional[Dict[str, float]]) -> Dict[str, object]:
+    """
+    Normalization (when target_rate is given), silence trimming (`vad`), then splitting
+    (`chunking`). Executes in the preprocessing pool. Returns the path to send, the
+    offset map, seconds trimmed and the chunks (empty: send `path` as one job).
+    """
+    path, offset_map, trimmed_seconds = source_path, [], 0.0
+    if target_rate:
+        normalized = normalize_file(source_path, os.path.join(workdir, "normalized"), target_rate)
+        if normalized is not None and os.path.getsize(normalized) < os.path.getsize(source_path):
+            path = normalized
+
+    # VAD and chunking need samples: compressed input is decoded to PCM for them, and
+    # what they produce is re-encoded so the upload doesn't grow
+    compressed = not path.lower().endswith(".wav")
+    pcm = path if not compressed else None
+    if compressed and (vad or chunking):
+        pcm = decode_with_ffmpeg(source_path, os.path.join(workdir, "decoded"),
+                                 target_rate or settings.AUDIO_TARGET_SAMPLE_RATE)
+
+    if vad and pcm:
+        trimmed = trim_silence_wav(pcm, os.path.join(workdir, "trimmed"), **vad)
+        if trimmed is not None:
+            pcm, offset_map, trimmed_seconds = trimmed
+            path = pcm
+            if compressed:
+                path = normalize_with_ffmpeg(pcm, os.path.join(workdir, "trimmed-encoded"), target_rate) or pcm
+
+    chunks = []
+    if chunking and pcm:
+        chunks = split_wav(pcm, os.path.join(workdir, "chunk"), **chunking)
+        if compressed:
+            for chunk in chunks:
+                encoded = normalize_with_ffmpeg(chunk.path, os.path.splitext(chunk.path)[0] + "-encoded",
+                                                target_rate or settings.AUDIO_TARGET_SAMPLE_RATE)
+                chunk.path = encoded or chunk.path
+    return {"path": path, "offset_map": offset_map, "trimmed_seconds": trimmed_seconds, "chunks": chunks}
+
+
+# --- Pipeline entry point ---
+
+_audio_pool: Optional[ProcessPoolExecutor] = None
+_audio_pool_lock = threading.Lock()
+
+
+def _get_audio_pool() -> ProcessPoolExecutor:
+    global _audio_pool
+    if _audio_pool is None:
+        with _audio_pool_lock:
+            if _audio_pool is None:
+                # spawn, not fork: a forked child would inherit the worker's threads, held locks and DB connections
+                _audio_pool = ProcessPoolExecutor(
+                    max_workers=settings.AUDIO_PREPROCESS_WORKERS, mp_context=multiprocessing.get_context("spawn"),
+                )
+    return _audio_pool
+
+
+def shutdown_audio_pool():
+    global _audio_pool
+    with _audio_pool_lock:
+        if _audio_pool is not None:
+            _audio_pool.shutdown(wait=False, cancel_futures=True)
+            _audio_pool = None
+
+
+@dataclass
+class PreparedAudio:
+    path: str  # what to send to the provider
+    original_bytes: int
+    upload_bytes: int
+    offset_map: OffsetMap = field(default_factory=list)
+    trimmed_seconds: float = 0.0
+    chunks: List[AudioChunk] = field(default_factory=list)  # non-empty: transcribe these instead of `path`
+
+    def to_original_ms(self, t_ms: Optional[int]) -> Optional[int]:
+        return to_original_ms(t_ms, self.offset_map)
+
+
+def _vad_settings() -> Optional[Dict[str, float]]:
+    if not settings.AUDIO_VAD_ENABLED:
+        return None
+    return {
+        "min_silence_ms": settings.AUDIO_VAD_MIN_SILENCE_MS,
+        "keep_silence_ms": settings.AUDIO_VAD_KEEP_SILENCE_MS,
+        "margin_db": settings.AUDIO_VAD_MARGIN_DB,
+    }
+
+
+def _chunking_settings() -> Optional[Dict[str, float]]:
+    if not settings.STT_CHUNKING_ENABLED:
+        return None
+    return {"chunk_seconds": settings.STT_CHUNK_SECONDS, "overlap_seconds": settings.STT_CHUNK_OVERLAP_SECONDS}
+
+
+class AudioPreprocessService:
+    @staticmethod
+    def profile() -> Dict[str, object]:
+        """Settings that change the audio sent to the provider (part of the transcript cache fingerprint)."""
+        profile: Dict[str, object] = {"normalize": settings.AUDIO_NORMALIZE_ENABLED}
+        if settings.AUDIO_NORMALIZE_ENABLED:
+            profile.update(sample_rate=settings.AUDIO_TARGET_SAMPLE_RATE, opus_bitrate=settings.AUDIO_OPUS_BITRATE)
+            if settings.AUDIO_VAD_ENABLED:
+                profile["vad"] = _vad_settings()
+        if settings.STT_CHUNKING_ENABLED:
+            profile["chunking"] = _chunking_settings()
+        return profile
+
+    @staticmethod
+    @asynccontextmanager
+    async def prepared(source_path: str):
+        """
+        Yields a PreparedAudio for source_path: the normalized (and, with AUDIO_VAD_ENABLED,
+        silence-trimmed) copy when that is smaller than the original, else the original;
+        split into chunks when STT_CHUNKING_ENABLED and it is long. Copies are deleted on exit.
+        """
+        original_bytes = os.path.getsize(source_path)
+        normalize = settings.AUDIO_NORMALIZE_ENABLED
+        vad = _vad_settings() if normalize else None
+        chunking = _chunking_settings()
+        if not normalize and not chunking:
+            yield PreparedAudio(source_path, original_bytes, original_bytes)
+            return
+
+        workdir = tempfile.mkdtemp(prefix="audio-")
+        try:
+            try:
+                prepared = await asyncio.get_running_loop().run_in_executor(
+                    _get_audio_pool(), prepare_file, source_path, workdir,
+                    settings.AUDIO_TARGET_SAMPLE_RATE if normalize else None, vad, chunking,
+                )
+            except Exception:
+                # Preprocessing only saves bandwidth and time; never fail a transcription over it
+                logger.exception("Preprocessing %s failed; sending the original", source_path)
+                prepared = {"path": source_path, "offset_map": [], "trimmed_seconds": 0.0, "chunks": []}
+            path = prepared["path"]
+            yield PreparedAudio(
+                path, original_bytes, os.path.getsize(path),
+                prepared["offset_map"], prepared["trimmed_seconds"], prepared["chunks"],
+            )
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
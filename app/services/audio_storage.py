@@ -0,0 +1,60 @@
+import hashlib
+import os
+import wave
+from dataclasses import dataclass
+from typing import BinaryIO, Optional
+
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+
+
+class UploadTooLarge(ValueError):
+    pass
+
+
+@dataclass
+class StoredAudio:
+    size: int
+    sha256: str
+    duration: Optional[float]
+
+
+class AudioStorageService:
+    """
+    Writes uploaded audio to disk. Blocking; call through a thread
+    (run_in_threadpool) so a large recording doesn't stall the event loop.
+    """
+
+    @staticmethod
+    def save(source: BinaryIO, dest_path: str, max_bytes: int) -> StoredAudio:
+        """
+        Copies `source` to dest_path in chunks, hashing and counting in the same pass.
+        Raises UploadTooLarge as soon as more than max_bytes have been read; the
+        partial file is removed.
+        """
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            with open(dest_path, "wb") as buffer:
+                for chunk in iter(lambda: source.read(UPLOAD_CHUNK_BYTES), b""):
+                    size += len(chunk)
+                    if size > max_bytes:
+                        raise UploadTooLarge(f"Audio exceeds the {max_bytes} byte upload limit")
+                    digest.update(chunk)
+                    buffer.write(chunk)
+        except BaseException:
+            if os.path.exists(dest_path):
+                os.remove(dest_path)
+            raise
+        return StoredAudio(size=size, sha256=digest.hexdigest(), duration=AudioStorageService.probe_duration(dest_path))
+
+    @staticmethod
+    def probe_duration(path: str) -> Optional[float]:
+        """Duration in seconds from the WAV header; None for compressed formats or unreadable files."""
+        if not path.lower().endswith(".wav"):
+            return None
+        try:
+            with wave.open(path, "rb") as wav:
+                rate = wav.getframerate()
+                return wav.getnframes() / rate if rate else None
+        except (wave.Error, EOFError):
+            return None
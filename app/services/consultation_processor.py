@@ -1,45 +1,74 @@
-from sqlmodel import Session, select
-from app.core.db import engine
-from app.models.base import Consultation, ConsultationStatus, AudioFile, SOAPNote, PatientProfile, AILog
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.core.db import async_engine
+from app.models.base import (
+    Consultation, ConsultationStatus, AudioFile, SOAPNote, PatientProfile, AILog, TriageQueueEntry,
+    ProcessingStage, PROCESSING_STAGE_ORDER,
+)
 from app.services.stt_service import AssemblyAIService
-from app.services.llm_service import GeminiService
+from app.services.llm_service import GeminiService, SOAP_MODEL
 from app.services.triage_service import TriageService
 from app.services.safety_service import SafetyService
+from app.services.queue_service import TriageQueueService
+from typing import Optional
 from uuid import UUID
 import asyncio
 import time
 
-async def process_consultation_flow(consultation_id: UUID):
+async def _sync_queue_entry(session: AsyncSession, consultation: Consultation, patient_profile):
+    entry = await session.get(TriageQueueEntry, consultation.id)
+    entry = TriageQueueService.apply(entry, consultation, patient_profile)
+    if entry:
+        session.add(entry)
+
+def _reached(consultation: Consultation, stage: ProcessingStage) -> bool:
+    return PROCESSING_STAGE_ORDER.index(consultation.processing_stage) >= PROCESSING_STAGE_ORDER.index(stage)
+
+async def _checkpoint(session: AsyncSession, consultation: Consultation, stage: ProcessingStage):
+    """Commits the stage's results together with the stage marker, so a retry can skip it."""
+    consultation.processing_stage = stage
+    session.add(consultation)
+    await session.commit()
+
+async def process_consultation_flow(consultation_id: UUID, raise_on_error: bool = False) -> Optional[Exception]:
     """
     Orchestrates the AI processing flow:
     1. Transcribe Audio (AssemblyAI)
     2. Generate SOAP Note (Gemini)
     3. Update Database
+
+    Each stage is checkpointed in consultation.processing_stage; a rerun (job retry or
+    POST /consultations/{id}/retry) resumes after the last completed stage.
+    With raise_on_error (a job attempt that will be retried) a failure re-raises and
+    leaves the consultation IN_PROGRESS instead of marking it FAILED.
+    Returns None on success, else the exception that failed it (a LookupError when the
+    consultation or its audio doesn't exist).
     """
     print(f"Starting processing for consultation {consultation_id}")
     
     # We use a new session per background task execution
-    with Session(engine) as session:
-        consultation = session.get(Consultation, consultation_id)
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        consultation = await session.get(Consultation, consultation_id)
         if not consultation:
             print(f"Consultation {consultation_id} not found.")
-            return
+            return LookupError(f"Consultation {consultation_id} not found")
         
         # 1. Update Status: Transcribing
         consultation.status = ConsultationStatus.IN_PROGRESS
         session.add(consultation)
-        session.commit()
+        await session.exec(TriageQueueService.update_for_consultation(consultation_id, status=ConsultationStatus.IN_PROGRESS))
+        await session.commit()
         
         # 2. Get Audio File
-        audio_file = session.exec(select(AudioFile).where(AudioFile.consultation_id == consultation_id)).first()
+        audio_file = (await session.exec(select(AudioFile).where(AudioFile.consultation_id == consultation_id))).first()
         if not audio_file:
             print("Audio file missing.")
             # We treat this as a failure state, but keep it in IN_PROGRESS or move to CANCELLED?
-            # For now, let's leave it but log it.
-            return
+            # For now, let's leave it but log it (the job still fails).
+            return LookupError(f"No audio file for consultation {consultation_id}")
 
         # Fetch Patient Context
-        patient_profile = session.exec(select(PatientProfile).where(PatientProfile.user_id == consultation.patient_id)).first()
+        patient_profile = (await session.exec(select(PatientProfile).where(PatientProfile.user_id == consultation.patient_id))).first()
         patient_context = {}
         if patient_profile:
             # Calculate Age (Rough approx is fine for now)
@@ -59,84 +88,145 @@ async def process_consultation_flow(consultation_id: UUID):
             }
 
         try:
-            # 3. Transcribe (AssemblyAI)
-            print("Starting transcription...")
-            transcript_result = await AssemblyAIService.transcribe_audio_async(audio_file.file_url)
-            transcript_text = transcript_result["text"]
-            utterances = transcript_result.get("utterances", [])
-            
-            # Update AudioFile with transcription
-            audio_file.transcription = transcript_text
-            session.add(audio_file)
-            session.commit() # Commit intermediate progress
-            print("Transcription complete.")
-            
-            # 4. Generate SOAP (Gemini) - ENABLED
-            print("Generating SOAP note...")
-            start_time = time.time()
-            try:
-                soap_data = await GeminiService.generate_soap_note_async(transcript_text, utterances, patient_context)
-                latency = (time.time() - start_time) * 1000
+            # 3. Transcribe (AssemblyAI) - skipped when a previous attempt already checkpointed it
+            if _reached(consultation, ProcessingStage.TRANSCRIBED) and audio_file.transcription is not None:
+                print("Resuming: transcription already done.")
+                transcript_text = audio_file.transcription
+                utterances = audio_file.transcript_utterances or []
+            else:
+                print("Starting transcription...")
+                transcript_result = await AssemblyAIService.transcribe_audio_async(audio_file.file_url, audio_file.content_sha256)
+                transcript_text = transcript_result["text"]
+                utterances = transcript_result.get("utterances", [])
+
+                # Update AudioFile with transcription
+                audio_file.transcription = transcript_text
+                audio_file.transcript_utterances = utterances
+                audio_file.transcript_confidence = transcript_result.get("confidence")
+                audio_file.content_sha256 = audio_file.content_sha256 or transcript_result.get("content_sha256")
+                if transcript_result.get("cache_hit"):
+                    print("Transcript served from cache.")
+                else:
+                    audio_file.file_size = audio_file.file_size or transcript_result.get("original_bytes")
+                    audio_file.uploaded_size = transcript_result.get("uploaded_bytes")
+                    if audio_file.file_size and audio_file.uploaded_size:
+                        print(f"Sent {audio_file.uploaded_size} of {audio_file.file_size} bytes to STT after normalization.")
+                    if transcript_result.get("chunks", 1) > 1:
+                        print(f"Transcribed as {transcript_result['chunks']} parallel chunks.")
+                    if transcript_result.get("trimmed_seconds"):
+                        print(f"Trimmed {transcript_result['trimmed_seconds']:.1f}s of silence before STT.")
+                session.add(audio_file)
+                await _checkpoint(session, consultation, ProcessingStage.TRANSCRIBED)
+                print("Transcription complete.")
+
+            # 4. Generate SOAP (Gemini)
+            soap_note = None
+            if _reached(consultation, ProcessingStage.SOAP_GENERATED):
+                soap_note = (await session.exec(select(SOAPNote).where(SOAPNote.consultation_id == consultation_id))).first()
+            if soap_note is not None:
+                print("Resuming: SOAP note already generated.")
+            else:
+                print("Generating SOAP note...")
+                start_time = time.time()
+                try:
+                    soap_data = await GeminiService.generate_soap_note_async(transcript_text, utterances, patient_context)
+                    latency = (time.time() - start_time) * 1000
+                    
+                    # Log Success
+                    cache_hit = bool(soap_data.get("cache_hit"))
+                    if cache_hit:
+                        print("SOAP note served from cache.")
+                    elif soap_data.get("segments", 1) > 1:
+                        print(f"SOAP note generated map-reduce over {soap_data['segments']} transcript segments.")
+                    model_latency = soap_data.get("model_latency_ms")
+                    session.add(AILog(
+                        consultation_id=consultation.id,
+                        model_version=SOAP_MODEL,
+                        status="SUCCESS",
+                        latency_ms=latency,
+                        model_latency_ms=model_latency,
+                        overhead_ms=latency - (model_latency or 0),
+                        cache_hit=cache_hit,
+                        transcript_tokens_before=soap_data.get("tokens_before"),
+                        transcript_tokens_after=soap_data.get("tokens_after")
+                    ))
+                except Exception as llm_error:
+                    transcript = GeminiService.prepare_transcript(transcript_text, utterances)
+                    # Log LLM Failure but allow flow to fail gracefully if needed (here we catch to log, then re-raise or handle)
+                    session.add(AILog(
+                        consultation_id=consultation.id,
+                        model_version=SOAP_MODEL,
+                        status="FAIL",
+                        error_message=str(llm_error),
+                        transcript_tokens_before=transcript.tokens_before,
+                        transcript_tokens_after=transcript.tokens_after
+                    ))
+                    raise llm_error
+
+                soap_content = soap_data.get("soap_note", {})
+                risk_flags = soap_data.get("risk_flags", [])
                 
-                # Log Success
-                session.add(AILog(
-                    consultation_id=consultation.id,
-                    model_version="gemini-2.0-flash",
-                    status="SUCCESS",
-                    latency_ms=latency
-                ))
-            except Exception as llm_error:
-                # Log LLM Failure but allow flow to fail gracefully if needed (here we catch to log, then re-raise or handle)
-                session.add(AILog(
+                # 5. Create SOAP Note Record
+                soap_note = SOAPNote(
                     consultation_id=consultation.id,
-                    model_version="gemini-2.0-flash",
-                    status="FAIL",
-                    error_message=str(llm_error)
-                ))
-                raise llm_error
-
-            soap_content = soap_data.get("soap_note", {})
-            risk_flags = soap_data.get("risk_flags", [])
-            
-            # 5. Create SOAP Note Record
-            soap_note = SOAPNote(
-                consultation_id=consultation.id,
-                soap_json=soap_content,
-                risk_flags={"flags": risk_flags}, # Wrap in dict as risk_flags is JSON type
-                confidence=transcript_result.get("confidence"), # Use STT confidence as proxy or from LLM if available
-                generated_by_ai=True
-            )
-            session.add(soap_note)
+                    soap_json=soap_content,
+                    risk_flags={"flags": risk_flags}, # Wrap in dict as risk_flags is JSON type
+                    confidence=audio_file.transcript_confidence, # Use STT confidence as proxy or from LLM if available
+                    generated_by_ai=True
+                )
+                session.add(soap_note)
+                await _checkpoint(session, consultation, ProcessingStage.SOAP_GENERATED)
             
             # --- NEW: Phase 2 Logic ---
             # 5a. Triage Analysis
-            if patient_profile:
-                urgency, category = TriageService.calculate_urgency(soap_note, patient_profile)
-                consultation.urgency_score = urgency
-                consultation.triage_category = category
-                print(f"Triage Result: {category} (Score: {urgency})")
+            if not _reached(consultation, ProcessingStage.TRIAGED):
+                if patient_profile:
+                    urgency, category = TriageService.calculate_urgency(soap_note, patient_profile)
+                    consultation.urgency_score = urgency
+                    consultation.triage_category = category
+                    print(f"Triage Result: {category} (Score: {urgency})")
+                await _checkpoint(session, consultation, ProcessingStage.TRIAGED)
             
             # 5b. Safety Checks
-            if patient_profile:
-                warnings = SafetyService.check_drug_interactions(soap_note, patient_profile)
-                consultation.safety_warnings = warnings
-                if warnings:
-                    print(f"Safety Warnings Found: {len(warnings)}")
+            if not _reached(consultation, ProcessingStage.SAFETY_CHECKED):
+                if patient_profile:
+                    warnings = SafetyService.check_drug_interactions(soap_note, patient_profile)
+                    consultation.safety_warnings = warnings
+                    if warnings:
+                        print(f"Safety Warnings Found: {len(warnings)}")
+                consultation.processing_stage = ProcessingStage.SAFETY_CHECKED
 
             # 6. Update Final Status
             consultation.status = ConsultationStatus.COMPLETED
+            consultation.requires_manual_review = False
             session.add(consultation)
-            session.commit()
+            await _sync_queue_entry(session, consultation, patient_profile)
+            await session.commit()
             
             print(f"Processing successfully completed for {consultation_id}")
+            return None
             
         except Exception as e:
             print(f"Processing failed: {e}")
+            # Keep the AILog rows, drop anything the failed stage left uncommitted;
+            # completed stages are already checkpointed.
+            logs = [obj for obj in session.new if isinstance(obj, AILog)]
+            await session.rollback()
+            session.add_all(logs)
+            if raise_on_error:
+                await session.commit()
+                raise
+            await session.refresh(consultation)
+            if patient_profile:
+                await session.refresh(patient_profile)
+
             # Set status to FAILED so we can track errors in DB
             consultation.status = ConsultationStatus.FAILED
             consultation.requires_manual_review = True # Flag for Manual Intervention
             
             # Log General Failure if not logged by LLM block
             session.add(consultation)
-            session.commit()
+            await _sync_queue_entry(session, consultation, patient_profile)
+            await session.commit()
+            return e
 
@@ -0,0 +1,162 @@
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import event
+from sqlmodel import Session, select
+
+from app.core.config import settings
+from app.core.db import engine
+from app.models.base import User, DoctorProfile, UserRole
+
+logger = logging.getLogger(__name__)
+
+DOCTOR_IMAGE_PLACEHOLDER = "https://images.unsplash.com/photo-1559839734-2b71ea197ec2?w=150&h=150&fit=crop&crop=face"
+
+# Rendered pages kept per (filters, limit, cursor); cleared on every reload.
+_MAX_RENDERED_PAGES = 256
+
+
+@dataclass(frozen=True)
+class _DoctorEntry:
+    user_id: UUID
+    specialization: Optional[str]
+    is_available: bool
+    payload: bytes  # this doctor's JSON object, serialized once per load
+
+
+@dataclass(frozen=True)
+class DirectoryPage:
+    body: bytes
+    etag: str
+    next_user_id: Optional[UUID]
+
+
+class DoctorDirectory:
+    """
+    In-process snapshot of the doctor picker (User + DoctorProfile).
+    Reloaded from the primary after any committed write to a doctor or doctor profile
+    in this process; DOCTOR_DIRECTORY_TTL_SECONDS bounds staleness from writes made
+    by other workers.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries: Optional[List[_DoctorEntry]] = None
+        self._loaded_at = 0.0
+        self._generation = 0
+        self._pages: "OrderedDict[tuple, DirectoryPage]" = OrderedDict()
+
+    def invalidate(self):
+        with self._lock:
+            self._generation += 1
+            self._entries = None
+            self._pages.clear()
+
+    def load(self):
+        """Reads all doctors from the primary (a replica could re-cache the write that triggered the reload)."""
+        with self._lock:
+            generation = self._generation
+        with Session(engine) as session:
+            rows = session.exec(
+                select(User, DoctorProfile)
+                .join(DoctorProfile, User.id == DoctorProfile.user_id)
+                .where(User.role == UserRole.DOCTOR)
+                .order_by(User.id)
+            ).all()
+        entries = [
+            _DoctorEntry(
+                user_id=user.id,
+                specialization=profile.specialization,
+                is_available=profile.is_available,
+                payload=json.dumps({
+                    "id": str(user.id),
+                    "email": user.email,
+                    "first_name": profile.first_name,
+                    "last_name": profile.last_name,
+                    "specialization": profile.specialization,
+                    "clinic_address": profile.clinic_address,
+                    "image": DOCTOR_IMAGE_PLACEHOLDER,
+                }).encode(),
+            )
+            for user, profile in rows
+        ]
+        with self._lock:
+            # A write committed while we were reading; keep serving this load but re-read next time.
+            if generation == self._generation:
+                self._entries = entries
+                self._loaded_at = time.monotonic()
+                self._pages.clear()
+        logger.info("Doctor directory loaded: %d doctors", len(entries))
+        return entries
+
+    def _snapshot(self) -> List[_DoctorEntry]:
+        with self._lock:
+            entries = self._entries
+            fresh = entries is not None and time.monotonic() - self._loaded_at < settings.DOCTOR_DIRECTORY_TTL_SECONDS
+        return entries if fresh else self.load()
+
+    def page(self, specialization: Optional[str], is_available: Optional[bool], limit: int, after: Optional[UUID]) -> DirectoryPage:
+        """Filtered page of doctors ordered by user id, as a ready-to-send JSON array."""
+        entries = self._snapshot()
+        key = (specialization, is_available, limit, after)
+        with self._lock:
+            cached = self._pages.get(key) if entries is self._entries else None
+        if cached is not None:
+            return cached
+
+        matches: List[_DoctorEntry] = []
+        for entry in entries:
+            if after is not None and entry.user_id <= after:
+                continue
+            if specialization and entry.specialization != specialization:
+                continue
+            if is_available is not None and entry.is_available != is_available:
+                continue
+            matches.append(entry)
+            if len(matches) > limit:
+                break
+
+        next_user_id = None
+        if len(matches) > limit:
+            matches = matches[:limit]
+            next_user_id = matches[-1].user_id
+        body = b"[" + b",".join(entry.payload for entry in matches) + b"]"
+        page = DirectoryPage(body=body, etag=f'"{hashlib.blake2b(body, digest_size=12).hexdigest()}"', next_user_id=next_user_id)
+
+        with self._lock:
+            if entries is self._entries:
+                self._pages[key] = page
+                if len(self._pages) > _MAX_RENDERED_PAGES:
+                    self._pages.popitem(last=False)
+        return page
+
+
+doctor_directory = DoctorDirectory()
+
+
+def _touches_directory(obj) -> bool:
+    return isinstance(obj, DoctorProfile) or (isinstance(obj, User) and obj.role == UserRole.DOCTOR)
+
+
+@event.listens_for(Session, "after_flush")
+def _flag_directory_write(session, flush_context):
+    if any(_touches_directory(obj) for obj in (*session.new, *session.dirty, *session.deleted)):
+        session.info["doctor_directory_dirty"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_directory(session):
+    if session.info.pop("doctor_directory_dirty", False):
+        doctor_directory.invalidate()
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_directory_write(session):
+    session.info.pop("doctor_directory_dirty", None)
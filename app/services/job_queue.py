@@ -0,0 +1,295 @@
+import asyncio
+import logging
+import os
+import socket
+from datetime import datetime, timedelta
+from typing import List, Optional
+from uuid import UUID, uuid4
+
+from sqlalchemy import and_, or_, update
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.config import settings
+from app.core.db import async_engine
+from app.models.base import Consultation, ConsultationStatus, ProcessingJob, JobStatus
+from app.services.queue_service import TriageQueueService
+
+logger = logging.getLogger(__name__)
+
+
+def make_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid4().hex[:6]}"
+
+
+class JobQueueService:
+    """
+    processing_jobs operations. Jobs are enqueued in the caller's transaction, so the
+    job exists if and only if the upload that created it committed.
+    """
+
+    @staticmethod
+    def enqueue(session: AsyncSession, consultation_id: UUID) -> ProcessingJob:
+        job = ProcessingJob(consultation_id=consultation_id, max_attempts=settings.JOB_MAX_ATTEMPTS)
+        session.add(job)
+        return job
+
+    @staticmethod
+    async def active_job(session: AsyncSession, consultation_id: UUID) -> Optional[ProcessingJob]:
+        """The consultation's QUEUED or RUNNING job; at most one exists (uq_processing_jobs_active_consultation)."""
+        return (await session.exec(
+            select(ProcessingJob).where(
+                ProcessingJob.consultation_id == consultation_id,
+                ProcessingJob.status.in_([JobStatus.QUEUED, JobStatus.RUNNING]),
+            )
+        )).first()
+
+    @staticmethod
+    def _claimable(now: datetime):
+        return or_(
+            and_(ProcessingJob.status == JobStatus.QUEUED, ProcessingJob.available_at <= now),
+            # Lease ran out: the worker holding it died or hung (and it has attempts left)
+            and_(
+                ProcessingJob.status == JobStatus.RUNNING,
+                ProcessingJob.lease_expires_at < now,
+                ProcessingJob.attempts < ProcessingJob.max_attempts,
+            ),
+        )
+
+    @staticmethod
+    async def fail_exhausted(session: AsyncSession, now: datetime) -> int:
+        """
+        Marks FAILED the jobs whose lease ran out on their last attempt, and their
+        consultations FAILED for manual review (the attempt never got to do it). Commits.
+        """
+        exhausted = (await session.exec(
+            select(ProcessingJob.id, ProcessingJob.consultation_id).where(
+                ProcessingJob.status == JobStatus.RUNNING,
+                ProcessingJob.lease_expires_at < now,
+                ProcessingJob.attempts >= ProcessingJob.max_attempts,
+            ).with_for_update(skip_locked=True)
+        )).all()
+        failed = 0
+        for job_id, consultation_id in exhausted:
+            result = await session.exec(
+                update(ProcessingJob)
+                .where(ProcessingJob.id == job_id, ProcessingJob.status == JobStatus.RUNNING, ProcessingJob.lease_expires_at < now)
+                .values(
+                    status=JobStatus.FAILED,
+                    lease_owner=None,
+                    lease_expires_at=None,
+                    last_error="Lease expired on the final attempt",
+                    updated_at=now,
+                )
+            )
+            if result.rowcount != 1:
+                continue
+            failed += 1
+            await session.exec(
+                update(Consultation)
+                .where(Consultation.id == consultation_id, Consultation.status != ConsultationStatus.COMPLETED)
+                .values(status=ConsultationStatus.FAILED, requires_manual_review=True)
+            )
+            await session.exec(TriageQueueService.update_for_consultation(
+                consultation_id, status=ConsultationStatus.FAILED, requires_manual_review=True
+            ))
+        await session.commit()
+        if failed:
+            logger.warning("Marked %d job(s) FAILED after their final lease expired", failed)
+        return failed
+
+    @staticmethod
+    async def claim(session: AsyncSession, worker_id: str, limit: int = 1) -> List[ProcessingJob]:
+        """
+        Leases up to `limit` due jobs to worker_id and commits. Jobs that ran out of
+        attempts while leased are failed first (fail_exhausted).
+        SKIP LOCKED keeps concurrent claimers off each other's rows on Postgres; the
+        guarded UPDATE is the compare-and-set that makes claiming safe on SQLite too.
+        """
+        now = datetime.utcnow()
+        await JobQueueService.fail_exhausted(session, now)
+        candidates = (await session.exec(
+            select(ProcessingJob.id)
+            .where(JobQueueService._claimable(now))
+            .order_by(ProcessingJob.available_at)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )).all()
+
+        claimed = []
+        lease_expires_at = now + timedelta(seconds=settings.JOB_LEASE_SECONDS)
+        for job_id in candidates:
+            result = await session.exec(
+                update(ProcessingJob)
+                .where(ProcessingJob.id == job_id, JobQueueService._claimable(now))
+                .values(
+                    status=JobStatus.RUNNING,
+                    lease_owner=worker_id,
+                    lease_expires_at=lease_expires_at,
+                    attempts=ProcessingJob.attempts + 1,
+                    updated_at=now,
+                )
+            )
+            if result.rowcount == 1:
+                claimed.append(job_id)
+        await session.commit()
+
+        if not claimed:
+            return []
+        return list((await session.exec(select(ProcessingJob).where(ProcessingJob.id.in_(claimed)))).all())
+
+    @staticmethod
+    async def heartbeat(session: AsyncSession, job_id: UUID, worker_id: str) -> bool:
+        """Extends the lease; False means it was lost (expired and reclaimed elsewhere)."""
+        now = datetime.utcnow()
+        result = await session.exec(
+            update(ProcessingJob)
+            .where(ProcessingJob.id == job_id, ProcessingJob.lease_owner == worker_id, ProcessingJob.status == JobStatus.RUNNING)
+            .values(lease_expires_at=now + timedelta(seconds=settings.JOB_LEASE_SECONDS), updated_at=now)
+        )
+        await session.commit()
+        return result.rowcount == 1
+
+    @staticmethod
+    async def complete(session: AsyncSession, job: ProcessingJob, worker_id: str):
+        await session.exec(
+            update(ProcessingJob)
+            .where(ProcessingJob.id == job.id, ProcessingJob.lease_owner == worker_id)
+            .values(status=JobStatus.SUCCEEDED, lease_owner=None, lease_expires_at=None, updated_at=datetime.utcnow())
+        )
+        await session.commit()
+
+    @staticmethod
+    async def fail(session: AsyncSession, job: ProcessingJob, worker_id: str, error: str):
+        """Requeues with exponential backoff, or marks FAILED once attempts are used up."""
+        now = datetime.utcnow()
+        values = {"lease_owner": None, "lease_expires_at": None, "last_error": error[:2000], "updated_at": now}
+        if job.attempts >= job.max_attempts:
+            values["status"] = JobStatus.FAILED
+        else:
+            values["status"] = JobStatus.QUEUED
+            values["available_at"] = now + timedelta(seconds=settings.JOB_RETRY_BACKOFF_SECONDS * 2 ** (job.attempts - 1))
+        await session.exec(
+            update(ProcessingJob)
+            .where(ProcessingJob.id == job.id, ProcessingJob.lease_owner == worker_id)
+            .values(**values)
+        )
+        await session.commit()
+
+
+class JobWorker:
+    """
+    Claims and runs processing jobs with up to `concurrency` in flight.
+    run() returns once stop() is called and the in-flight jobs have finished.
+    """
+
+    def __init__(self, concurrency: int, worker_id: Optional[str] = None):
+        self.concurrency = concurrency
+        self.worker_id = worker_id or make_worker_id()
+        self._stopping = asyncio.Event()
+        self._wakeup = asyncio.Event()
+        self._in_flight: set = set()
+
+    def stop(self):
+        self._stopping.set()
+        self._wakeup.set()
+
+    def wake(self):
+        """Skip the rest of the poll interval (a job was just enqueued in this process)."""
+        self._wakeup.set()
+
+    async def run(self):
+        logger.info("Job worker %s started (concurrency=%d)", self.worker_id, self.concurrency)
+        while not self._stopping.is_set():
+            free = self.concurrency - len(self._in_flight)
+            jobs = []
+            if free > 0:
+                try:
+                    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+                        jobs = await JobQueueService.claim(session, self.worker_id, limit=free)
+                except Exception:
+                    logger.exception("Claiming jobs failed")
+            for job in jobs:
+                task = asyncio.create_task(self._run_job(job))
+                self._in_flight.add(task)
+                task.add_done_callback(self._job_done)
+
+            if jobs and len(self._in_flight) < self.concurrency:
+                continue  # more may be due right away
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=settings.JOB_POLL_INTERVAL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+        if self._in_flight:
+            logger.info("Job worker %s draining %d in-flight job(s)", self.worker_id, len(self._in_flight))
+            await asyncio.gather(*self._in_flight, return_exceptions=True)
+        logger.info("Job worker %s stopped", self.worker_id)
+
+    def _job_done(self, task: asyncio.Task):
+        self._in_flight.discard(task)
+        self._wakeup.set()  # a slot freed up
+
+    async def _heartbeat(self, job_id: UUID):
+        while True:
+            await asyncio.sleep(settings.JOB_LEASE_SECONDS / 3)
+            try:
+                async with AsyncSession(async_engine) as session:
+                    if not await JobQueueService.heartbeat(session, job_id, self.worker_id):
+                        logger.warning("Lost lease on job %s", job_id)
+                        return
+            except Exception:
+                logger.exception("Heartbeat for job %s failed", job_id)
+
+    async def _run_job(self, job: ProcessingJob):
+        from app.services import consultation_processor
+
+        heartbeat = asyncio.create_task(self._heartbeat(job.id))
+        error = None
+        try:
+            # Earlier attempts leave the consultation IN_PROGRESS; only the last one marks it
+            # FAILED, and then returns the failure instead of raising it.
+            failure = await consultation_processor.process_consultation_flow(
+                job.consultation_id, raise_on_error=job.attempts < job.max_attempts
+            )
+            if failure is not None:
+                error = f"{type(failure).__name__}: {failure}"
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        finally:
+            heartbeat.cancel()
+
+        async with AsyncSession(async_engine, expire_on_commit=False) as session:
+            if error is None:
+                await JobQueueService.complete(session, job, self.worker_id)
+            else:
+                logger.warning("Job %s attempt %d/%d failed: %s", job.id, job.attempts, job.max_attempts, error)
+                await JobQueueService.fail(session, job, self.worker_id, error)
+
+
+# Drainer running inside the API process (JOB_QUEUE_INPROCESS_WORKER); None when disabled.
+inprocess_worker: Optional[JobWorker] = None
+_inprocess_task: Optional[asyncio.Task] = None
+
+
+def start_inprocess_worker():
+    global inprocess_worker, _inprocess_task
+    if not settings.JOB_QUEUE_INPROCESS_WORKER or _inprocess_task is not None:
+        return
+    inprocess_worker = JobWorker(concurrency=settings.JOB_WORKER_CONCURRENCY)
+    _inprocess_task = asyncio.create_task(inprocess_worker.run())
+
+
+async def stop_inprocess_worker():
+    global inprocess_worker, _inprocess_task
+    if _inprocess_task is None:
+        return
+    inprocess_worker.stop()
+    await _inprocess_task
+    inprocess_worker, _inprocess_task = None, None
+
+
+def notify_enqueued():
+    if inprocess_worker is not None:
+        inprocess_worker.wake()
@@ -1,58 +1,104 @@
-import google.generativeai as genai
 import json
 import asyncio
-from typing import List, Dict, Any
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Tuple
 from app.core.config import settings
-
-# Configure global API key
-genai.configure(api_key=settings.GOOGLE_API_KEY)
+from app.services.rate_limiter import gemini_limiter, is_quota_error
+from app.services.soap_cache import SoapCacheService, soap_cache_key
+from app.services.transcript_compaction import CompactedTranscript, compact_transcript, estimate_tokens
 
 from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type, before_sleep_log
 import logging
 
 logger = logging.getLogger(__name__)
 
-class GeminiService:
-    @staticmethod
-    @retry(
-        stop=stop_after_attempt(5), # Increased attempts for quota
-        wait=wait_exponential(multiplier=2, min=4, max=60), # Exponential backoff: 4s, 8s, 16s, 32s, 60s
-        reraise=True
+_genai = None
+
+def get_genai():
+    """
+    Imports and configures the Gemini SDK on first use.
+    Keeps google.generativeai (and grpc) out of process start-up.
+    """
+    global _genai
+    if _genai is None:
+        import google.generativeai as genai
+        genai.configure(api_key=settings.GOOGLE_API_KEY)
+        _genai = genai
+    return _genai
+
+# GenerativeModel instances by (model name, generation config); built once per process
+_models: Dict[Tuple[str, str], Any] = {}
+_models_lock = threading.Lock()
+
+def get_model(model_name: str, generation_config: Optional[Dict[str, Any]] = None):
+    """Shared GenerativeModel for this name and config (models are stateless between calls)."""
+    key = (model_name, json.dumps(generation_config or {}, sort_keys=True))
+    model = _models.get(key)
+    if model is None:
+        with _models_lock:
+            model = _models.get(key)
+            if model is None:
+                model = get_genai().GenerativeModel(model_name, generation_config=generation_config)
+                _models[key] = model
+    return model
+
+# Blocking generate_content calls, for SDK versions without generate_content_async.
+# Sized like the Gemini limiter, which caps calls in flight anyway.
+_gemini_pool: Optional[ThreadPoolExecutor] = None
+_gemini_pool_lock = threading.Lock()
+
+def _get_gemini_pool() -> ThreadPoolExecutor:
+    global _gemini_pool
+    if _gemini_pool is None:
+        with _gemini_pool_lock:
+            if _gemini_pool is None:
+                _gemini_pool = ThreadPoolExecutor(max_workers=settings.GEMINI_MAX_CONCURRENT, thread_name_prefix="gemini")
+    return _gemini_pool
+
+def shutdown_gemini_pool():
+    global _gemini_pool
+    with _gemini_pool_lock:
+        if _gemini_pool is not None:
+            _gemini_pool.shutdown(wait=False, cancel_futures=True)
+            _gemini_pool = None
+
+async def _generate_content(model, prompt: str):
+    if hasattr(model, "generate_content_async"):
+        return await model.generate_content_async(prompt)
+    return await asyncio.get_running_loop().run_in_executor(_get_gemini_pool(), model.generate_content, prompt)
+
+# Model used for SOAP generation, and the version of the prompt template below.
+# Bump SOAP_PROMPT_VERSION whenever the prompt or its parsing changes: it is part of
+# the SOAP cache key, so results generated with the old prompt stop being served.
+SOAP_MODEL = "gemini-2.5-flash"
+SOAP_PROMPT_VERSION = "soap-v1"
+
+def format_transcript(transcript_text: str, speaker_labels: List[Dict[str, Any]] = None) -> str:
+    """Speaker-aware transcript if labels are provided, else the plain text."""
+    if not speaker_labels:
+        return transcript_text
+    formatted_lines = []
+    for utter in speaker_labels:
+        # utter is expected to be a dict like {'speaker': 'A', 'text': '...', ...}
+        speaker = utter.get('speaker', 'Unknown')
+        text = utter.get('text', '')
+        formatted_lines.append(f"Speaker {speaker}: {text}")
+    return "\n".join(formatted_lines)
+
+def format_patient_context(patient_context: Dict[str, Any] = None) -> str:
+    if not patient_context:
+        return "Unknown"
+    return (
+        f"Name: {patient_context.get('first_name', '')} {patient_context.get('last_name', '')}\n"
+        f"Age: {patient_context.get('age', 'N/A')}\n"
+        f"Gender: {patient_context.get('gender', 'N/A')}\n"
+        f"Medical History/Notes: {patient_context.get('notes', 'None provided')}"
     )
-    async def generate_soap_note_async(transcript_text: str, speaker_labels: List[Dict[str, Any]] = None, patient_context: Dict[str, Any] = None) -> Dict[str, Any]:
-        """
-        Generates a structured SOAP note from the transcript using Gemini.
-        Returns a dictionary matching the SOAP note schema.
-        Includes robust retry logic for 429 Quota errors.
-        """
-        # Construct a speaker-aware transcript if labels are provided
-        formatted_transcript = transcript_text
-        if speaker_labels:
-            formatted_lines = []
-            for utter in speaker_labels:
-                 # utter is expected to be a dict like {'speaker': 'A', 'text': '...', ...}
-                 speaker = utter.get('speaker', 'Unknown')
-                 text = utter.get('text', '')
-                 formatted_lines.append(f"Speaker {speaker}: {text}")
-            formatted_transcript = "\n".join(formatted_lines)
-            
-        # Format Patient Context for Prompt
-        context_str = "Unknown"
-        if patient_context:
-            context_str = (
-                f"Name: {patient_context.get('first_name', '')} {patient_context.get('last_name', '')}\n"
-                f"Age: {patient_context.get('age', 'N/A')}\n"
-                f"Gender: {patient_context.get('gender', 'N/A')}\n"
-                f"Medical History/Notes: {patient_context.get('notes', 'None provided')}"
-            )
-            
-        # Initialize Model (gemini-2.5-flash is available and efficient)
-        model = genai.GenerativeModel(
-            'gemini-2.5-flash',
-            generation_config={"response_mime_type": "application/json"}
-        )
-        
-        prompt = f"""
+
+def build_soap_prompt(formatted_transcript: str, context_str: str) -> str:
+    return f"""
         You are an expert medical scribe. Your task is to analyze the following Doctor-Patient consultation transcript and generate a professional, structured SOAP note encoded as JSON.
         
         Patient Context:
@@ -81,20 +127,193 @@ class GeminiService:
             "risk_flags": ["Risk 1", "Risk 2"] 
         }}
         """
+
+def segment_transcript(formatted_transcript: str, max_tokens: int) -> List[str]:
+    """Consecutive lines (speaker turns) packed into segments of up to max_tokens; a longer turn is its own segment."""
+    segments: List[str] = []
+    current: List[str] = []
+    size = 0
+    for line in formatted_transcript.split("\n"):
+        tokens = estimate_tokens(line) + 1
+        if current and size + tokens > max_tokens:
+            segments.append("\n".join(current))
+            current, size = [], 0
+        current.append(line)
+        size += tokens
+    if current:
+        segments.append("\n".join(current))
+    return segments
+
+def build_segment_prompt(segment: str, index: int, count: int, context_str: str) -> str:
+    return f"""
+        You are an expert medical scribe. The following is part {index + 1} of {count} of a Doctor-Patient consultation transcript. Extract the clinical findings stated in this part only; other parts are processed separately and merged later.
+        
+        Patient Context:
+        {context_str}
+        
+        Transcript part {index + 1} of {count}:
+        {segment}
+        
+        Instructions:
+        1. List findings as short factual statements under the SOAP section they belong to. Leave a list empty if this part says nothing for it.
+        2. **STRICT GROUNDING**: Do NOT infer information not present in this part.
+        3. Flag ambiguous terms in "low_confidence" and risks (e.g., Suicide risk, Severe allergies, Abuse) in "risk_flags".
+        4. Return STRICTLY valid JSON. No markdown formatting.
+        
+        Required JSON Structure:
+        {{
+            "subjective": ["finding", "..."],
+            "objective": [],
+            "assessment": [],
+            "plan": [],
+            "low_confidence": [],
+            "risk_flags": []
+        }}
+        """
+
+def build_merge_prompt(findings: List[Dict[str, Any]], context_str: str) -> str:
+    parts = "\n".join(f"Part {i + 1}: {json.dumps(f, ensure_ascii=False)}" for i, f in enumerate(findings))
+    return f"""
+        You are an expert medical scribe. A long Doctor-Patient consultation was split into {len(findings)} consecutive parts and the clinical findings of each part extracted, in order. Merge them into one professional, structured SOAP note encoded as JSON.
+        
+        Patient Context:
+        {context_str}
+        
+        Findings per part:
+        {parts}
+        
+        Instructions:
+        1. Combine the findings into coherent Subjective, Objective, Assessment, and Plan sections. Later parts may refine or correct earlier ones.
+        2. **STRICT GROUNDING**: Use only the findings above. Do NOT invent details.
+        3. Merge and deduplicate the "low_confidence" and "risk_flags" lists.
+        4. Return STRICTLY valid JSON. No markdown formatting.
         
-        # Offload the blocking API call to a thread
-        loop = asyncio.get_event_loop()
+        Required JSON Structure:
+        {{
+            "soap_note": {{
+                "subjective": "Patient's presenting complaints, history of present illness...",
+                "objective": "Observations, physical findings (if mentioned), vitals...",
+                "assessment": "Diagnosis or differential diagnoses...",
+                "plan": "Treatment plan, medications, follow-up..."
+            }},
+            "low_confidence": ["list", "of", "ambiguous", "terms"],
+            "risk_flags": ["Risk 1", "Risk 2"] 
+        }}
+        """
+
+class GeminiService:
+    @staticmethod
+    async def generate_soap_note_async(transcript_text: str, speaker_labels: List[Dict[str, Any]] = None, patient_context: Dict[str, Any] = None) -> Dict[str, Any]:
+        """
+        Generates a structured SOAP note from the transcript using Gemini.
+        Returns a dictionary matching the SOAP note schema, plus "cache_hit": True when
+        the same transcript and context were already generated with this prompt version
+        and model (served from soap_cache without calling Gemini), "model_latency_ms":
+        time spent inside Gemini (None on a cache hit), the transcript's estimated token
+        counts before and after compaction, and "segments": how many parts it was split
+        into (map-reduce for transcripts over SOAP_MAP_REDUCE_THRESHOLD_TOKENS, else 1).
+        """
+        transcript = GeminiService.prepare_transcript(transcript_text, speaker_labels, budget=0)
+        segments = None
+        if settings.SOAP_MAP_REDUCE_ENABLED and transcript.tokens_after > settings.SOAP_MAP_REDUCE_THRESHOLD_TOKENS:
+            segments = segment_transcript(transcript.text, settings.SOAP_SEGMENT_TOKENS)
+        else:
+            # Single shot: the whole transcript has to fit the prompt budget
+            transcript = GeminiService.prepare_transcript(transcript_text, speaker_labels)
+        context_str = format_patient_context(patient_context)
+        meta = {
+            "tokens_before": transcript.tokens_before,
+            "tokens_after": transcript.tokens_after,
+            "segments": len(segments) if segments else 1,
+        }
+
+        async def generate():
+            if segments:
+                return await GeminiService._map_reduce_async(segments, context_str)
+            timings: List[float] = []
+            result = await GeminiService._generate_async(build_soap_prompt(transcript.text, context_str), timings)
+            return result, sum(timings) if timings else None
+
+        if not SoapCacheService.enabled():
+            result, model_latency = await generate()
+            return {**result, **meta, "cache_hit": False, "model_latency_ms": model_latency}
+
+        # Map-reduce output differs from single shot and with segment size: separate entries
+        prompt_version = f"{SOAP_PROMPT_VERSION}+mr{settings.SOAP_SEGMENT_TOKENS}" if segments else SOAP_PROMPT_VERSION
+        cache_key = soap_cache_key(prompt_version, SOAP_MODEL, transcript.text, context_str)
+        cached = await SoapCacheService.get(cache_key)
+        if cached is not None:
+            return {**cached, **meta, "cache_hit": True, "model_latency_ms": None}
+
+        result, model_latency = await generate()
+        await SoapCacheService.put(cache_key, SOAP_MODEL, prompt_version, result)
+        return {**result, **meta, "cache_hit": False, "model_latency_ms": model_latency}
+
+    @staticmethod
+    async def _map_reduce_async(segments: List[str], context_str: str) -> Tuple[Dict[str, Any], float]:
+        """
+        Partial findings per segment (at most SOAP_MAP_MAX_PARALLEL at once), then one merge
+        call. Returns the SOAP note and the model time on the critical path: the slowest
+        segment plus the merge.
+        """
+        fan_out = asyncio.Semaphore(settings.SOAP_MAP_MAX_PARALLEL)
+
+        async def extract(index: int, segment: str):
+            timings: List[float] = []
+            async with fan_out:
+                findings = await GeminiService._generate_async(
+                    build_segment_prompt(segment, index, len(segments), context_str), timings
+                )
+            return findings, sum(timings)
+
+        extracted = await asyncio.gather(*(extract(i, seg) for i, seg in enumerate(segments)))
+        merge_timings: List[float] = []
+        result = await GeminiService._generate_async(
+            build_merge_prompt([findings for findings, _ in extracted], context_str), merge_timings
+        )
+        return result, max(ms for _, ms in extracted) + sum(merge_timings)
+
+    @staticmethod
+    def prepare_transcript(transcript_text: str, speaker_labels: List[Dict[str, Any]] = None,
+                           budget: Optional[int] = None) -> CompactedTranscript:
+        """
+        The transcript as it goes into the prompt: compacted unless SOAP_COMPACT_TRANSCRIPT is off.
+        `budget` overrides SOAP_TRANSCRIPT_TOKEN_BUDGET (0: no truncation).
+        """
+        if settings.SOAP_COMPACT_TRANSCRIPT:
+            return compact_transcript(transcript_text, speaker_labels, budget)
+        formatted = format_transcript(transcript_text, speaker_labels)
+        tokens = estimate_tokens(formatted)
+        return CompactedTranscript(formatted, tokens, tokens)
+
+    @staticmethod
+    @retry(
+        stop=stop_after_attempt(5), # Increased attempts for quota
+        # Short backoff: quota pacing is gemini_limiter's job (429s pause its whole queue)
+        wait=wait_exponential(multiplier=1, min=1, max=10),
+        reraise=True
+    )
+    async def _generate_async(prompt: str, timings: Optional[List[float]] = None) -> Dict[str, Any]:
+        """
+        One Gemini call, parsed as JSON.
+        Includes robust retry logic for 429 Quota errors.
+        Appends the model call's duration in ms to `timings` when it succeeds.
+        """
+        model = get_model(SOAP_MODEL, {"response_mime_type": "application/json"})
         
         try:
-            print("   (Gemini) Sending request...")
-            response = await loop.run_in_executor(
-                None, 
-                lambda: model.generate_content(prompt)
-            )
+            # Waits in line for a Gemini slot (concurrency + request rate) before sending
+            async with gemini_limiter.slot():
+                print("   (Gemini) Sending request...")
+                sent_at = time.perf_counter()
+                response = await _generate_content(model, prompt)
+                if timings is not None:
+                    timings.append((time.perf_counter() - sent_at) * 1000)
         except Exception as e:
-            # Check for quota errors to print explicit warning (Tenacity handles the retry)
-            if "429" in str(e) or "quota" in str(e).lower() or "resource exhausted" in str(e).lower():
-                print(f"   ⚠️ Quota Limit Hit (429). Retrying in background...")
+            # Quota hit: pause the whole Gemini queue, not just this call (Tenacity still retries it)
+            if is_quota_error(e):
+                print(f"   ⚠️ Quota Limit Hit (429). Pausing Gemini calls for {settings.PROVIDER_QUOTA_COOLDOWN_SECONDS}s...")
+                gemini_limiter.cool_down(settings.PROVIDER_QUOTA_COOLDOWN_SECONDS)
             raise e
         
         try:
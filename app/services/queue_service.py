@@ -0,0 +1,89 @@
+from datetime import datetime
+from typing import Optional
+from uuid import UUID
+from sqlalchemy import update
+from app.models.base import TriageQueueEntry, Consultation, PatientProfile, Appointment
+
+# Urgency first, then first-come-first-served; the PK breaks ties so keyset cursors are unique.
+QUEUE_SORT_KEYS = [
+    (TriageQueueEntry.urgency_score, True),
+    (TriageQueueEntry.checked_in_at, False),
+    (TriageQueueEntry.consultation_id, False),
+]
+
+def queue_sort_key(entry: TriageQueueEntry):
+    return (entry.urgency_score, entry.checked_in_at, entry.consultation_id)
+
+class TriageQueueService:
+    """
+    Keeps the materialized triage_queue table in step with consultations.
+    Callers load the existing row (session.get / await session.get) and pass it in,
+    so the same code serves the sync routes and the async pipeline.
+    """
+
+    @staticmethod
+    def apply(
+        entry: Optional[TriageQueueEntry],
+        consultation: Consultation,
+        patient_profile: Optional[PatientProfile],
+        appointment: Optional[Appointment] = None,
+    ) -> Optional[TriageQueueEntry]:
+        """
+        Creates or refreshes the queue row for a consultation.
+        Returns None when the patient has no profile: the queues only list profiled patients.
+        """
+        if patient_profile is None:
+            return entry
+
+        if entry is None:
+            entry = TriageQueueEntry(
+                consultation_id=consultation.id,
+                appointment_id=consultation.appointment_id,
+                patient_id=consultation.patient_id,
+                patient_name="",
+                status=consultation.status,
+                checked_in_at=consultation.created_at or datetime.utcnow(),
+            )
+
+        entry.doctor_id = consultation.doctor_id
+        entry.patient_name = f"{patient_profile.first_name} {patient_profile.last_name}"
+        entry.phone = patient_profile.phone_number
+        entry.status = consultation.status
+        entry.urgency_score = consultation.urgency_score or 0
+        entry.triage_category = consultation.triage_category
+        entry.symptoms = consultation.notes
+        entry.safety_warning_count = len(consultation.safety_warnings) if consultation.safety_warnings else 0
+        entry.requires_manual_review = bool(consultation.requires_manual_review)
+        if appointment is not None:
+            entry.appointment_status = appointment.status
+            entry.doctor_name = appointment.doctor_name
+        entry.updated_at = datetime.utcnow()
+        return entry
+
+    @staticmethod
+    def update_for_consultation(consultation_id: UUID, **values):
+        return (
+            update(TriageQueueEntry)
+            .where(TriageQueueEntry.consultation_id == consultation_id)
+            .values(updated_at=datetime.utcnow(), **values)
+        )
+
+    @staticmethod
+    def update_for_appointment(appointment_id: UUID, **values):
+        return (
+            update(TriageQueueEntry)
+            .where(TriageQueueEntry.appointment_id == appointment_id)
+            .values(updated_at=datetime.utcnow(), **values)
+        )
+
+    @staticmethod
+    def update_for_patient(patient_profile: PatientProfile):
+        return (
+            update(TriageQueueEntry)
+            .where(TriageQueueEntry.patient_id == patient_profile.user_id)
+            .values(
+                patient_name=f"{patient_profile.first_name} {patient_profile.last_name}",
+                phone=patient_profile.phone_number,
+                updated_at=datetime.utcnow(),
+            )
+        )
@@ -0,0 +1,144 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, Dict, Optional
+
+from app.core.config import settings
+
+
+class ProviderLimiter:
+    """
+    Per-provider admission control: at most max_concurrent calls in flight and a token
+    bucket of requests_per_minute (with `burst` capacity). Callers queue FIFO for both,
+    so a burst of uploads waits its turn instead of hitting 429s and backing off.
+    Limits are per process; size them as provider quota / number of worker processes.
+    """
+
+    def __init__(self, name: str, max_concurrent: int, requests_per_minute: float, burst: int):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.rate_per_second = requests_per_minute / 60.0
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._refilled_at = time.monotonic()
+        self._paused_until = 0.0
+        # asyncio primitives bind to a loop; recreated if the limiter is used from another one
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._bucket_lock: Optional[asyncio.Lock] = None
+
+        self._stats_lock = threading.Lock()
+        self._waiting = 0
+        self._in_flight = 0
+        self._acquired = 0
+        self._wait_ms_total = 0.0
+        self._wait_ms_max = 0.0
+        self._recent_waits = deque(maxlen=1000)
+        self._cooldowns = 0
+
+    def _primitives(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._slots = asyncio.Semaphore(self.max_concurrent)
+            self._bucket_lock = asyncio.Lock()
+        return self._slots, self._bucket_lock
+
+    def _refill(self, now: float):
+        self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.rate_per_second)
+        self._refilled_at = now
+
+    async def _take_token(self, bucket_lock: asyncio.Lock):
+        # Holding the lock while sleeping is what keeps waiters in arrival order
+        async with bucket_lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate_per_second)
+
+    def cool_down(self, seconds: float):
+        """Provider answered 429: hold every queued call for `seconds` and drain the bucket."""
+        with self._stats_lock:
+            self._cooldowns += 1
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self._tokens = 0.0
+
+    @asynccontextmanager
+    async def slot(self):
+        slots, bucket_lock = self._primitives()
+        started = time.perf_counter()
+        with self._stats_lock:
+            self._waiting += 1
+        try:
+            await slots.acquire()
+            try:
+                await self._take_token(bucket_lock)
+            except BaseException:
+                slots.release()
+                raise
+        finally:
+            with self._stats_lock:
+                self._waiting -= 1
+
+        wait_ms = (time.perf_counter() - started) * 1000
+        with self._stats_lock:
+            self._in_flight += 1
+            self._acquired += 1
+            self._wait_ms_total += wait_ms
+            self._wait_ms_max = max(self._wait_ms_max, wait_ms)
+            self._recent_waits.append(wait_ms)
+        try:
+            yield
+        finally:
+            with self._stats_lock:
+                self._in_flight -= 1
+            slots.release()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            recent = sorted(self._recent_waits)
+            return {
+                "max_concurrent": self.max_concurrent,
+                "requests_per_minute": self.rate_per_second * 60,
+                "burst": self.burst,
+                "in_flight": self._in_flight,
+                "waiting": self._waiting,
+                "acquired": self._acquired,
+                "cooldowns": self._cooldowns,
+                "queue_wait_ms": {
+                    "avg": round(self._wait_ms_total / self._acquired, 2) if self._acquired else None,
+                    "p95_recent": round(recent[min(len(recent) - 1, int(len(recent) * 0.95))], 2) if recent else None,
+                    "max": round(self._wait_ms_max, 2),
+                },
+            }
+
+
+assemblyai_limiter = ProviderLimiter(
+    "assemblyai",
+    max_concurrent=settings.ASSEMBLYAI_MAX_CONCURRENT,
+    requests_per_minute=settings.ASSEMBLYAI_REQUESTS_PER_MINUTE,
+    burst=settings.ASSEMBLYAI_BURST,
+)
+gemini_limiter = ProviderLimiter(
+    "gemini",
+    max_concurrent=settings.GEMINI_MAX_CONCURRENT,
+    requests_per_minute=settings.GEMINI_REQUESTS_PER_MINUTE,
+    burst=settings.GEMINI_BURST,
+)
+
+
+def provider_stats() -> Dict[str, Dict[str, Any]]:
+    return {limiter.name: limiter.stats() for limiter in (assemblyai_limiter, gemini_limiter)}
+
+
+def is_quota_error(error: Exception) -> bool:
+    message = str(error).lower()
+    return "429" in message or "quota" in message or "resource exhausted" in message
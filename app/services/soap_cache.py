@@ -0,0 +1,100 @@
+import hashlib
+import json
+import logging
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from sqlalchemy import delete, func, update
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.config import settings
+from app.core.db import async_engine
+from app.models.base import SoapCacheEntry
+
+logger = logging.getLogger(__name__)
+
+
+def soap_cache_key(prompt_version: str, model_name: str, transcript: str, patient_context: str) -> str:
+    """Hash of everything that determines the model's input; any change is a different key."""
+    canonical = json.dumps(
+        {"prompt_version": prompt_version, "model": model_name, "transcript": transcript, "context": patient_context},
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+class SoapCacheService:
+    @staticmethod
+    def enabled() -> bool:
+        return settings.SOAP_CACHE_MAX_ENTRIES > 0 and settings.SOAP_CACHE_MAX_BYTES > 0
+
+    @staticmethod
+    async def get(cache_key: str) -> Optional[Dict[str, Any]]:
+        async with AsyncSession(async_engine, expire_on_commit=False) as session:
+            entry = await session.get(SoapCacheEntry, cache_key)
+            if entry is None:
+                return None
+            await session.exec(
+                update(SoapCacheEntry)
+                .where(SoapCacheEntry.cache_key == cache_key)
+                .values(hit_count=SoapCacheEntry.hit_count + 1, last_used_at=datetime.utcnow())
+            )
+            await session.commit()
+            return entry.result_json
+
+    @staticmethod
+    async def put(cache_key: str, model_name: str, prompt_version: str, result: Dict[str, Any]):
+        """Stores a parsed generation, then evicts least recently used entries over the limits."""
+        async with AsyncSession(async_engine) as session:
+            session.add(SoapCacheEntry(
+                cache_key=cache_key,
+                model_name=model_name,
+                prompt_version=prompt_version,
+                result_json=result,
+                size_bytes=len(json.dumps(result)),
+            ))
+            try:
+                await session.commit()
+            except IntegrityError:
+                # Same input generated concurrently elsewhere; keep the first
+                await session.rollback()
+                return
+
+            await SoapCacheService._evict(session)
+
+    @staticmethod
+    async def _evict(session: AsyncSession, batch: int = 100):
+        """Drops least recently used entries until both SOAP_CACHE_MAX_ENTRIES and SOAP_CACHE_MAX_BYTES hold."""
+        count, total_bytes = (await session.exec(
+            select(func.count(), func.coalesce(func.sum(SoapCacheEntry.size_bytes), 0)).select_from(SoapCacheEntry)
+        )).one()
+        excess_entries = count - settings.SOAP_CACHE_MAX_ENTRIES
+        excess_bytes = total_bytes - settings.SOAP_CACHE_MAX_BYTES
+        if excess_entries <= 0 and excess_bytes <= 0:
+            return
+
+        victims = []
+        offset = 0
+        while excess_entries > 0 or excess_bytes > 0:
+            oldest = (await session.exec(
+                select(SoapCacheEntry.cache_key, SoapCacheEntry.size_bytes)
+                .order_by(SoapCacheEntry.last_used_at)
+                .offset(offset)
+                .limit(batch)
+            )).all()
+            if not oldest:
+                break
+            for cache_key, size_bytes in oldest:
+                if excess_entries <= 0 and excess_bytes <= 0:
+                    break
+                victims.append(cache_key)
+                excess_entries -= 1
+                excess_bytes -= size_bytes
+            offset += batch
+
+        await session.exec(delete(SoapCacheEntry).where(SoapCacheEntry.cache_key.in_(victims)))
+        await session.commit()
+        logger.info("SOAP cache evicted %d entries", len(victims))
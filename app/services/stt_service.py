@@ -1,53 +1,140 @@
-import assemblyai as aai
 import asyncio
+import os
+import string
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
 from app.core.config import settings
+from app.services.transcript_cache import TranscriptCacheService, config_fingerprint, sha256_file
+from app.services.rate_limiter import assemblyai_limiter, is_quota_error
+from app.services.audio_preprocess import AudioChunk, AudioPreprocessService
+from app.services.audio_storage import AudioStorageService
+from app.services.assemblyai_client import assemblyai_client
+
+_aai = None
+
+def get_aai():
+    """
+    Imports and configures the AssemblyAI SDK on first use,
+    so importing the pipeline doesn't pay for it.
+    """
+    global _aai
+    if _aai is None:
+        import assemblyai as aai
+        aai.settings.api_key = settings.ASSEMBLYAI_API_KEY
+        _aai = aai
+    return _aai
+
+# Transcription request parameters, named as in AssemblyAI's REST API. With the audio
+# normalization profile they make up the transcript cache fingerprint: changing any of
+# them invalidates cached transcripts.
+TRANSCRIPTION_PARAMS = {
+    "speaker_labels": True,  # Speaker Diarization
+    "redact_pii": True,      # PII Redaction
+    "redact_pii_policies": ["medical_process", "medical_condition", "person_name", "phone_number"],
+    "language_code": "en_us",
+    "punctuate": True,
+    "format_text": True,
+    # Word Boost for Neurology (Accent Adaptation)
+    "word_boost": [
+        "Levetiracetam",
+        "Donepezil",
+        "Carbamazepine",
+        "Sumatriptan",
+        "Topiramate",
+        "Valproate",
+        "Gabapentin",
+        "Memantine",
+    ],
+    "boost_param": "high",
+}
+TRANSCRIPTION_FINGERPRINT = config_fingerprint(
+    "assemblyai", {**TRANSCRIPTION_PARAMS, "audio": AudioPreprocessService.profile()}
+)
 
-# Configure global API key
-aai.settings.api_key = settings.ASSEMBLYAI_API_KEY
+def _sdk_config(aai):
+    params = dict(TRANSCRIPTION_PARAMS)
+    params["redact_pii_policies"] = [aai.PIIRedactionPolicy(p) for p in params["redact_pii_policies"]]
+    params["boost_param"] = aai.WordBoost(params["boost_param"])
+    return aai.TranscriptionConfig(**params)
 
 class AssemblyAIService:
     @staticmethod
-    async def transcribe_audio_async(file_path: str) -> dict:
+    async def transcribe_audio_async(file_path: str, content_sha256: Optional[str] = None) -> dict:
         """
         Asynchronously transcibes audio using AssemblyAI with polling.
         Enables Speaker Diarization and PII Redaction.
+        Byte-identical audio already transcribed with the same parameters is served
+        from the transcript cache ("cache_hit": True) without calling AssemblyAI.
+        Otherwise the audio is normalized (and optionally silence-trimmed) first;
+        "original_bytes"/"uploaded_bytes"/"trimmed_seconds" report what that saved.
+        With STT_CHUNKING_ENABLED long recordings are transcribed as parallel chunks
+        and stitched back together ("chunks" > 1).
         """
+        loop = asyncio.get_event_loop()
+        if content_sha256 is None:
+            content_sha256 = await loop.run_in_executor(None, sha256_file, file_path)
+        cached = await TranscriptCacheService.get(content_sha256, TRANSCRIPTION_FINGERPRINT)
+        if cached is not None:
+            return {**cached, "content_sha256": content_sha256, "cache_hit": True}
+
+        async with AudioPreprocessService.prepared(file_path) as audio:
+            if audio.chunks:
+                # Long recording: chunks run concurrently, at most STT_CHUNK_MAX_PARALLEL per file
+                parallel = asyncio.Semaphore(settings.STT_CHUNK_MAX_PARALLEL)
+
+                async def transcribe_chunk(chunk: AudioChunk):
+                    async with parallel:
+                        return await AssemblyAIService._transcribe_file(chunk.path)
+
+                parts = await asyncio.gather(*(transcribe_chunk(chunk) for chunk in audio.chunks))
+                result = stitch_transcripts(list(zip(audio.chunks, parts)))
+                uploaded_bytes = sum(os.path.getsize(chunk.path) for chunk in audio.chunks)
+            else:
+                result = await AssemblyAIService._transcribe_file(audio.path)
+                uploaded_bytes = audio.upload_bytes
+            for u in result["utterances"]:
+                # Back on the original recording's clock if silences were trimmed
+                u["start"], u["end"] = audio.to_original_ms(u["start"]), audio.to_original_ms(u["end"])
+
+        await TranscriptCacheService.put(content_sha256, TRANSCRIPTION_FINGERPRINT, result)
+        return {
+            **result,
+            "content_sha256": content_sha256,
+            "cache_hit": False,
+            "original_bytes": audio.original_bytes,
+            "uploaded_bytes": uploaded_bytes,
+            "trimmed_seconds": audio.trimmed_seconds,
+            "chunks": len(audio.chunks) or 1,
+        }
+
+    @staticmethod
+    async def _transcribe_file(path: str) -> dict:
+        """One AssemblyAI job for `path`; utterance times are ms into that file."""
+        if settings.ASSEMBLYAI_ASYNC_CLIENT:
+            return await AssemblyAIService._transcribe_file_http(path)
+
+        aai = get_aai()
         transcriber = aai.Transcriber()
         
         # Configure for Medical domain requirements
-        config = aai.TranscriptionConfig(
-            speaker_labels=True,  # Speaker Diarization
-            redact_pii=True,      # PII Redaction
-            redact_pii_policies=[
-                aai.PIIRedactionPolicy.medical_process,
-                aai.PIIRedactionPolicy.medical_condition,
-                aai.PIIRedactionPolicy.person_name,
-                aai.PIIRedactionPolicy.phone_number,
-            ],
-            language_code="en_us",
-            punctuate=True,
-            format_text=True,
-            # Word Boost for Neurology (Accent Adaptation)
-            word_boost=[
-                "Levetiracetam", 
-                "Donepezil", 
-                "Carbamazepine", 
-                "Sumatriptan", 
-                "Topiramate", 
-                "Valproate",
-                "Gabapentin",
-                "Memantine"
-            ],
-            boost_param="high"
-        )
+        config = _sdk_config(aai)
 
-        # 1. Transcribe (Blocking call offloaded to thread)
-        # transcriber.transcribe() handles polling internally.
-        loop = asyncio.get_event_loop()
-        transcript = await loop.run_in_executor(
-            None,
-            lambda: transcriber.transcribe(file_path, config=config)
-        )
+        # Blocking call offloaded to thread; transcriber.transcribe() handles polling internally.
+        # The slot is held for the whole transcription, so ASSEMBLYAI_MAX_CONCURRENT bounds open jobs.
+        loop = asyncio.get_running_loop()
+        try:
+            async with assemblyai_limiter.slot():
+                transcript = await loop.run_in_executor(
+                    None,
+                    lambda: transcriber.transcribe(path, config=config)
+                )
+        except Exception as e:
+            if is_quota_error(e):
+                assemblyai_limiter.cool_down(settings.PROVIDER_QUOTA_COOLDOWN_SECONDS)
+            raise
             
         if transcript.status == aai.TranscriptStatus.error:
             raise Exception(f"Transcription failed: {transcript.error}")
@@ -65,3 +152,95 @@ class AssemblyAIService:
             "confidence": transcript.confidence,
             "id": transcript.id
         }
+
+
+    @staticmethod
+    async def _transcribe_file_http(path: str) -> dict:
+        """_transcribe_file over the REST API: no thread is held while the job runs."""
+        audio_seconds = AudioStorageService.probe_duration(path)
+        try:
+            async with assemblyai_limiter.slot():
+                transcript = await assemblyai_client.transcribe(path, TRANSCRIPTION_PARAMS, audio_seconds)
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code == 429:
+                assemblyai_limiter.cool_down(settings.PROVIDER_QUOTA_COOLDOWN_SECONDS)
+            raise
+
+        return {
+            "text": transcript.get("text"),
+            "utterances": [
+                {"speaker": u["speaker"], "text": u["text"], "start": u["start"], "end": u["end"]}
+                for u in transcript.get("utterances") or []
+            ],
+            "confidence": transcript.get("confidence"),
+            "id": transcript.get("id"),
+        }
+
+
+# --- Stitching chunked transcripts ---
+
+def _match_speakers(previous: List[dict], current: List[dict]) -> Dict[str, str]:
+    """
+    Maps the current chunk's speaker labels onto the previous chunk's, by how long
+    their utterances coincide in the overlapping audio. Speakers with no counterpart
+    keep their label unless it is already taken, in which case they get a new one.
+    """
+    shared_ms: Dict[tuple, int] = defaultdict(int)
+    for c in current:
+        for p in previous:
+            overlap = min(c["end"], p["end"]) - max(c["start"], p["start"])
+            if overlap > 0:
+                shared_ms[(c["speaker"], p["speaker"])] += overlap
+
+    mapping: Dict[str, str] = {}
+    taken = set()
+    for (label, previous_label), _ in sorted(shared_ms.items(), key=lambda item: -item[1]):
+        if label not in mapping and previous_label not in taken:
+            mapping[label] = previous_label
+            taken.add(previous_label)
+
+    used = taken | {p["speaker"] for p in previous}
+    for label in sorted({c["speaker"] for c in current} - mapping.keys()):
+        new_label = label if label not in taken else next(c for c in string.ascii_uppercase if c not in used)
+        mapping[label] = new_label
+        taken.add(new_label)
+        used.add(new_label)
+    return mapping
+
+
+def stitch_transcripts(parts: List[Tuple[AudioChunk, dict]]) -> dict:
+    """
+    Joins per-chunk results into one transcript: utterance times are shifted to the
+    full audio, each utterance is kept only by the chunk owning its midpoint (the
+    overlaps are transcribed twice), and speaker labels follow the first chunk's.
+    """
+    utterances: List[dict] = []
+    previous: Optional[List[dict]] = None
+    weighted_confidence, owned_ms = 0.0, 0
+    for chunk, result in parts:
+        shifted = [
+            {**u, "start": u["start"] + chunk.start_ms, "end": u["end"] + chunk.start_ms}
+            for u in result["utterances"]
+        ]
+        if previous is not None:
+            mapping = _match_speakers(previous, shifted)
+            for u in shifted:
+                u["speaker"] = mapping[u["speaker"]]
+        utterances.extend(u for u in shifted if chunk.own_start_ms <= (u["start"] + u["end"]) / 2 < chunk.own_end_ms)
+        previous = shifted
+
+        if result.get("confidence") is not None:
+            span = chunk.own_end_ms - chunk.own_start_ms
+            weighted_confidence += result["confidence"] * span
+            owned_ms += span
+
+    if utterances:
+        text = " ".join(u["text"] for u in utterances)
+    else:
+        text = " ".join(result["text"] for _, result in parts if result.get("text"))
+    return {
+        "text": text,
+        "utterances": utterances,
+        "confidence": weighted_confidence / owned_ms if owned_ms else None,
+        "id": ",".join(result["id"] for _, result in parts if result.get("id")),
+    }
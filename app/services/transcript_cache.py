@@ -0,0 +1,72 @@
+import hashlib
+import json
+import logging
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.db import async_engine
+from app.models.base import TranscriptCacheEntry
+
+logger = logging.getLogger(__name__)
+
+HASH_CHUNK_BYTES = 1024 * 1024
+
+
+def sha256_file(path: str) -> str:
+    """Streaming SHA-256 of a file on disk (for audio that wasn't hashed at upload)."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_BYTES), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def config_fingerprint(provider: str, params: Dict[str, Any]) -> str:
+    """Stable hash of the provider and every request parameter that can change the transcript."""
+    canonical = json.dumps({"provider": provider, "params": params}, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode()).hexdigest()[:32]
+
+
+class TranscriptCacheService:
+    @staticmethod
+    async def get(content_sha256: str, fingerprint: str) -> Optional[Dict[str, Any]]:
+        async with AsyncSession(async_engine, expire_on_commit=False) as session:
+            entry = await session.get(TranscriptCacheEntry, (content_sha256, fingerprint))
+            if entry is None:
+                return None
+            await session.exec(
+                update(TranscriptCacheEntry)
+                .where(
+                    TranscriptCacheEntry.content_sha256 == content_sha256,
+                    TranscriptCacheEntry.config_fingerprint == fingerprint,
+                )
+                .values(hit_count=TranscriptCacheEntry.hit_count + 1, last_hit_at=datetime.utcnow())
+            )
+            await session.commit()
+            return {
+                "text": entry.text,
+                "utterances": entry.utterances or [],
+                "confidence": entry.confidence,
+                "id": entry.provider_transcript_id,
+            }
+
+    @staticmethod
+    async def put(content_sha256: str, fingerprint: str, result: Dict[str, Any]):
+        async with AsyncSession(async_engine) as session:
+            session.add(TranscriptCacheEntry(
+                content_sha256=content_sha256,
+                config_fingerprint=fingerprint,
+                text=result.get("text"),
+                utterances=result.get("utterances"),
+                confidence=result.get("confidence"),
+                provider_transcript_id=result.get("id"),
+            ))
+            try:
+                await session.commit()
+            except IntegrityError:
+                # Another worker cached the same audio concurrently; theirs is as good as ours
+                await session.rollback()
@@ -0,0 +1,147 @@
+"""
+Deterministic transcript compaction before prompting: consecutive turns by the same
+speaker are merged, vocal fillers and stutters dropped, PII redaction runs collapsed
+to one placeholder, and what remains is cut to a token budget by omitting whole turns
+from the middle of the consultation (history at the start, plan at the end survive).
+"""
+import math
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+
+# Vocal fillers only; "mm-hmm"/"uh-huh" are kept, they answer questions. Case-sensitive:
+# lowercase anywhere, capitalised only where a sentence starts, so "ER", "UM" survive.
+_FILLERS = r"(?:um+|uh+|erm|er|ah+|hmm+)"
+FILLER_RE = re.compile(
+    rf",?\s*(?:(?<![\w'-]){_FILLERS}|(?:^|(?<=[.?!] ))(?:Um+|Uh+|Erm|Er|Ah+|Hmm+))(?![\w'-]),?"
+)
+# Immediate repeats of a word ("I I I think"), case-insensitive. Never numbers ("80, 80",
+# "10 10" can be readings or doses); "had had", "that that" are grammatical.
+STUTTER_RE = re.compile(r"\b(?!(?:had|that)\b)([^\W\d]+)(?:,?\s+\1\b)+", re.IGNORECASE)
+# AssemblyAI's default PII substitution replaces each redacted character with '#'
+REDACTION_RE = re.compile(r"#+(?:[\s,.'-]+#+)*")
+REDACTED = "[REDACTED]"
+WHITESPACE_RE = re.compile(r"\s+")
+SPACE_BEFORE_PUNCT_RE = re.compile(r"\s+([,.?!;:])")
+LEADING_PUNCT_RE = re.compile(r"^[\s,.;:]+")
+
+
+def estimate_tokens(text: str) -> int:
+    """Roughly 4 characters per token for English; deterministic and offline."""
+    return math.ceil(len(text) / 4)
+
+
+@dataclass
+class Turn:
+    speaker: str
+    text: str
+
+
+@dataclass
+class CompactedTranscript:
+    text: str
+    tokens_before: int
+    tokens_after: int
+    omitted_turns: int = 0
+
+
+def clean_text(text: str) -> str:
+    text = REDACTION_RE.sub(REDACTED, text)
+    text = FILLER_RE.sub(" ", text)
+    text = STUTTER_RE.sub(r"\1", text)
+    text = SPACE_BEFORE_PUNCT_RE.sub(r"\1", WHITESPACE_RE.sub(" ", text))
+    text = LEADING_PUNCT_RE.sub("", text).strip()
+    # A sentence that was only fillers leaves its punctuation behind
+    return "" if not any(c.isalnum() or c == "[" for c in text) else text
+
+
+def merge_turns(utterances: List[Dict[str, Any]]) -> List[Turn]:
+    """Cleans each utterance and merges consecutive ones by the same speaker, dropping an utterance identical to the one before."""
+    turns: List[Turn] = []
+    previous = None  # last utterance kept, as cleaned
+    for utter in utterances:
+        speaker = utter.get("speaker", "Unknown")
+        text = clean_text(utter.get("text", ""))
+        if not text:
+            continue
+        if turns and turns[-1].speaker == speaker:
+            if text != previous:
+                turns[-1].text = f"{turns[-1].text} {text}"
+        else:
+            turns.append(Turn(speaker, text))
+        previous = text
+    return turns
+
+
+def _line(turn: Turn) -> str:
+    return f"Speaker {turn.speaker}: {turn.text}"
+
+
+def _omission(count: int) -> str:
+    return f"[... {count} turn{'s' if count != 1 else ''} omitted ...]"
+
+
+def fit_turns(turns: List[Turn], budget: int) -> Tuple[List[str], int]:
+    """
+    Lines within `budget` tokens, and how many turns were left out. Whole turns are
+    dropped from the middle outwards; each speaker's first and last turn are kept (even
+    if they alone are over the budget) and the gap is marked.
+    """
+    lines = [_line(t) for t in turns]
+    tokens = [estimate_tokens(line) + 1 for line in lines]
+    total = sum(tokens)
+    if total <= budget:
+        return lines, 0
+
+    protected = set()
+    for speaker in {t.speaker for t in turns}:
+        indexes = [i for i, t in enumerate(turns) if t.speaker == speaker]
+        protected.update((indexes[0], indexes[-1]))
+    middle = (len(turns) - 1) / 2
+    # Dropping from the middle outwards leaves one gap (more only around protected turns)
+    total += estimate_tokens(_omission(len(turns))) + 1
+    dropped = set()
+    for i in sorted((i for i in range(len(turns)) if i not in protected), key=lambda i: (abs(i - middle), i)):
+        if total <= budget:
+            break
+        dropped.add(i)
+        total -= tokens[i]
+
+    kept: List[str] = []
+    gap = 0
+    for i, line in enumerate(lines):
+        if i in dropped:
+            gap += 1
+            continue
+        if gap:
+            kept.append(_omission(gap))
+            gap = 0
+        kept.append(line)
+    if gap:
+        kept.append(_omission(gap))
+    return kept, len(dropped)
+
+
+def compact_transcript(transcript_text: str, speaker_labels: Optional[List[Dict[str, Any]]] = None,
+                       budget: Optional[int] = None) -> CompactedTranscript:
+    """
+    The prompt-ready transcript and its estimated token counts before and after.
+    `budget` defaults to SOAP_TRANSCRIPT_TOKEN_BUDGET; 0 means no truncation.
+    """
+    budget = settings.SOAP_TRANSCRIPT_TOKEN_BUDGET if budget is None else budget
+    if not speaker_labels:
+        before = estimate_tokens(transcript_text)
+        text = clean_text(transcript_text)
+        if budget and estimate_tokens(text) > budget:
+            # No turns to drop: keep half the budget from each end
+            keep = budget * 2
+            text = f"{text[:keep]} [... text omitted ...] {text[-keep:]}"
+        return CompactedTranscript(text, before, estimate_tokens(text))
+
+    verbatim = "\n".join(f"Speaker {u.get('speaker', 'Unknown')}: {u.get('text', '')}" for u in speaker_labels)
+    turns = merge_turns(speaker_labels)
+    lines, omitted = fit_turns(turns, budget) if budget else ([_line(t) for t in turns], 0)
+    text = "\n".join(lines)
+    return CompactedTranscript(text, estimate_tokens(verbatim), estimate_tokens(text), omitted)
@@ -0,0 +1,124 @@
+"""
+Standalone AI pipeline worker: drains processing_jobs outside the API process.
+
+    python -m app.worker                          # one process per core
+    python -m app.worker --processes 4 --concurrency 3
+
+Each process runs a JobWorker with --concurrency jobs in flight. SIGTERM/SIGINT
+stop claiming new jobs and let in-flight ones finish; their leases let another
+worker pick up anything a killed process leaves behind. Run the API with
+JOB_QUEUE_INPROCESS_WORKER=false when these workers are deployed.
+"""
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import os
+import signal
+import sys
+import time
+from typing import List, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger("app.worker")
+
+# A child that dies sooner than this after starting is treated as a crash loop, not restarted
+MIN_CHILD_UPTIME_SECONDS = 10.0
+
+
+async def _run(concurrency: int):
+    from app.services.job_queue import JobWorker
+
+    worker = JobWorker(concurrency=concurrency)
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, worker.stop)
+    await worker.run()
+    from app.services.assemblyai_client import assemblyai_client
+    await assemblyai_client.aclose()
+
+
+def run_worker(concurrency: int):
+    """Entry point of one worker process."""
+    logging.basicConfig(level=logging.INFO, format=f"%(asctime)s [worker {os.getpid()}] %(levelname)s %(message)s")
+    from app.services.audio_preprocess import shutdown_audio_pool
+    from app.services.llm_service import shutdown_gemini_pool
+
+    try:
+        asyncio.run(_run(concurrency))
+    finally:
+        shutdown_audio_pool()
+        shutdown_gemini_pool()
+
+
+def _start_child(ctx, concurrency: int):
+    process = ctx.Process(target=run_worker, args=(concurrency,), daemon=False)
+    process.start()
+    return process, time.monotonic()
+
+
+def run_pool(processes: int, concurrency: int) -> bool:
+    """Supervises `processes` worker processes, restarting any that exit unexpectedly."""
+    # spawn: each child builds its own engines and event loop instead of inheriting ours
+    ctx = multiprocessing.get_context("spawn")
+    children = [_start_child(ctx, concurrency) for _ in range(processes)]
+    stopping = False
+    crashed = False
+
+    def _stop(signum, frame):
+        nonlocal stopping
+        if stopping:
+            return
+        stopping = True
+        logger.info("Received signal %d, draining %d worker process(es)", signum, len(children))
+        for process, _ in children:
+            if process.is_alive():
+                os.kill(process.pid, signal.SIGTERM)
+
+    signal.signal(signal.SIGTERM, _stop)
+    signal.signal(signal.SIGINT, _stop)
+
+    while children:
+        time.sleep(0.5)
+        alive = []
+        for process, started_at in children:
+            if process.is_alive():
+                alive.append((process, started_at))
+                continue
+            process.join()
+            if stopping:
+                continue
+            if time.monotonic() - started_at < MIN_CHILD_UPTIME_SECONDS:
+                logger.error("Worker %d exited with %s right after starting; not restarting", process.pid, process.exitcode)
+                crashed = True
+                continue
+            logger.warning("Worker %d exited with %s; restarting", process.pid, process.exitcode)
+            alive.append(_start_child(ctx, concurrency))
+        children = alive
+    logger.info("All workers stopped")
+    return not crashed
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(prog="python -m app.worker", description="Run the AI pipeline job workers.")
+    parser.add_argument("--processes", type=int, default=settings.WORKER_PROCESSES or os.cpu_count() or 1,
+                        help="worker processes (default: WORKER_PROCESSES, else one per core)")
+    parser.add_argument("--concurrency", type=int, default=settings.JOB_WORKER_CONCURRENCY,
+                        help="jobs in flight per process (default: JOB_WORKER_CONCURRENCY)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [supervisor] %(levelname)s %(message)s")
+    from app.core.db import check_schema
+    check_schema()
+
+    if args.processes <= 1:
+        run_worker(args.concurrency)
+    else:
+        logger.info("Starting %d worker processes x %d concurrent jobs", args.processes, args.concurrency)
+        if not run_pool(args.processes, args.concurrency):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,93 @@
+"""
+Cold-start benchmark for API workers.
+
+Measures, in fresh interpreters:
+  * import time of app.main and of the pipeline module
+  * time until startup hooks have run (TestClient lifespan, i.e. what uvicorn does before serving)
+and checks that the provider SDKs are not imported on either path.
+
+Exits non-zero when a budget is exceeded, so it can gate CI:
+    python bench_cold_start.py --runs 5 --max-import-ms 2500 --max-startup-ms 3000
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+PROVIDER_SDKS = ("google.generativeai", "assemblyai")
+
+PROBE = r"""
+import json, sys, time
+start = time.perf_counter()
+import app.main
+imported = time.perf_counter()
+import app.services.consultation_processor
+pipeline = time.perf_counter()
+from fastapi.testclient import TestClient
+with TestClient(app.main.app):
+    started = time.perf_counter()
+print(json.dumps({
+    "import_ms": (imported - start) * 1000,
+    "pipeline_import_ms": (pipeline - imported) * 1000,
+    "startup_ms": (started - start) * 1000,
+    "sdks_loaded": [m for m in %r if m in sys.modules],
+}))
+""" % (PROVIDER_SDKS,)
+
+
+def run_probe(env):
+    out = subprocess.run(
+        [sys.executable, "-c", PROBE], env=env, capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-import-ms", type=float, default=None)
+    parser.add_argument("--max-startup-ms", type=float, default=None)
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env.setdefault("JWT_SECRET", "bench")
+    env.setdefault("ASSEMBLYAI_API_KEY", "bench")
+    env.setdefault("GOOGLE_API_KEY", "bench")
+    if "DATABASE_URL" not in env:
+        env["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'cold_start.db')}"
+
+    # The first run creates the SQLite schema; it's reported but not counted.
+    warmup = run_probe(env)
+    results = [run_probe(env) for _ in range(args.runs)]
+
+    def summary(key):
+        values = [r[key] for r in results]
+        return statistics.median(values), max(values)
+
+    print(f"Cold start over {args.runs} runs (warm-up startup: {warmup['startup_ms']:.0f} ms)")
+    failures = []
+    for key, budget in (
+        ("import_ms", args.max_import_ms),
+        ("pipeline_import_ms", None),
+        ("startup_ms", args.max_startup_ms),
+    ):
+        median, worst = summary(key)
+        print(f"  {key:<20} median {median:8.1f} ms   max {worst:8.1f} ms")
+        if budget is not None and median > budget:
+            failures.append(f"{key} median {median:.1f} ms > budget {budget:.1f} ms")
+
+    loaded = sorted({m for r in results for m in r["sdks_loaded"]})
+    print(f"  provider SDKs loaded at start-up: {loaded or 'none'}")
+    if loaded:
+        failures.append(f"provider SDKs imported eagerly: {', '.join(loaded)}")
+
+    if failures:
+        print("FAIL: " + "; ".join(failures))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
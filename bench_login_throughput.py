@@ -0,0 +1,128 @@
+"""
+Login throughput benchmark ("shift change": many staff logging in at once).
+
+Starts the API under uvicorn in a subprocess, creates --users accounts, then fires
+--requests logins with --concurrency in flight. Alongside the storm it polls a cheap
+endpoint (/api/v1/users/doctors) to show whether request handling stays responsive
+while passwords are being verified.
+
+    python bench_login_throughput.py --hash-workers 4 --concurrency 32 --requests 400
+    python bench_login_throughput.py --rounds 100000   # cost of a stronger PASSWORD_HASH_ROUNDS
+"""
+import argparse
+import asyncio
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+PASSWORD = "bench-password"
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def wait_ready(client: httpx.AsyncClient, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if (await client.get("/api/v1/users/doctors")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError("API did not start")
+
+
+async def run(args, base_url):
+    async with httpx.AsyncClient(base_url=base_url, timeout=60) as client:
+        await wait_ready(client)
+
+        emails = [f"bench_{i}_{os.getpid()}@example.com" for i in range(args.users)]
+        for email in emails:
+            r = await client.post("/api/v1/auth/signup", json={
+                "email": email, "password": PASSWORD, "role": "FRONT_DESK", "first_name": "B", "last_name": "N",
+            })
+            r.raise_for_status()
+
+        login_ms, probe_ms, statuses = [], [], {}
+        semaphore = asyncio.Semaphore(args.concurrency)
+        storm_done = asyncio.Event()
+
+        async def login(i):
+            async with semaphore:
+                start = time.perf_counter()
+                r = await client.post("/api/v1/auth/login", data={"username": emails[i % len(emails)], "password": PASSWORD})
+                login_ms.append((time.perf_counter() - start) * 1000)
+                statuses[r.status_code] = statuses.get(r.status_code, 0) + 1
+
+        async def probe():
+            while not storm_done.is_set():
+                start = time.perf_counter()
+                await client.get("/api/v1/users/doctors")
+                probe_ms.append((time.perf_counter() - start) * 1000)
+                await asyncio.sleep(0.05)
+
+        prober = asyncio.create_task(probe())
+        started = time.perf_counter()
+        await asyncio.gather(*(login(i) for i in range(args.requests)))
+        elapsed = time.perf_counter() - started
+        storm_done.set()
+        await prober
+
+    print(f"Logins: {args.requests} at concurrency {args.concurrency}, "
+          f"PASSWORD_HASH_WORKERS={args.hash_workers}, PASSWORD_HASH_ROUNDS={args.rounds}")
+    print(f"  throughput        {args.requests / elapsed:8.1f} logins/s")
+    print(f"  login latency     p50 {statistics.median(login_ms):7.1f} ms   p95 {percentile(login_ms, 95):7.1f} ms")
+    if probe_ms:
+        print(f"  /users/doctors    p50 {statistics.median(probe_ms):7.1f} ms   p95 {percentile(probe_ms, 95):7.1f} ms  (during storm)")
+    print(f"  status codes      {dict(sorted(statuses.items()))}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--hash-workers", type=int, default=2)
+    parser.add_argument("--max-pending", type=int, default=64)
+    parser.add_argument("--rounds", type=int, default=29000)
+    args = parser.parse_args()
+
+    port = free_port()
+    env = dict(os.environ)
+    env.setdefault("JWT_SECRET", "bench")
+    env.setdefault("ASSEMBLYAI_API_KEY", "bench")
+    env.setdefault("GOOGLE_API_KEY", "bench")
+    if "DATABASE_URL" not in env:
+        env["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'login_bench.db')}"
+    env["PASSWORD_HASH_WORKERS"] = str(args.hash_workers)
+    env["PASSWORD_HASH_MAX_PENDING"] = str(args.max_pending)
+    env["PASSWORD_HASH_ROUNDS"] = str(args.rounds)
+
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        env=env,
+    )
+    try:
+        asyncio.run(run(args, f"http://127.0.0.1:{port}"))
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+
+if __name__ == "__main__":
+    main()
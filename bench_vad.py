@@ -0,0 +1,88 @@
+"""
+Silence-trimming report over recordings (default: test-audios/).
+
+For each file: the duration after normalization, what the VAD keeps with the current
+AUDIO_VAD_* settings (or the flags below), the trimmed-seconds ratio and processing time.
+Compressed files are decoded with ffmpeg (AUDIO_FFMPEG_BINARY) as in the pipeline and
+skipped when it isn't installed.
+
+    python bench_vad.py
+    python bench_vad.py 3-audio.aac /data/consultations --min-silence-ms 1000 --margin-db 10
+"""
+import argparse
+import glob
+import os
+import tempfile
+import time
+import wave
+
+os.environ.setdefault("JWT_SECRET", "bench")
+os.environ.setdefault("ASSEMBLYAI_API_KEY", "bench")
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from app.core.config import settings  # noqa: E402
+from app.services.audio_preprocess import decode_with_ffmpeg, read_wav_mono, resample, trim_silence  # noqa: E402
+
+AUDIO_EXTENSIONS = (".wav", ".mp3", ".m4a", ".aac")
+
+
+def collect(paths):
+    found = []
+    for path in paths:
+        if os.path.isdir(path):
+            found += [p for p in glob.glob(os.path.join(path, "**", "*"), recursive=True) if p.lower().endswith(AUDIO_EXTENSIONS)]
+        else:
+            found.append(path)
+    return sorted(found)
+
+
+def load(path, workdir):
+    """(mono samples, rate), decoding compressed audio to AUDIO_TARGET_SAMPLE_RATE PCM first."""
+    if not path.lower().endswith(".wav"):
+        decoded = decode_with_ffmpeg(path, os.path.join(workdir, "decoded"), settings.AUDIO_TARGET_SAMPLE_RATE)
+        if decoded is None:
+            raise ValueError("ffmpeg not installed or could not decode")
+        path = decoded
+    return read_wav_mono(path)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("paths", nargs="*", default=["test-audios"], help="audio files or folders")
+    parser.add_argument("--min-silence-ms", type=int, default=settings.AUDIO_VAD_MIN_SILENCE_MS)
+    parser.add_argument("--keep-silence-ms", type=int, default=settings.AUDIO_VAD_KEEP_SILENCE_MS)
+    parser.add_argument("--margin-db", type=float, default=settings.AUDIO_VAD_MARGIN_DB)
+    args = parser.parse_args()
+
+    paths = collect(args.paths)
+    if not paths:
+        print(f"No audio files under {', '.join(args.paths)}")
+        return
+
+    print(f"{'file':40} {'audio s':>9} {'kept s':>9} {'trimmed':>8} {'ms':>7}")
+    total_in = total_out = 0.0
+    for path in paths:
+        try:
+            with tempfile.TemporaryDirectory() as workdir:
+                samples, rate = load(path, workdir)
+        except (wave.Error, EOFError, ValueError) as e:
+            print(f"{os.path.basename(path):40} skipped ({e})")
+            continue
+        started = time.perf_counter()
+        target = min(rate, settings.AUDIO_TARGET_SAMPLE_RATE)
+        samples = resample(samples, rate, target)
+        trimmed, _ = trim_silence(samples, target, args.min_silence_ms, args.keep_silence_ms, args.margin_db)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        seconds_in, seconds_out = len(samples) / target, len(trimmed) / target
+        total_in += seconds_in
+        total_out += seconds_out
+        ratio = 1 - seconds_out / seconds_in if seconds_in else 0.0
+        print(f"{os.path.basename(path):40} {seconds_in:9.1f} {seconds_out:9.1f} {ratio:8.1%} {elapsed_ms:7.0f}")
+
+    if total_in:
+        print(f"{'TOTAL':40} {total_in:9.1f} {total_out:9.1f} {1 - total_out / total_in:8.1%}")
+
+
+if __name__ == "__main__":
+    main()
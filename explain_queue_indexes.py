@@ -0,0 +1,163 @@
+"""
+Seeds a throwaway database with ~1M consultations and captures EXPLAIN output
+and timings for the queue and /me queries before and after the 0001 index pack.
+
+Usage:
+    python explain_queue_indexes.py                       # SQLite file in the working dir
+    python explain_queue_indexes.py --url postgresql://... --rows 1000000
+The target database is dropped and recreated, so never point it at real data.
+"""
+import argparse
+import os
+import random
+import time
+from datetime import datetime, timedelta
+from uuid import uuid4
+
+os.environ.setdefault("JWT_SECRET", "explain")
+os.environ.setdefault("ASSEMBLYAI_API_KEY", "explain")
+os.environ.setdefault("DATABASE_URL", "sqlite:///explain_queue_indexes.db")
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import selectinload
+from sqlmodel import SQLModel, select
+
+from app.models.base import (
+    Appointment, Consultation, ConsultationStatus, PatientProfile, User, UserRole,
+)
+
+NEW_INDEXES = [
+    "ix_appointments_patient_id",
+    "ix_appointments_doctor_id",
+    "ix_consultations_patient_id",
+    "ix_consultations_doctor_id",
+    "ix_consultations_status_urgency_created",
+    "ix_consultations_open_urgency_created",
+    "ix_consultations_manual_review_created",
+]
+
+
+def build_queries(patient_id, doctor_id):
+    # Same statements as the routers issue (dashboard.py, admin.py, appointments.py, consultations.py)
+    return {
+        "dashboard /queue": (
+            select(Consultation, PatientProfile)
+            .join(PatientProfile, Consultation.patient_id == PatientProfile.user_id)
+            .where(Consultation.status == ConsultationStatus.COMPLETED)
+            .order_by(Consultation.urgency_score.desc(), Consultation.created_at.asc())
+            .limit(50)
+        ),
+        "admin /triage_queue": (
+            select(Consultation, PatientProfile)
+            .join(PatientProfile, Consultation.patient_id == PatientProfile.user_id)
+            .where(Consultation.status != ConsultationStatus.COMPLETED)
+            .order_by(Consultation.urgency_score.desc(), Consultation.created_at.asc())
+            .limit(50)
+        ),
+        "dashboard /queue/failed": (
+            select(Consultation, PatientProfile)
+            .join(PatientProfile, Consultation.patient_id == PatientProfile.user_id)
+            .where(Consultation.requires_manual_review == True)
+            .order_by(Consultation.created_at.desc())
+            .limit(50)
+        ),
+        "appointments /me (patient)": select(Appointment).where(Appointment.patient_id == patient_id),
+        "consultations /me (doctor)": select(Consultation).where(Consultation.doctor_id == doctor_id),
+    }
+
+
+def seed(engine, rows: int, patients: int, doctors: int):
+    SQLModel.metadata.drop_all(engine)
+    SQLModel.metadata.create_all(engine)
+    with engine.begin() as conn:
+        for name in NEW_INDEXES:
+            conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+
+    rng = random.Random(42)
+    now = datetime(2026, 1, 1)
+    patient_ids = [uuid4() for _ in range(patients)]
+    doctor_ids = [uuid4() for _ in range(doctors)]
+    statuses = [s.value for s in ConsultationStatus]
+    status_weights = [5, 10, 80, 3, 2]  # mostly COMPLETED, like a live clinic DB
+
+    with engine.begin() as conn:
+        conn.execute(User.__table__.insert(), [
+            {"id": uid, "email": f"{uid}@seed", "password_hash": "x", "role": role,
+             "created_at": now, "updated_at": now}
+            for ids, role in ((patient_ids, UserRole.PATIENT), (doctor_ids, UserRole.DOCTOR))
+            for uid in ids
+        ])
+        conn.execute(PatientProfile.__table__.insert(), [
+            {"id": uuid4(), "user_id": uid, "first_name": "Seed", "last_name": str(i),
+             "phone_number": "9999999999", "created_at": now, "updated_at": now}
+            for i, uid in enumerate(patient_ids)
+        ])
+
+    batch = 50_000
+    for offset in range(0, rows, batch):
+        appointments, consultations = [], []
+        for i in range(offset, min(offset + batch, rows)):
+            created = now - timedelta(minutes=rows - i)
+            appointment_id = uuid4()
+            patient_id = rng.choice(patient_ids)
+            doctor_id = rng.choice(doctor_ids)
+            status = rng.choices(statuses, status_weights)[0]
+            appointments.append({
+                "id": appointment_id, "patient_id": patient_id, "doctor_id": doctor_id,
+                "scheduled_at": created, "status": "SCHEDULED", "created_at": created, "updated_at": created,
+            })
+            consultations.append({
+                "id": uuid4(), "appointment_id": appointment_id, "patient_id": patient_id,
+                "doctor_id": doctor_id, "status": status, "urgency_score": rng.choice([20, 50, 75, 90, 95]),
+                "requires_manual_review": status == "FAILED", "created_at": created, "updated_at": created,
+            })
+        with engine.begin() as conn:
+            conn.execute(Appointment.__table__.insert(), appointments)
+            conn.execute(Consultation.__table__.insert(), consultations)
+        print(f"  seeded {min(offset + batch, rows):,}/{rows:,}")
+    return patient_ids[0], doctor_ids[0]
+
+
+def explain(engine, queries, label: str):
+    print(f"\n## {label}\n")
+    with engine.connect() as conn:
+        for name, statement in queries.items():
+            sql = str(statement.compile(engine, compile_kwargs={"literal_binds": True}))
+            prefix = "EXPLAIN QUERY PLAN " if engine.dialect.name == "sqlite" else "EXPLAIN (ANALYZE, BUFFERS) "
+            plan = [" | ".join(str(col) for col in row) for row in conn.execute(text(prefix + sql))]
+            start = time.perf_counter()
+            conn.execute(statement).fetchall()
+            elapsed = (time.perf_counter() - start) * 1000
+            print(f"### {name}  ({elapsed:.1f} ms)\n```")
+            print("\n".join(plan))
+            print("```")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default=os.environ["DATABASE_URL"])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--patients", type=int, default=50_000)
+    parser.add_argument("--doctors", type=int, default=200)
+    args = parser.parse_args()
+
+    engine = create_engine(args.url)
+    print(f"Seeding {args.rows:,} consultations into {engine.url.render_as_string()} ...")
+    patient_id, doctor_id = seed(engine, args.rows, args.patients, args.doctors)
+    queries = build_queries(patient_id, doctor_id)
+
+    with engine.begin() as conn:
+        conn.execute(text("ANALYZE"))
+    explain(engine, queries, "Before (baseline schema)")
+
+    with engine.begin() as conn:
+        for table in (Appointment.__table__, Consultation.__table__):
+            for index in table.indexes:
+                if index.name in NEW_INDEXES:
+                    index.create(conn)
+        conn.execute(text("ANALYZE"))
+    explain(engine, queries, "After (0001_queue_indexes)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,9 @@
 const API_BASE_URL = "http://localhost:8000/api/v1";
 
-export async function apiRequest(endpoint: string, options: RequestInit = {}) {
+// List endpoints return one page at a time; this header carries the cursor for the next one
+const NEXT_CURSOR_HEADER = "X-Next-Cursor";
+
+async function send(endpoint: string, options: RequestInit = {}) {
     const token = localStorage.getItem("neuroassist_token");
 
     const headers = {
@@ -32,5 +35,24 @@ export async function apiRequest(endpoint: string, options: RequestInit = {}) {
         throw new Error(errorMessage);
     }
 
+    return response;
+}
+
+export async function apiRequest(endpoint: string, options: RequestInit = {}) {
+    const response = await send(endpoint, options);
     return response.json();
 }
+
+// Fetches every page of a paginated list endpoint by following X-Next-Cursor
+export async function apiRequestAll<T = any>(endpoint: string, options: RequestInit = {}): Promise<T[]> {
+    const items: T[] = [];
+    let cursor: string | null = null;
+    do {
+        const separator = endpoint.includes("?") ? "&" : "?";
+        const url = cursor ? `${endpoint}${separator}cursor=${encodeURIComponent(cursor)}` : endpoint;
+        const response = await send(url, options);
+        items.push(...(await response.json()));
+        cursor = response.headers.get(NEXT_CURSOR_HEADER);
+    } while (cursor);
+    return items;
+}
@@ -1,5 +1,5 @@
 import { useState, useEffect } from "react";
-import { apiRequest } from "@/lib/api";
+import { apiRequest, apiRequestAll } from "@/lib/api";
 import { Card, CardContent, CardHeader, CardTitle } from "@/components/ui/card";
 import { PriorityChip } from "@/components/PriorityChip";
 import { WaitTimer } from "@/components/WaitTimer";
@@ -57,14 +57,14 @@ export default function AdminDashboard() {
   useEffect(() => {
     async function fetchData() {
       try {
-        const queueData = await apiRequest("/admin/triage_queue");
+        const queueData = await apiRequestAll("/admin/triage_queue");
         const mappedQueue = queueData.map((p: any) => ({
           ...p,
           checkInTime: new Date(p.checkInTime)
         }));
         setPatients(mappedQueue);
 
-        const doctorsData = await apiRequest("/users/doctors");
+        const doctorsData = await apiRequestAll("/users/doctors");
         setDoctors(doctorsData);
       } catch (error) {
         toast({
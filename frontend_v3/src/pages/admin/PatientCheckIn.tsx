@@ -23,7 +23,7 @@ import { Textarea } from "@/components/ui/textarea";
 import { Badge } from "@/components/ui/badge";
 import { useToast } from "@/hooks/use-toast";
 import { cn } from "@/lib/utils";
-import { apiRequest } from "@/lib/api";
+import { apiRequest, apiRequestAll } from "@/lib/api";
 import {
     Dialog,
     DialogContent,
@@ -106,8 +106,8 @@ export default function PatientCheckIn() {
 
     const fetchData = async () => {
         try {
-            const patientsData = await apiRequest("/users/patients");
-            const doctorsData = await apiRequest("/users/doctors");
+            const patientsData = await apiRequestAll("/users/patients");
+            const doctorsData = await apiRequestAll("/users/doctors");
             setPatients(patientsData);
             setDoctors(doctorsData);
         } catch (error) {
@@ -0,0 +1,71 @@
+"""Index pack for the triage / worklist queue queries and the /me listings
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17
+
+Databases created by SQLModel.metadata.create_all before this revision already
+have every table; this revision only adds indexes. On Postgres they are built
+CONCURRENTLY so a large consultations table stays writable during the upgrade.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+# (name, table, columns, partial-index predicate)
+INDEXES = [
+    ("ix_appointments_patient_id", "appointments", ["patient_id"], None),
+    ("ix_appointments_doctor_id", "appointments", ["doctor_id"], None),
+    ("ix_consultations_patient_id", "consultations", ["patient_id"], None),
+    ("ix_consultations_doctor_id", "consultations", ["doctor_id"], None),
+    (
+        "ix_consultations_status_urgency_created",
+        "consultations",
+        ["status", sa.text("urgency_score DESC"), "created_at"],
+        None,
+    ),
+    (
+        "ix_consultations_open_urgency_created",
+        "consultations",
+        [sa.text("urgency_score DESC"), "created_at"],
+        "status != 'COMPLETED'",
+    ),
+    (
+        "ix_consultations_manual_review_created",
+        "consultations",
+        ["created_at"],
+        {"postgresql": "requires_manual_review = true", "sqlite": "requires_manual_review = 1"},
+    ),
+]
+
+
+def _where(predicate, dialect: str) -> dict:
+    if predicate is None:
+        return {}
+    if isinstance(predicate, dict):
+        predicate = predicate[dialect]
+    return {f"{dialect}_where": sa.text(predicate)}
+
+
+def upgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    if dialect == "postgresql":
+        # CREATE INDEX CONCURRENTLY cannot run inside a transaction block.
+        with op.get_context().autocommit_block():
+            for name, table, columns, predicate in INDEXES:
+                op.create_index(
+                    name, table, columns, if_not_exists=True,
+                    postgresql_concurrently=True, **_where(predicate, dialect),
+                )
+    else:
+        for name, table, columns, predicate in INDEXES:
+            op.create_index(name, table, columns, if_not_exists=True, **_where(predicate, dialect))
+
+
+def downgrade() -> None:
+    for name, table, _, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table, if_exists=True)
@@ -0,0 +1,91 @@
+"""Materialized triage_queue table
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17
+
+One row per consultation with the patient's name and phone denormalized in,
+so the queue endpoints read a single indexed table instead of joining
+consultations to patient_profiles on every poll. Backfilled from existing rows.
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+CONSULTATION_STATUSES = ("SCHEDULED", "IN_PROGRESS", "COMPLETED", "CANCELLED", "FAILED")
+APPOINTMENT_STATUSES = ("SCHEDULED", "CHECKED_IN", "IN_PROGRESS", "COMPLETED", "CANCELLED", "NO_SHOW")
+TRIAGE_CATEGORIES = ("CRITICAL", "HIGH", "MODERATE", "LOW")
+
+
+def upgrade() -> None:
+    op.create_table(
+        "triage_queue",
+        sa.Column("consultation_id", sqlmodel.sql.sqltypes.GUID(), sa.ForeignKey("consultations.id"), primary_key=True),
+        sa.Column("appointment_id", sqlmodel.sql.sqltypes.GUID(), nullable=False),
+        sa.Column("patient_id", sqlmodel.sql.sqltypes.GUID(), nullable=False),
+        sa.Column("doctor_id", sqlmodel.sql.sqltypes.GUID(), nullable=True),
+        sa.Column("doctor_name", sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+        sa.Column("patient_name", sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column("phone", sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+        sa.Column("status", sa.Enum(*CONSULTATION_STATUSES, name="consultationstatus", native_enum=False), nullable=False),
+        sa.Column("appointment_status", sa.Enum(*APPOINTMENT_STATUSES, name="appointmentstatus", native_enum=False), nullable=True),
+        sa.Column("urgency_score", sa.Integer(), nullable=False),
+        sa.Column("triage_category", sa.Enum(*TRIAGE_CATEGORIES, name="triagecategory", native_enum=False), nullable=True),
+        sa.Column("symptoms", sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+        sa.Column("safety_warning_count", sa.Integer(), nullable=False),
+        sa.Column("requires_manual_review", sa.Boolean(), nullable=False),
+        sa.Column("checked_in_at", sa.DateTime(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+    )
+    op.create_index("ix_triage_queue_appointment_id", "triage_queue", ["appointment_id"])
+    op.create_index("ix_triage_queue_patient_id", "triage_queue", ["patient_id"])
+    op.create_index(
+        "ix_triage_queue_status_urgency_checkin", "triage_queue",
+        ["status", sa.text("urgency_score DESC"), "checked_in_at"],
+    )
+
+    dialect = op.get_bind().dialect.name
+    true_literal = "true" if dialect == "postgresql" else "1"
+    op.create_index(
+        "ix_triage_queue_open_urgency_checkin", "triage_queue",
+        [sa.text("urgency_score DESC"), "checked_in_at"],
+        **{f"{dialect}_where": sa.text("status != 'COMPLETED'")},
+    )
+    op.create_index(
+        "ix_triage_queue_manual_review_checkin", "triage_queue", ["checked_in_at"],
+        **{f"{dialect}_where": sa.text(f"requires_manual_review = {true_literal}")},
+    )
+
+    # safety_warnings is JSON; Python None is stored as JSON null, so guard the array length.
+    if dialect == "postgresql":
+        warning_count = (
+            "CASE WHEN json_typeof(c.safety_warnings) = 'array' "
+            "THEN json_array_length(c.safety_warnings) ELSE 0 END"
+        )
+    else:
+        warning_count = "COALESCE(json_array_length(c.safety_warnings), 0)"
+
+    op.execute(f"""
+        INSERT INTO triage_queue (
+            consultation_id, appointment_id, patient_id, doctor_id, doctor_name,
+            patient_name, phone, status, appointment_status, urgency_score, triage_category,
+            symptoms, safety_warning_count, requires_manual_review, checked_in_at, updated_at
+        )
+        SELECT
+            c.id, c.appointment_id, c.patient_id, c.doctor_id, a.doctor_name,
+            p.first_name || ' ' || p.last_name, p.phone_number, c.status, a.status,
+            COALESCE(c.urgency_score, 0), c.triage_category,
+            c.notes, {warning_count}, c.requires_manual_review, c.created_at, CURRENT_TIMESTAMP
+        FROM consultations c
+        JOIN patient_profiles p ON p.user_id = c.patient_id
+        LEFT JOIN appointments a ON a.id = c.appointment_id
+    """)
+
+
+def downgrade() -> None:
+    op.drop_table("triage_queue")
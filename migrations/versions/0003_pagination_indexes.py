@@ -0,0 +1,61 @@
+"""Composite indexes for keyset pagination on /appointments/me and /consultations/me
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17
+
+The per-role filter column now leads a (sort key, id) composite, so a page is a
+single index range scan. These supersede the single-column patient_id/doctor_id
+indexes from 0001, which are dropped.
+"""
+from alembic import op
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+NEW_INDEXES = [
+    ("ix_appointments_patient_scheduled", "appointments", ["patient_id", "scheduled_at", "id"]),
+    ("ix_appointments_doctor_scheduled", "appointments", ["doctor_id", "scheduled_at", "id"]),
+    ("ix_consultations_patient_created", "consultations", ["patient_id", "created_at", "id"]),
+    ("ix_consultations_doctor_created", "consultations", ["doctor_id", "created_at", "id"]),
+    ("ix_consultations_created", "consultations", ["created_at", "id"]),
+]
+
+SUPERSEDED_INDEXES = [
+    ("ix_appointments_patient_id", "appointments", ["patient_id"]),
+    ("ix_appointments_doctor_id", "appointments", ["doctor_id"]),
+    ("ix_consultations_patient_id", "consultations", ["patient_id"]),
+    ("ix_consultations_doctor_id", "consultations", ["doctor_id"]),
+]
+
+
+def _create(indexes, concurrently: bool):
+    for name, table, columns in indexes:
+        op.create_index(name, table, columns, if_not_exists=True, postgresql_concurrently=concurrently)
+
+
+def _drop(indexes, concurrently: bool):
+    for name, table, _ in indexes:
+        op.drop_index(name, table_name=table, if_exists=True, postgresql_concurrently=concurrently)
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name == "postgresql":
+        with op.get_context().autocommit_block():
+            _create(NEW_INDEXES, True)
+            _drop(SUPERSEDED_INDEXES, True)
+    else:
+        _create(NEW_INDEXES, False)
+        _drop(SUPERSEDED_INDEXES, False)
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == "postgresql":
+        with op.get_context().autocommit_block():
+            _create(SUPERSEDED_INDEXES, True)
+            _drop(NEW_INDEXES, True)
+    else:
+        _create(SUPERSEDED_INDEXES, False)
+        _drop(NEW_INDEXES, False)
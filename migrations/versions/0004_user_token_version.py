@@ -0,0 +1,27 @@
+"""User.token_version for token revocation
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17
+
+Access tokens carry the user's token_version in the "ver" claim; incrementing
+the column revokes every token issued before it. Existing users start at 0,
+which matches tokens issued before this claim existed.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("users") as batch_op:
+        batch_op.add_column(sa.Column("token_version", sa.Integer(), nullable=False, server_default="0"))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("users") as batch_op:
+        batch_op.drop_column("token_version")
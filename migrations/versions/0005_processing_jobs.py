@@ -0,0 +1,50 @@
+"""processing_jobs table for the durable pipeline queue
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17
+
+Uploads enqueue a row here instead of a FastAPI background task. Workers claim
+rows with FOR UPDATE SKIP LOCKED under a lease, so jobs survive restarts and
+several workers can drain the queue without processing a consultation twice.
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+JOB_STATUSES = ("QUEUED", "RUNNING", "SUCCEEDED", "FAILED")
+
+
+def upgrade() -> None:
+    op.create_table(
+        "processing_jobs",
+        sa.Column("id", sqlmodel.sql.sqltypes.GUID(), primary_key=True),
+        sa.Column("consultation_id", sqlmodel.sql.sqltypes.GUID(), sa.ForeignKey("consultations.id"), nullable=False),
+        sa.Column("status", sa.Enum(*JOB_STATUSES, name="jobstatus", native_enum=False), nullable=False),
+        sa.Column("attempts", sa.Integer(), nullable=False),
+        sa.Column("max_attempts", sa.Integer(), nullable=False),
+        sa.Column("available_at", sa.DateTime(), nullable=False),
+        sa.Column("lease_owner", sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+        sa.Column("lease_expires_at", sa.DateTime(), nullable=True),
+        sa.Column("last_error", sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+    )
+    op.create_index("ix_processing_jobs_consultation_id", "processing_jobs", ["consultation_id"])
+    op.create_index("ix_processing_jobs_status_available", "processing_jobs", ["status", "available_at"])
+    op.create_index("ix_processing_jobs_status_lease", "processing_jobs", ["status", "lease_expires_at"])
+
+    dialect = op.get_bind().dialect.name
+    op.create_index(
+        "uq_processing_jobs_active_consultation", "processing_jobs", ["consultation_id"], unique=True,
+        **{f"{dialect}_where": sa.text("status IN ('QUEUED', 'RUNNING')")},
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("processing_jobs")
@@ -0,0 +1,51 @@
+"""Pipeline stage checkpoints and persisted transcript details
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-17
+
+consultations.processing_stage records the last completed pipeline stage so a
+retry resumes after it. audio_files keeps the diarized utterances and STT
+confidence, which a resumed SOAP generation needs without re-transcribing.
+Existing rows are backfilled from what they already have.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+PROCESSING_STAGES = ("PENDING", "TRANSCRIBED", "SOAP_GENERATED", "TRIAGED", "SAFETY_CHECKED")
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("consultations") as batch_op:
+        batch_op.add_column(sa.Column(
+            "processing_stage",
+            sa.Enum(*PROCESSING_STAGES, name="processingstage", native_enum=False),
+            nullable=False,
+            server_default="PENDING",
+        ))
+    with op.batch_alter_table("audio_files") as batch_op:
+        batch_op.add_column(sa.Column("transcript_utterances", sa.JSON(), nullable=True))
+        batch_op.add_column(sa.Column("transcript_confidence", sa.Float(), nullable=True))
+
+    op.execute("""
+        UPDATE consultations SET processing_stage = 'TRANSCRIBED'
+        WHERE id IN (SELECT consultation_id FROM audio_files WHERE transcription IS NOT NULL)
+    """)
+    op.execute("""
+        UPDATE consultations SET processing_stage = 'SOAP_GENERATED'
+        WHERE id IN (SELECT consultation_id FROM soap_notes)
+    """)
+    op.execute("UPDATE consultations SET processing_stage = 'SAFETY_CHECKED' WHERE status = 'COMPLETED'")
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("audio_files") as batch_op:
+        batch_op.drop_column("transcript_confidence")
+        batch_op.drop_column("transcript_utterances")
+    with op.batch_alter_table("consultations") as batch_op:
+        batch_op.drop_column("processing_stage")
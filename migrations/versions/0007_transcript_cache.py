@@ -0,0 +1,44 @@
+"""Audio content hash and content-addressed transcript cache
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-17
+
+audio_files.content_sha256 is filled at upload (or at first transcription for
+older rows). transcript_cache maps (content hash, STT config fingerprint) to the
+provider's transcript so re-sent audio isn't transcribed again.
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("audio_files") as batch_op:
+        batch_op.add_column(sa.Column("content_sha256", sqlmodel.sql.sqltypes.AutoString(), nullable=True))
+    op.create_index("ix_audio_files_content_sha256", "audio_files", ["content_sha256"])
+
+    op.create_table(
+        "transcript_cache",
+        sa.Column("content_sha256", sqlmodel.sql.sqltypes.AutoString(), primary_key=True),
+        sa.Column("config_fingerprint", sqlmodel.sql.sqltypes.AutoString(), primary_key=True),
+        sa.Column("text", sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+        sa.Column("utterances", sa.JSON(), nullable=True),
+        sa.Column("confidence", sa.Float(), nullable=True),
+        sa.Column("provider_transcript_id", sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+        sa.Column("hit_count", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("last_hit_at", sa.DateTime(), nullable=True),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("transcript_cache")
+    op.drop_index("ix_audio_files_content_sha256", table_name="audio_files")
+    with op.batch_alter_table("audio_files") as batch_op:
+        batch_op.drop_column("content_sha256")
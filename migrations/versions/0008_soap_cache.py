@@ -0,0 +1,43 @@
+"""SOAP generation cache and cache hits in ai_logs
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-17
+
+soap_cache holds parsed Gemini SOAP generations keyed by a hash of the prompt
+version, model, formatted transcript and patient context. ai_logs.cache_hit
+records whether a successful generation was served from it.
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "soap_cache",
+        sa.Column("cache_key", sqlmodel.sql.sqltypes.AutoString(), primary_key=True),
+        sa.Column("model_name", sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column("prompt_version", sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column("result_json", sa.JSON(), nullable=False),
+        sa.Column("size_bytes", sa.Integer(), nullable=False),
+        sa.Column("hit_count", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("last_used_at", sa.DateTime(), nullable=False),
+    )
+    op.create_index("ix_soap_cache_last_used_at", "soap_cache", ["last_used_at"])
+
+    with op.batch_alter_table("ai_logs") as batch_op:
+        batch_op.add_column(sa.Column("cache_hit", sa.Boolean(), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("ai_logs") as batch_op:
+        batch_op.drop_column("cache_hit")
+    op.drop_index("ix_soap_cache_last_used_at", table_name="soap_cache")
+    op.drop_table("soap_cache")
@@ -0,0 +1,26 @@
+"""Bytes sent to the STT provider after audio normalization
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-17
+
+audio_files.uploaded_size sits next to file_size (the original upload) so the
+bandwidth saved by normalization can be measured per consultation.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0009"
+down_revision = "0008"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("audio_files") as batch_op:
+        batch_op.add_column(sa.Column("uploaded_size", sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("audio_files") as batch_op:
+        batch_op.drop_column("uploaded_size")
@@ -0,0 +1,29 @@
+"""Model latency and overhead on ai_logs
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-17
+
+ai_logs.latency_ms covers the whole SOAP stage. model_latency_ms is the time
+inside the Gemini call and overhead_ms the rest (cache lookups, limiter
+queueing, retries, parsing).
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0010"
+down_revision = "0009"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("ai_logs") as batch_op:
+        batch_op.add_column(sa.Column("model_latency_ms", sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column("overhead_ms", sa.Float(), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("ai_logs") as batch_op:
+        batch_op.drop_column("overhead_ms")
+        batch_op.drop_column("model_latency_ms")
@@ -0,0 +1,28 @@
+"""Transcript token counts on ai_logs
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2026-10-17
+
+Estimated tokens of the transcript before and after compaction, per SOAP
+generation, to track what compaction saves.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0011"
+down_revision = "0010"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("ai_logs") as batch_op:
+        batch_op.add_column(sa.Column("transcript_tokens_before", sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column("transcript_tokens_after", sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("ai_logs") as batch_op:
+        batch_op.drop_column("transcript_tokens_after")
+        batch_op.drop_column("transcript_tokens_before")
@@ -0,0 +1,62 @@
+"""Drop the consultations queue indexes now served by triage_queue
+
+Revision ID: 0012
+Revises: 0011
+Create Date: 2026-10-17
+
+Since 0002 every queue endpoint (/dashboard/queue, /dashboard/queue/failed,
+/admin/triage_queue) reads triage_queue and its ix_triage_queue_* indexes.
+Nothing queries consultations by status/urgency/manual review any more, so the
+three 0001 indexes for those queues only add write cost to the pipeline's most
+written table. Dropped CONCURRENTLY on Postgres.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0012"
+down_revision = "0011"
+branch_labels = None
+depends_on = None
+
+# (name, columns, partial-index predicate), as created by 0001
+INDEXES = [
+    ("ix_consultations_status_urgency_created", ["status", sa.text("urgency_score DESC"), "created_at"], None),
+    ("ix_consultations_open_urgency_created", [sa.text("urgency_score DESC"), "created_at"], "status != 'COMPLETED'"),
+    (
+        "ix_consultations_manual_review_created",
+        ["created_at"],
+        {"postgresql": "requires_manual_review = true", "sqlite": "requires_manual_review = 1"},
+    ),
+]
+
+
+def _where(predicate, dialect: str) -> dict:
+    if predicate is None:
+        return {}
+    if isinstance(predicate, dict):
+        predicate = predicate[dialect]
+    return {f"{dialect}_where": sa.text(predicate)}
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name == "postgresql":
+        with op.get_context().autocommit_block():
+            for name, _, _ in INDEXES:
+                op.drop_index(name, table_name="consultations", if_exists=True, postgresql_concurrently=True)
+    else:
+        for name, _, _ in INDEXES:
+            op.drop_index(name, table_name="consultations", if_exists=True)
+
+
+def downgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    if dialect == "postgresql":
+        with op.get_context().autocommit_block():
+            for name, columns, predicate in INDEXES:
+                op.create_index(
+                    name, "consultations", columns, if_not_exists=True,
+                    postgresql_concurrently=True, **_where(predicate, dialect),
+                )
+    else:
+        for name, columns, predicate in INDEXES:
+            op.create_index(name, "consultations", columns, if_not_exists=True, **_where(predicate, dialect))
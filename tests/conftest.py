@@ -28,16 +28,40 @@ def check_environment():
 from fastapi.testclient import TestClient
 from sqlmodel import SQLModel
 from app.main import app
-from app.core.db import engine
+from app.core.db import engine, init_db as create_schema
 # Import models to ensure they are registered with SQLModel.metadata
 from app.models.base import User, PatientProfile, DoctorProfile, Appointment, Consultation, AudioFile, SOAPNote
 
 @pytest.fixture(scope="session", autouse=True)
 def init_db():
-    SQLModel.metadata.create_all(engine)
+    create_schema()
     yield
     SQLModel.metadata.drop_all(engine)
 
+@pytest.fixture
+def throwaway_db(tmp_path):
+    """
+    Factory for a file DB separate from the session one: call it with the modules whose
+    `async_engine` should point at it; returns a sync engine for seeding and assertions.
+    """
+    from contextlib import ExitStack
+    from unittest.mock import patch
+    from sqlalchemy.ext.asyncio import create_async_engine
+    from sqlalchemy.pool import NullPool
+    from sqlmodel import create_engine
+
+    with ExitStack() as stack:
+        def make(*modules: str):
+            db_path = tmp_path / "throwaway.db"
+            sync_engine = create_engine(f"sqlite:///{db_path}")
+            SQLModel.metadata.create_all(sync_engine)
+            async_engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}", poolclass=NullPool)
+            for module in modules:
+                stack.enter_context(patch(f"{module}.async_engine", async_engine))
+            return sync_engine
+
+        yield make
+
 @pytest.fixture(scope="session")
 def client(init_db):
     with TestClient(app) as c:
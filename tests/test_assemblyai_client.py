@@ -0,0 +1,122 @@
+import asyncio
+import json
+import threading
+from unittest.mock import patch
+
+import httpx
+import pytest
+
+from app.core.config import settings
+from app.services import stt_service
+from app.services.assemblyai_client import AssemblyAIClient, AssemblyAIError, PollingModel
+
+
+class StandInServer:
+    """Minimal AssemblyAI: each job is queued for one poll, processing for `polls` more, then done."""
+
+    def __init__(self, polls: int = 2, fail: bool = False):
+        self.polls, self.fail = polls, fail
+        self.jobs = {}
+        self.uploaded = []
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        assert request.headers["authorization"] == "test-key"
+        if request.url.path == "/v2/upload":
+            self.uploaded.append(len(request.read()))
+            return httpx.Response(200, json={"upload_url": f"https://cdn/{len(self.uploaded)}"})
+        if request.url.path == "/v2/transcript":
+            body = json.loads(request.content)
+            job_id = f"t{len(self.jobs)}"
+            self.jobs[job_id] = {"polls": 0, "params": body}
+            return httpx.Response(200, json={"id": job_id, "status": "queued"})
+        job_id = request.url.path.rsplit("/", 1)[1]
+        job = self.jobs[job_id]
+        job["polls"] += 1
+        if job["polls"] == 1:
+            return httpx.Response(200, json={"id": job_id, "status": "queued"})
+        if job["polls"] <= 1 + self.polls:
+            return httpx.Response(200, json={"id": job_id, "status": "processing"})
+        if self.fail:
+            return httpx.Response(200, json={"id": job_id, "status": "error", "error": "bad audio"})
+        return httpx.Response(200, json={
+            "id": job_id, "status": "completed", "text": "Hello.", "confidence": 0.91,
+            "utterances": [{"speaker": "A", "text": "Hello.", "start": 0, "end": 800, "words": []}],
+        })
+
+
+async def _no_sleep(_):
+    await asyncio.sleep(0)
+
+
+def _client(server: StandInServer) -> AssemblyAIClient:
+    return AssemblyAIClient(base_url="https://stand-in", api_key="test-key",
+                            transport=httpx.MockTransport(server.handler), sleep=_no_sleep)
+
+
+@pytest.mark.asyncio
+async def test_upload_submit_and_poll(tmp_path):
+    audio = tmp_path / "a.wav"
+    audio.write_bytes(b"x" * 3_000_000)
+    server = StandInServer()
+    client = _client(server)
+
+    transcript = await client.transcribe(str(audio), {"speaker_labels": True}, audio_seconds=60)
+    await client.aclose()
+
+    assert transcript["status"] == "completed"
+    assert server.uploaded == [3_000_000]
+    assert server.jobs["t0"]["params"] == {"audio_url": "https://cdn/1", "speaker_labels": True}
+    assert client.polling.completed == 1 and client.polling.polls == 4
+
+
+@pytest.mark.asyncio
+async def test_error_status_raises(tmp_path):
+    audio = tmp_path / "a.wav"
+    audio.write_bytes(b"x")
+    client = _client(StandInServer(fail=True))
+    with pytest.raises(AssemblyAIError, match="bad audio"):
+        await client.transcribe(str(audio), {})
+    await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_hundreds_in_flight_do_not_add_threads(tmp_path):
+    audio = tmp_path / "a.wav"
+    audio.write_bytes(b"x" * 1000)
+    client = _client(StandInServer(polls=5))
+    baseline = threading.active_count()
+
+    results = await asyncio.gather(*(client.transcribe(str(audio), {}) for _ in range(300)))
+    await client.aclose()
+
+    assert len(results) == 300
+    # Only the file reads borrow the default executor; nothing is held per job
+    assert threading.active_count() - baseline <= 32
+
+
+def test_poll_delay_aims_at_expected_finish():
+    model = PollingModel(queue_seconds=2, realtime_factor=0.2)
+    expected = model.expected_seconds(600)  # 10 min of audio: ~122 s
+    assert expected == pytest.approx(122)
+    assert model.next_delay(0, expected) == settings.ASSEMBLYAI_POLL_MAX_SECONDS  # far off: sparse
+    assert model.next_delay(120, expected) == settings.ASSEMBLYAI_POLL_MIN_SECONDS  # close: dense
+    assert model.next_delay(150, expected) == pytest.approx(14)  # overdue: back off
+
+    model.observe(audio_seconds=600, queued=10, processing=60)
+    assert model.queue_seconds > 2 and model.realtime_factor < 0.2
+
+
+@pytest.mark.asyncio
+async def test_service_uses_http_client_and_maps_utterances(tmp_path):
+    audio = tmp_path / "a.aac"
+    audio.write_bytes(b"\xff\xf1" * 100)
+    client = _client(StandInServer())
+    with patch.object(stt_service, "assemblyai_client", client), \
+         patch.object(stt_service.TranscriptCacheService, "get", return_value=None), \
+         patch.object(stt_service.TranscriptCacheService, "put"), \
+         patch.object(settings, "ASSEMBLYAI_ASYNC_CLIENT", True):
+        result = await stt_service.AssemblyAIService.transcribe_audio_async(str(audio), "sha")
+    await client.aclose()
+
+    assert result["utterances"] == [{"speaker": "A", "text": "Hello.", "start": 0, "end": 800}]
+    assert result["confidence"] == 0.91 and result["id"] == "t0"
@@ -0,0 +1,101 @@
+import os
+import shutil
+import subprocess
+import wave
+
+import numpy as np
+import pytest
+
+from app.core.config import settings
+from app.services.audio_preprocess import (
+    AudioPreprocessService, normalize_wav, prepare_file, read_wav_mono, resample, to_original_ms, trim_silence,
+)
+
+
+def _write_wav(path, samples: np.ndarray, rate: int, channels: int):
+    pcm = np.clip(np.round(samples * 32767), -32768, 32767).astype("<i2")
+    with wave.open(str(path), "wb") as wav:
+        wav.setnchannels(channels)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(pcm.tobytes())
+
+
+def _tone(freq, rate, seconds, amplitude=0.3):
+    t = np.arange(int(rate * seconds)) / rate
+    return (amplitude * np.sin(2 * np.pi * freq * t)).astype(np.float32)
+
+
+def test_stereo_48k_is_downmixed_and_resampled(tmp_path):
+    mono = _tone(440, 48000, 2.0)
+    _write_wav(tmp_path / "in.wav", np.stack([mono, mono], axis=1), 48000, channels=2)
+
+    out = normalize_wav(str(tmp_path / "in.wav"), str(tmp_path / "out"), 16000)
+    samples, rate = read_wav_mono(out)
+
+    assert rate == 16000
+    assert len(samples) == 32000  # duration preserved, so utterance timestamps still line up
+    assert os.path.getsize(out) < os.path.getsize(tmp_path / "in.wav") / 5
+    assert np.max(np.abs(samples)) == pytest.approx(0.3, abs=0.02)
+
+
+def test_resampling_filters_content_above_new_nyquist():
+    # 12 kHz would alias onto 4 kHz at 16 kHz without the low-pass
+    signal = _tone(1000, 48000, 1.0) + _tone(12000, 48000, 1.0)
+    spectrum = np.abs(np.fft.rfft(resample(signal, 48000, 16000)))
+    assert spectrum[4000] < spectrum[1000] / 100
+
+
+def test_speech_rate_mono_wav_is_left_alone(tmp_path):
+    _write_wav(tmp_path / "in.wav", _tone(440, 16000, 1.0), 16000, channels=1)
+    assert normalize_wav(str(tmp_path / "in.wav"), str(tmp_path / "out"), 16000) is None
+
+
+@pytest.mark.asyncio
+async def test_prepared_falls_back_to_original_for_unknown_audio(tmp_path):
+    source = tmp_path / "visit.aac"
+    source.write_bytes(b"\xff\xf1" * 500)
+    async with AudioPreprocessService.prepared(str(source)) as audio:
+        assert audio.path == str(source)
+        assert audio.original_bytes == audio.upload_bytes == 1000
+
+
+def _noise(rate, seconds, level=0.002, seed=0):
+    return np.random.default_rng(seed).normal(0, level, int(rate * seconds)).astype(np.float32)
+
+
+def test_long_silences_are_trimmed_and_timestamps_map_back():
+    rate = 16000
+    # 3 s speech, 10 s silence, 2 s speech starting at 13 s in the original
+    samples = np.concatenate([_tone(200, rate, 3.0), _noise(rate, 10.0), _tone(200, rate, 2.0)])
+    trimmed, offset_map = trim_silence(samples, rate, min_silence_ms=1500, keep_silence_ms=400, margin_db=12)
+
+    assert len(trimmed) / rate < 6.5
+    assert len(offset_map) == 2
+    # Where the second utterance starts in the trimmed audio, mapped back to the recording
+    second_start_out = offset_map[1][0] + (13000 - offset_map[1][1])
+    assert to_original_ms(second_start_out, offset_map) == 13000
+    assert to_original_ms(1000, offset_map) == 1000
+
+
+def test_short_pauses_are_kept():
+    rate = 16000
+    samples = np.concatenate([_tone(200, rate, 2.0), _noise(rate, 0.8), _tone(200, rate, 2.0)])
+    trimmed, offset_map = trim_silence(samples, rate, min_silence_ms=1500, keep_silence_ms=400, margin_db=12)
+    assert offset_map == [] and len(trimmed) == len(samples)
+
+
+@pytest.mark.skipif(shutil.which(settings.AUDIO_FFMPEG_BINARY) is None, reason="ffmpeg not installed")
+def test_compressed_audio_is_decoded_for_silence_trimming(tmp_path):
+    rate = 16000
+    _write_wav(tmp_path / "src.wav", np.concatenate([_tone(200, rate, 3.0), _noise(rate, 10.0), _tone(200, rate, 3.0)]),
+               rate, channels=1)
+    subprocess.run([shutil.which(settings.AUDIO_FFMPEG_BINARY), "-v", "error", "-y", "-i", str(tmp_path / "src.wav"),
+                    "-c:a", "aac", str(tmp_path / "visit.m4a")], check=True)
+
+    prepared = prepare_file(str(tmp_path / "visit.m4a"), str(tmp_path), 16000,
+                            {"min_silence_ms": 1500, "keep_silence_ms": 400, "margin_db": 12}, None)
+
+    assert prepared["trimmed_seconds"] > 8
+    assert len(prepared["offset_map"]) == 2
+    assert prepared["path"].endswith(".ogg")  # re-encoded, not sent as PCM
@@ -0,0 +1,97 @@
+import hashlib
+import io
+import os
+import wave
+from unittest.mock import patch
+
+import pytest
+from fastapi import FastAPI, File, Request, UploadFile
+from fastapi.testclient import TestClient
+
+from app.api.upload_limits import UploadSizeLimitMiddleware
+from app.core.config import settings
+from app.services.audio_storage import AudioStorageService, UploadTooLarge
+
+
+def _wav_bytes(seconds: float, rate: int = 8000) -> bytes:
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(b"\x00\x00" * int(seconds * rate))
+    return buffer.getvalue()
+
+
+def test_save_records_size_hash_and_wav_duration(tmp_path):
+    data = _wav_bytes(2.5)
+    stored = AudioStorageService.save(io.BytesIO(data), str(tmp_path / "a.wav"), max_bytes=len(data))
+    assert stored.size == len(data)
+    assert stored.sha256 == hashlib.sha256(data).hexdigest()
+    assert stored.duration == pytest.approx(2.5)
+    assert (tmp_path / "a.wav").read_bytes() == data
+
+
+def test_save_has_no_duration_for_compressed_audio(tmp_path):
+    stored = AudioStorageService.save(io.BytesIO(b"\xff\xf1" * 100), str(tmp_path / "a.aac"), max_bytes=1000)
+    assert stored.size == 200 and stored.duration is None
+
+
+def test_save_stops_at_limit_and_removes_partial_file(tmp_path):
+    dest = tmp_path / "big.wav"
+    with patch("app.services.audio_storage.UPLOAD_CHUNK_BYTES", 1024):
+        with pytest.raises(UploadTooLarge):
+            AudioStorageService.save(io.BytesIO(os.urandom(10 * 1024)), str(dest), max_bytes=4 * 1024)
+    assert not dest.exists()
+
+
+def test_middleware_rejects_oversized_upload_by_content_length():
+    app = FastAPI()
+    app.add_middleware(UploadSizeLimitMiddleware)
+
+    @app.post("/c/upload")
+    async def upload():
+        return {"ok": True}
+
+    client = TestClient(app)
+    with patch.object(settings, "MAX_UPLOAD_BYTES", 1024):
+        assert client.post("/c/upload", content=b"x" * 512).status_code == 200
+        response = client.post("/c/upload", content=b"x" * (200 * 1024))
+    assert response.status_code == 413
+
+
+def test_middleware_cuts_off_chunked_upload_while_receiving():
+    app = FastAPI()
+    app.add_middleware(UploadSizeLimitMiddleware)
+    spooled = []
+
+    @app.post("/c/upload")
+    async def upload(request: Request):
+        async for chunk in request.stream():
+            spooled.append(len(chunk))
+        return {"ok": True}
+
+    @app.post("/f/upload")
+    async def upload_form(file: UploadFile = File(...)):
+        return {"size": file.size}
+
+    def body(total, step=8 * 1024):
+        for _ in range(total // step):
+            yield b"x" * step
+
+    client = TestClient(app)
+    with patch.object(settings, "MAX_UPLOAD_BYTES", 1024), \
+         patch("app.api.upload_limits.MULTIPART_OVERHEAD_BYTES", 16 * 1024):
+        # No Content-Length: chunked transfer encoding
+        assert client.post("/c/upload", content=body(16 * 1024)).status_code == 200
+        spooled.clear()
+        response = client.post("/c/upload", content=body(1024 * 1024))
+        assert response.status_code == 413 and sum(spooled) <= 17 * 1024
+
+        # Multipart through FastAPI's form parsing, also streamed without a length
+        def multipart():
+            yield b'--b\r\nContent-Disposition: form-data; name="file"; filename="a.wav"\r\n\r\n'
+            yield from body(1024 * 1024)
+            yield b"\r\n--b--\r\n"
+        form = client.post("/f/upload", content=multipart(), headers={"content-type": "multipart/form-data; boundary=b"})
+        assert form.status_code == 413, form.text
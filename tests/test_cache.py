@@ -0,0 +1,39 @@
+from unittest.mock import patch
+
+from app.core.cache import TTLCache
+
+
+def test_lru_eviction_and_counters():
+    cache = TTLCache("t", maxsize=2, ttl_seconds=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # "a" is now most recently used
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    stats = cache.stats()
+    assert stats["evictions"] == 1 and stats["hits"] == 3 and stats["misses"] == 1
+
+
+def test_ttl_expiry_and_invalidation():
+    cache = TTLCache("t", maxsize=10, ttl_seconds=5)
+    with patch("app.core.cache.time.monotonic", return_value=100.0):
+        cache.set("a", 1)
+        cache.set("b", 2)
+    with patch("app.core.cache.time.monotonic", return_value=106.0):
+        assert cache.get("a") is None
+    cache.invalidate("b")
+    assert cache.get("b") is None
+    assert cache.stats()["expirations"] == 1 and cache.stats()["invalidations"] == 1
+
+
+def test_internal_endpoints_need_the_internal_token(client):
+    from app.core.config import settings
+
+    with patch.object(settings, "INTERNAL_API_TOKEN", None):
+        assert client.get("/api/v1/internal/caches", headers={"X-Internal-Token": ""}).status_code == 403
+    with patch.object(settings, "INTERNAL_API_TOKEN", "s3cret"):
+        assert client.get("/api/v1/internal/caches").status_code == 403
+        assert client.get("/api/v1/internal/providers", headers={"X-Internal-Token": "wrong"}).status_code == 403
+        response = client.get("/api/v1/internal/caches", headers={"X-Internal-Token": "s3cret"})
+    assert response.status_code == 200 and "users" in response.json()
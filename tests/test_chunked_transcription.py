@@ -0,0 +1,122 @@
+import shutil
+import subprocess
+import wave
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+import pytest
+
+from app.core.config import settings
+from app.services import stt_service
+from app.services.audio_preprocess import AudioChunk, plan_chunks, prepare_file
+from app.services.stt_service import stitch_transcripts
+
+
+def _utterance(speaker, text, start, end):
+    return {"speaker": speaker, "text": text, "start": start, "end": end}
+
+
+def test_stitch_shifts_times_drops_overlap_duplicates_and_matches_speakers():
+    first = AudioChunk("a.wav", start_ms=0, own_start_ms=0, own_end_ms=10_000)
+    second = AudioChunk("b.wav", start_ms=8_000, own_start_ms=10_000, own_end_ms=20_000)
+    parts = [
+        (first, {"text": "...", "confidence": 0.9, "id": "t1", "utterances": [
+            _utterance("A", "Hello doctor.", 0, 4_000),
+            _utterance("B", "What brings you in?", 4_500, 8_500),
+            _utterance("A", "Headaches.", 8_800, 9_800),
+        ]}),
+        # The provider labelled the same people the other way round in this chunk
+        (second, {"text": "...", "confidence": 0.8, "id": "t2", "utterances": [
+            _utterance("A", "brings you in?", 0, 500),
+            _utterance("B", "Headaches.", 800, 1_800),
+            _utterance("A", "How long for?", 2_500, 6_000),
+            _utterance("B", "A week.", 6_500, 9_000),
+        ]}),
+    ]
+
+    result = stitch_transcripts(parts)
+
+    assert [(u["speaker"], u["text"]) for u in result["utterances"]] == [
+        ("A", "Hello doctor."), ("B", "What brings you in?"), ("A", "Headaches."),
+        ("B", "How long for?"), ("A", "A week."),
+    ]
+    assert result["utterances"][3]["start"] == 10_500
+    assert result["text"] == "Hello doctor. What brings you in? Headaches. How long for? A week."
+    assert result["confidence"] == pytest.approx(0.85)
+    assert result["id"] == "t1,t2"
+
+
+def test_chunks_are_cut_in_silence_near_the_target_length():
+    rate = 1000
+    signal = np.full(rate * 100, 0.3, dtype=np.float32)
+    signal[43 * rate:45 * rate] = 0.0  # the only quiet spot near the 40 s target
+    chunks = plan_chunks(signal, rate, chunk_seconds=40, overlap_seconds=2)
+
+    assert chunks[0][2] == 0 and chunks[-1][3] == len(signal)
+    first_cut = chunks[0][3]
+    assert 43 * rate <= first_cut <= 45 * rate
+    assert chunks[1][0] == first_cut - 2 * rate  # overlap before the owned range
+    assert plan_chunks(signal[:50 * rate], rate, chunk_seconds=40, overlap_seconds=2) == []
+
+
+def test_flat_audio_is_cut_near_the_target_not_right_after_the_previous_cut():
+    rate = 1000
+    chunks = plan_chunks(np.full(rate * 100, 0.3, dtype=np.float32), rate, chunk_seconds=10, overlap_seconds=1)
+    owned = [own_end - own_start for _, _, own_start, own_end in chunks]
+    assert 8 <= len(chunks) <= 10
+    assert min(owned[:-1]) >= 7.5 * rate
+
+
+@pytest.mark.asyncio
+async def test_long_audio_is_transcribed_in_parallel_chunks(tmp_path):
+    rate = 16000
+    path = tmp_path / "long.wav"
+    with wave.open(str(path), "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes((np.ones(rate * 24) * 3000).astype("<i2").tobytes())
+
+    def transcribe(chunk_path, config):
+        with wave.open(chunk_path, "rb") as wav:
+            length_ms = wav.getnframes() * 1000 // wav.getframerate()
+        return SimpleNamespace(status="completed", error=None, text="words", confidence=0.9, id=chunk_path,
+                               utterances=[SimpleNamespace(speaker="A", text="words", start=0, end=length_ms)])
+
+    aai = MagicMock()
+    aai.Transcriber.return_value.transcribe.side_effect = transcribe
+    aai.TranscriptStatus.error = "error"
+    with patch.object(stt_service, "get_aai", return_value=aai), \
+         patch.object(settings, "ASSEMBLYAI_ASYNC_CLIENT", False), \
+         patch.object(stt_service.TranscriptCacheService, "get", return_value=None), \
+         patch.object(stt_service.TranscriptCacheService, "put"), \
+         patch.object(settings, "AUDIO_NORMALIZE_ENABLED", False), \
+         patch.object(settings, "STT_CHUNKING_ENABLED", True), \
+         patch.object(settings, "STT_CHUNK_SECONDS", 10.0), \
+         patch.object(settings, "STT_CHUNK_OVERLAP_SECONDS", 1.0):
+        result = await stt_service.AssemblyAIService.transcribe_audio_async(str(path), "sha")
+
+    assert result["chunks"] == 2
+    assert aai.Transcriber.return_value.transcribe.call_count == 2
+    assert result["utterances"][0]["start"] == 0
+    assert result["utterances"][-1]["end"] == 24_000
+
+
+@pytest.mark.skipif(shutil.which(settings.AUDIO_FFMPEG_BINARY) is None, reason="ffmpeg not installed")
+def test_compressed_audio_is_chunked_and_chunks_reencoded(tmp_path):
+    rate = 16000
+    with wave.open(str(tmp_path / "src.wav"), "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        t = np.arange(rate * 24) / rate
+        wav.writeframes((np.sin(2 * np.pi * 200 * t) * 8000).astype("<i2").tobytes())
+    subprocess.run([shutil.which(settings.AUDIO_FFMPEG_BINARY), "-v", "error", "-y", "-i", str(tmp_path / "src.wav"),
+                    "-c:a", "aac", str(tmp_path / "visit.m4a")], check=True)
+
+    prepared = prepare_file(str(tmp_path / "visit.m4a"), str(tmp_path), 16000, None,
+                            {"chunk_seconds": 10.0, "overlap_seconds": 1.0})
+
+    assert len(prepared["chunks"]) == 2
+    assert all(chunk.path.endswith(".ogg") for chunk in prepared["chunks"])
@@ -0,0 +1,15 @@
+import subprocess
+import sys
+
+
+def test_provider_sdks_are_not_imported_at_startup():
+    """
+    Importing the API and the pipeline must not pull in the provider SDKs;
+    they are loaded on first use inside the services.
+    """
+    probe = (
+        "import sys, app.main, app.services.consultation_processor; "
+        "print([m for m in ('google.generativeai', 'assemblyai') if m in sys.modules])"
+    )
+    out = subprocess.run([sys.executable, "-c", probe], capture_output=True, text=True, check=True).stdout
+    assert out.strip() == "[]"
@@ -0,0 +1,39 @@
+from uuid import uuid4
+
+
+def _signup_doctor(client):
+    r = client.post("/api/v1/auth/signup", json={
+        "email": f"dr_{uuid4().hex[:8]}@example.com", "password": "pw123456", "role": "DOCTOR",
+        "first_name": "Dir", "last_name": "Test",
+    })
+    assert r.status_code == 200, r.text
+    return r.json()["user_id"]
+
+
+def test_doctor_directory_etag_and_invalidation(client):
+    """The picker is served with an ETag, answers 304 when unchanged, and a signup invalidates it."""
+    first = _signup_doctor(client)
+
+    r = client.get("/api/v1/users/doctors", params={"specialization": "General", "limit": 500})
+    assert r.status_code == 200
+    assert first in [d["id"] for d in r.json()]
+    etag = r.headers["ETag"]
+
+    r = client.get("/api/v1/users/doctors", params={"specialization": "General", "limit": 500}, headers={"If-None-Match": etag})
+    assert r.status_code == 304
+
+    second = _signup_doctor(client)
+    r = client.get("/api/v1/users/doctors", params={"specialization": "General", "limit": 500}, headers={"If-None-Match": etag})
+    assert r.status_code == 200
+    assert {first, second} <= {d["id"] for d in r.json()}
+
+
+def test_doctor_directory_cursor(client):
+    _signup_doctor(client)
+    _signup_doctor(client)
+    r = client.get("/api/v1/users/doctors", params={"limit": 1})
+    cursor = r.headers["X-Next-Cursor"]
+    r2 = client.get("/api/v1/users/doctors", params={"limit": 1, "cursor": cursor})
+    assert r2.status_code == 200
+    assert r2.json()[0]["id"] > r.json()[0]["id"]
+    assert client.get("/api/v1/users/doctors", params={"cursor": "bm9wZQ"}).status_code == 400
@@ -0,0 +1,65 @@
+import asyncio
+import json
+import threading
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+
+from app.core.config import settings
+from app.services import llm_service
+from app.services.llm_service import GeminiService
+
+SOAP_RESPONSE = {"soap_note": {"subjective": "Cough"}, "risk_flags": []}
+
+
+class AsyncModel:
+    built = 0
+
+    def __init__(self, name, generation_config=None):
+        AsyncModel.built += 1
+        self.name, self.generation_config = name, generation_config
+
+    async def generate_content_async(self, prompt):
+        await asyncio.sleep(0.02)
+        return SimpleNamespace(text=json.dumps(SOAP_RESPONSE))
+
+
+class BlockingModel:
+    def __init__(self, name, generation_config=None):
+        self.threads = set()
+
+    def generate_content(self, prompt):
+        self.threads.add(threading.current_thread().name)
+        return SimpleNamespace(text=json.dumps(SOAP_RESPONSE))
+
+
+@pytest.fixture
+def fake_genai():
+    def use(model_cls):
+        return patch.object(llm_service, "_genai", SimpleNamespace(GenerativeModel=model_cls))
+    with patch.object(llm_service, "_models", {}), patch.object(settings, "SOAP_CACHE_MAX_ENTRIES", 0):
+        yield use
+    llm_service.shutdown_gemini_pool()
+
+
+@pytest.mark.asyncio
+async def test_models_are_built_once_and_called_natively(fake_genai):
+    AsyncModel.built = 0
+    with fake_genai(AsyncModel):
+        results = await asyncio.gather(*(GeminiService.generate_soap_note_async(f"t{i}") for i in range(3)))
+        assert llm_service.get_model("gemini-other") is not llm_service.get_model(llm_service.SOAP_MODEL, {"response_mime_type": "application/json"})
+
+    assert AsyncModel.built == 2  # one per (name, config), not one per call
+    assert all(r["soap_note"] == SOAP_RESPONSE["soap_note"] for r in results)
+    assert all(r["model_latency_ms"] >= 20 for r in results)
+
+
+@pytest.mark.asyncio
+async def test_blocking_sdk_uses_dedicated_pool(fake_genai):
+    with fake_genai(BlockingModel):
+        result = await GeminiService.generate_soap_note_async("text")
+        model = llm_service.get_model(llm_service.SOAP_MODEL, {"response_mime_type": "application/json"})
+
+    assert result["cache_hit"] is False and result["model_latency_ms"] is not None
+    assert model.threads and all(name.startswith("gemini") for name in model.threads)
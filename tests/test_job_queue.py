@@ -0,0 +1,114 @@
+from datetime import datetime, timedelta
+from unittest.mock import AsyncMock, patch
+from uuid import uuid4
+
+import pytest
+import pytest_asyncio
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+from sqlmodel import delete
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.config import settings
+from app.core.db import to_async_url
+from app.models.base import ProcessingJob, JobStatus
+from app.services.job_queue import JobQueueService, JobWorker
+
+
+@pytest_asyncio.fixture
+async def session():
+    engine = create_async_engine(to_async_url(settings.DATABASE_URL), poolclass=NullPool)
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        await session.exec(delete(ProcessingJob))
+        await session.commit()
+        yield session
+    await engine.dispose()
+
+
+async def _enqueue(session, count):
+    jobs = [JobQueueService.enqueue(session, uuid4()) for _ in range(count)]
+    await session.commit()
+    return jobs
+
+
+@pytest.mark.asyncio
+async def test_concurrent_claims_do_not_overlap(session):
+    await _enqueue(session, 4)
+    first = await JobQueueService.claim(session, "worker-a", limit=3)
+    second = await JobQueueService.claim(session, "worker-b", limit=3)
+    assert len(first) == 3 and len(second) == 1
+    assert not {j.id for j in first} & {j.id for j in second}
+    assert all(j.status == JobStatus.RUNNING and j.attempts == 1 for j in first + second)
+    assert await JobQueueService.claim(session, "worker-c", limit=3) == []
+
+
+@pytest.mark.asyncio
+async def test_failed_job_backs_off_then_gives_up(session):
+    [job] = await _enqueue(session, 1)
+    job.max_attempts = 2
+    session.add(job)
+    await session.commit()
+
+    [claimed] = await JobQueueService.claim(session, "worker-a")
+    await JobQueueService.fail(session, claimed, "worker-a", "RuntimeError: boom")
+    await session.refresh(job)
+    assert job.status == JobStatus.QUEUED and job.available_at > datetime.utcnow()
+    assert await JobQueueService.claim(session, "worker-a") == []  # still backing off
+
+    job.available_at = datetime.utcnow() - timedelta(seconds=1)
+    session.add(job)
+    await session.commit()
+    [claimed] = await JobQueueService.claim(session, "worker-a")
+    await JobQueueService.fail(session, claimed, "worker-a", "RuntimeError: boom")
+    await session.refresh(job)
+    assert job.status == JobStatus.FAILED and job.attempts == 2 and job.last_error == "RuntimeError: boom"
+
+
+@pytest.mark.asyncio
+async def test_expired_lease_is_reclaimed(session):
+    await _enqueue(session, 1)
+    [job] = await JobQueueService.claim(session, "worker-dead")
+    job.lease_expires_at = datetime.utcnow() - timedelta(seconds=1)
+    session.add(job)
+    await session.commit()
+
+    [reclaimed] = await JobQueueService.claim(session, "worker-b")
+    assert reclaimed.id == job.id and reclaimed.lease_owner == "worker-b" and reclaimed.attempts == 2
+    # The dead worker's late heartbeat or completion no longer applies
+    assert not await JobQueueService.heartbeat(session, job.id, "worker-dead")
+
+
+@pytest.mark.asyncio
+async def test_expired_lease_on_last_attempt_fails_the_job(session):
+    [job] = await _enqueue(session, 1)
+    job.max_attempts = 1
+    session.add(job)
+    await session.commit()
+    [claimed] = await JobQueueService.claim(session, "worker-dead")
+    job.lease_expires_at = datetime.utcnow() - timedelta(seconds=1)
+    session.add(job)
+    await session.commit()
+
+    assert await JobQueueService.claim(session, "worker-b") == []
+    await session.refresh(job)
+    assert job.status == JobStatus.FAILED and job.attempts == 1 and job.lease_owner is None
+    assert job.last_error == "Lease expired on the final attempt"
+
+
+@pytest.mark.asyncio
+async def test_failure_on_final_attempt_ends_failed(session):
+    [job] = await _enqueue(session, 1)
+    job.max_attempts = 1
+    session.add(job)
+    await session.commit()
+    [claimed] = await JobQueueService.claim(session, "worker-a")
+
+    # The last attempt marks the consultation FAILED and returns the error instead of raising
+    flow = AsyncMock(return_value=RuntimeError("Gemini down"))
+    with patch("app.services.consultation_processor.process_consultation_flow", flow), \
+         patch("app.services.job_queue.async_engine", session.bind):
+        await JobWorker(concurrency=1, worker_id="worker-a")._run_job(claimed)
+
+    flow.assert_awaited_once_with(job.consultation_id, raise_on_error=False)
+    await session.refresh(job)
+    assert job.status == JobStatus.FAILED and job.last_error == "RuntimeError: Gemini down"
@@ -0,0 +1,76 @@
+from datetime import datetime, timedelta
+from uuid import UUID, uuid4
+
+import pytest
+from fastapi import HTTPException, Response
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, create_engine, select
+
+from app.api.pagination import NEXT_CURSOR_HEADER, PageParams, decode_cursor, encode_cursor, finish_page, paginate
+from app.models.base import ConsultationStatus
+
+metadata = MetaData()
+rows_table = Table(
+    "rows", metadata,
+    Column("id", String, primary_key=True),
+    Column("score", Integer),
+    Column("at", DateTime),
+)
+# Score DESC, then time ASC, then id ASC: the triage queue's shape
+KEYS = [(rows_table.c.score, True), (rows_table.c.at, False), (rows_table.c.id, False)]
+
+
+def _row_key(row):
+    return (row.score, row.at, row.id)
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine("sqlite://")
+    metadata.create_all(engine)
+    start = datetime(2026, 1, 1)
+    with engine.begin() as conn:
+        # Many ties on score and on (score, at), so every key in the predicate matters
+        conn.execute(rows_table.insert(), [
+            {"id": f"{i:03d}", "score": i % 3, "at": start + timedelta(minutes=(i * 7) % 5)}
+            for i in range(40)
+        ])
+    return engine
+
+
+def _walk(engine, limit):
+    pages, cursor = [], None
+    while True:
+        page = PageParams(limit=limit, cursor=cursor)
+        response = Response()
+        with engine.connect() as conn:
+            rows = conn.execute(paginate(select(rows_table), KEYS, page)).all()
+        pages.append(finish_page(rows, _row_key, page, response))
+        cursor = response.headers.get(NEXT_CURSOR_HEADER)
+        if cursor is None:
+            return pages
+
+
+@pytest.mark.parametrize("limit", [1, 3, 7, 40])
+def test_pages_follow_mixed_direction_order_without_gaps_or_repeats(engine, limit):
+    with engine.connect() as conn:
+        everything = conn.execute(select(rows_table)).all()
+    expected = [r.id for r in sorted(everything, key=lambda r: (-r.score, r.at, r.id))]
+
+    pages = _walk(engine, limit)
+    assert [r.id for page in pages for r in page] == expected
+    assert all(len(page) == limit for page in pages[:-1]) and 0 < len(pages[-1]) <= limit
+
+
+def test_cursor_round_trip():
+    values = [5, datetime(2026, 3, 1, 12, 30, 15, 250), uuid4(), ConsultationStatus.FAILED, None, "x"]
+    decoded = decode_cursor(encode_cursor(values), len(values))
+    assert decoded[:3] == values[:3] and isinstance(decoded[2], UUID)
+    assert decoded[3:] == ["FAILED", None, "x"]  # enums travel as their value
+    assert "=" not in encode_cursor(values)
+
+
+@pytest.mark.parametrize("cursor", ["not-base64!", encode_cursor([1, 2]), encode_cursor([{"z": 1}, 2, 3])])
+def test_bad_cursor_is_a_400(cursor):
+    with pytest.raises(HTTPException) as exc:
+        decode_cursor(cursor, 3)
+    assert exc.value.status_code == 400
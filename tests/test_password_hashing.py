@@ -0,0 +1,30 @@
+from uuid import uuid4
+
+from passlib.hash import pbkdf2_sha256
+from sqlmodel import Session
+
+from app.core.config import settings
+from app.core.db import engine
+from app.models.base import User, UserRole
+
+
+def test_login_rehashes_outdated_password_hash(client):
+    """A hash stored with other rounds still verifies and is upgraded to PASSWORD_HASH_ROUNDS."""
+    email = f"rehash_{uuid4().hex[:8]}@example.com"
+    old_hash = pbkdf2_sha256.using(rounds=1000).hash("pw123456")
+    with Session(engine) as session:
+        user = User(email=email, password_hash=old_hash, role=UserRole.FRONT_DESK)
+        session.add(user)
+        session.commit()
+        user_id = user.id
+
+    r = client.post("/api/v1/auth/login", data={"username": email, "password": "wrong"})
+    assert r.status_code == 401
+    r = client.post("/api/v1/auth/login", data={"username": email, "password": "pw123456"})
+    assert r.status_code == 200, r.text
+
+    with Session(engine) as session:
+        new_hash = session.get(User, user_id).password_hash
+    assert new_hash != old_hash
+    assert pbkdf2_sha256.from_string(new_hash).rounds == settings.PASSWORD_HASH_ROUNDS
+    assert pbkdf2_sha256.verify("pw123456", new_hash)
@@ -0,0 +1,72 @@
+from datetime import datetime
+from unittest.mock import AsyncMock, patch
+from uuid import uuid4
+
+import pytest
+from sqlmodel import Session, select
+
+from app.models.base import (
+    AILog, Appointment, AudioFile, Consultation, ConsultationStatus, PatientProfile, ProcessingStage, SOAPNote, User,
+    UserRole,
+)
+from app.services.consultation_processor import process_consultation_flow
+
+SOAP_RESPONSE = {
+    "soap_note": {"subjective": "Headache", "objective": "None", "assessment": "Migraine", "plan": "Rest"},
+    "risk_flags": [],
+}
+
+
+@pytest.fixture
+def pipeline_db(throwaway_db):
+    """Shared by the sync seeding code and the async pipeline."""
+    return throwaway_db("app.services.consultation_processor")
+
+
+def _seed(engine):
+    patient_id, doctor_id = uuid4(), uuid4()
+    with Session(engine) as session:
+        session.add(User(id=patient_id, email=f"{patient_id}@t.com", password_hash="pw", role=UserRole.PATIENT))
+        session.add(User(id=doctor_id, email=f"{doctor_id}@t.com", password_hash="pw", role=UserRole.DOCTOR))
+        session.add(PatientProfile(user_id=patient_id, first_name="Res", last_name="Ume"))
+        appointment = Appointment(patient_id=patient_id, doctor_id=doctor_id, scheduled_at=datetime(2026, 1, 1))
+        session.add(appointment)
+        consultation = Consultation(appointment_id=appointment.id, patient_id=patient_id, doctor_id=doctor_id)
+        session.add(consultation)
+        session.add(AudioFile(consultation_id=consultation.id, uploaded_by="DOCTOR", file_name="a.wav", file_url="/tmp/a.wav"))
+        session.commit()
+        return consultation.id
+
+
+@pytest.mark.asyncio
+async def test_retry_after_gemini_failure_skips_transcription(pipeline_db):
+    consultation_id = _seed(pipeline_db)
+    transcribe = AsyncMock(return_value={
+        "text": "I have a headache.", "utterances": [{"speaker": "A", "text": "I have a headache."}], "confidence": 0.9,
+    })
+    generate = AsyncMock(side_effect=[RuntimeError("Gemini down"), SOAP_RESPONSE])
+
+    with patch("app.services.consultation_processor.AssemblyAIService.transcribe_audio_async", transcribe), \
+         patch("app.services.consultation_processor.GeminiService.generate_soap_note_async", generate):
+        await process_consultation_flow(consultation_id)
+        with Session(pipeline_db) as session:
+            consultation = session.get(Consultation, consultation_id)
+            assert consultation.status == ConsultationStatus.FAILED
+            assert consultation.processing_stage == ProcessingStage.TRANSCRIBED
+            audio = session.exec(select(AudioFile).where(AudioFile.consultation_id == consultation_id)).one()
+            assert audio.transcript_utterances == [{"speaker": "A", "text": "I have a headache."}]
+            assert session.exec(select(AILog).where(AILog.status == "FAIL")).first() is not None
+
+        await process_consultation_flow(consultation_id)
+
+    assert transcribe.await_count == 1
+    assert generate.await_count == 2
+    # The resumed Gemini call gets the persisted speaker-labelled utterances
+    assert generate.await_args.args[1] == [{"speaker": "A", "text": "I have a headache."}]
+    with Session(pipeline_db) as session:
+        consultation = session.get(Consultation, consultation_id)
+        assert consultation.status == ConsultationStatus.COMPLETED
+        assert consultation.processing_stage == ProcessingStage.SAFETY_CHECKED
+        assert not consultation.requires_manual_review
+        soap = session.exec(select(SOAPNote).where(SOAPNote.consultation_id == consultation_id)).one()
+        assert soap.confidence == 0.9
@@ -0,0 +1,49 @@
+import asyncio
+import time
+
+import pytest
+
+from app.services.rate_limiter import ProviderLimiter
+
+
+@pytest.mark.asyncio
+async def test_concurrency_cap_and_fifo_order():
+    limiter = ProviderLimiter("test", max_concurrent=2, requests_per_minute=60000, burst=100)
+    running, peak, order = 0, 0, []
+
+    async def call(i):
+        nonlocal running, peak
+        async with limiter.slot():
+            order.append(i)
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.02)
+            running -= 1
+
+    await asyncio.gather(*(call(i) for i in range(6)))
+    assert peak == 2
+    assert order == list(range(6))
+    stats = limiter.stats()
+    assert stats["acquired"] == 6 and stats["in_flight"] == 0 and stats["waiting"] == 0
+    assert stats["queue_wait_ms"]["max"] > 0
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_paces_requests():
+    limiter = ProviderLimiter("test", max_concurrent=10, requests_per_minute=600, burst=1)  # 10/s
+    started = time.monotonic()
+    for _ in range(3):
+        async with limiter.slot():
+            pass
+    assert time.monotonic() - started >= 0.18  # first from the burst, then 100 ms apart
+
+
+@pytest.mark.asyncio
+async def test_cool_down_pauses_queue():
+    limiter = ProviderLimiter("test", max_concurrent=10, requests_per_minute=60000, burst=10)
+    limiter.cool_down(0.2)
+    started = time.monotonic()
+    async with limiter.slot():
+        pass
+    assert time.monotonic() - started >= 0.19
+    assert limiter.stats()["cooldowns"] == 1
@@ -0,0 +1,123 @@
+import asyncio
+import json
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from sqlmodel import Session, select
+
+from app.core.config import settings
+from app.models.base import SoapCacheEntry
+from app.services import llm_service
+from app.services.llm_service import GeminiService
+
+SOAP_RESPONSE = {
+    "soap_note": {"subjective": "Headache", "objective": "None", "assessment": "Migraine", "plan": "Rest"},
+    "risk_flags": [],
+}
+UTTERANCES = [{"speaker": "A", "text": "I have a headache."}]
+CONTEXT = {"first_name": "Ada", "last_name": "L", "age": 40, "gender": "F"}
+
+
+@pytest.fixture
+def cache_db(throwaway_db):
+    return throwaway_db("app.services.soap_cache")
+
+
+@pytest.mark.asyncio
+async def test_same_input_is_generated_once(cache_db):
+    generate = AsyncMock(return_value=SOAP_RESPONSE)
+    with patch.object(GeminiService, "_generate_async", generate):
+        first = await GeminiService.generate_soap_note_async("I have a headache.", UTTERANCES, CONTEXT)
+        second = await GeminiService.generate_soap_note_async("I have a headache.", UTTERANCES, CONTEXT)
+        # Different patient context is a different input
+        third = await GeminiService.generate_soap_note_async("I have a headache.", UTTERANCES, {**CONTEXT, "age": 41})
+
+    assert generate.await_count == 2
+    assert (first["cache_hit"], second["cache_hit"], third["cache_hit"]) == (False, True, False)
+    assert second["soap_note"] == SOAP_RESPONSE["soap_note"]
+
+
+@pytest.mark.asyncio
+async def test_prompt_version_bump_misses(cache_db):
+    generate = AsyncMock(return_value=SOAP_RESPONSE)
+    with patch.object(GeminiService, "_generate_async", generate):
+        await GeminiService.generate_soap_note_async("Text", UTTERANCES, CONTEXT)
+        with patch.object(llm_service, "SOAP_PROMPT_VERSION", "soap-v2"):
+            result = await GeminiService.generate_soap_note_async("Text", UTTERANCES, CONTEXT)
+    assert result["cache_hit"] is False
+    assert generate.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_evicts_least_recently_used(cache_db):
+    generate = AsyncMock(return_value=SOAP_RESPONSE)
+    with patch.object(GeminiService, "_generate_async", generate), \
+         patch.object(settings, "SOAP_CACHE_MAX_ENTRIES", 2):
+        await GeminiService.generate_soap_note_async("one", None, CONTEXT)
+        await GeminiService.generate_soap_note_async("two", None, CONTEXT)
+        await GeminiService.generate_soap_note_async("one", None, CONTEXT)  # refreshes "one"
+        await GeminiService.generate_soap_note_async("three", None, CONTEXT)  # evicts "two"
+        assert (await GeminiService.generate_soap_note_async("one", None, CONTEXT))["cache_hit"] is True
+        assert (await GeminiService.generate_soap_note_async("two", None, CONTEXT))["cache_hit"] is False
+
+    with Session(cache_db) as session:
+        assert len(session.exec(select(SoapCacheEntry)).all()) == 2
+
+
+@pytest.mark.asyncio
+async def test_evicts_to_byte_budget(cache_db):
+    entry_bytes = len(json.dumps(SOAP_RESPONSE))
+    generate = AsyncMock(return_value=SOAP_RESPONSE)
+    with patch.object(GeminiService, "_generate_async", generate), \
+         patch.object(settings, "SOAP_CACHE_MAX_BYTES", entry_bytes * 3 + 1):
+        for text in ("one", "two", "three", "four", "five"):
+            await GeminiService.generate_soap_note_async(text, None, CONTEXT)
+        assert (await GeminiService.generate_soap_note_async("five", None, CONTEXT))["cache_hit"] is True
+        assert (await GeminiService.generate_soap_note_async("two", None, CONTEXT))["cache_hit"] is False
+
+    with Session(cache_db) as session:
+        entries = session.exec(select(SoapCacheEntry)).all()
+    assert len(entries) == 3 and sum(e.size_bytes for e in entries) <= entry_bytes * 3 + 1
+
+
+@pytest.mark.asyncio
+async def test_long_transcript_goes_map_reduce(cache_db):
+    utterances = [{"speaker": "AB"[i % 2], "text": f"Statement {i} about the symptoms."} for i in range(40)]
+    prompts = []
+    in_flight = peak = 0
+
+    async def generate(prompt, timings=None):
+        nonlocal in_flight, peak
+        prompts.append(prompt)
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        timings.append(10.0)
+        if "Findings per part" in prompt:
+            return SOAP_RESPONSE
+        return {"subjective": ["finding"], "objective": [], "assessment": [], "plan": [], "low_confidence": [], "risk_flags": []}
+
+    with patch.object(GeminiService, "_generate_async", generate), \
+         patch.object(settings, "SOAP_MAP_REDUCE_THRESHOLD_TOKENS", 100), \
+         patch.object(settings, "SOAP_SEGMENT_TOKENS", 60), \
+         patch.object(settings, "SOAP_MAP_MAX_PARALLEL", 2):
+        result = await GeminiService.generate_soap_note_async("", utterances, CONTEXT)
+        again = await GeminiService.generate_soap_note_async("", utterances, CONTEXT)
+
+    segments = result["segments"]
+    assert segments > 2 and len(prompts) == segments + 1  # map calls + one merge, then a cache hit
+    assert "Statement 0 " in prompts[0] and "Statement 39 " not in prompts[0]
+    assert "Findings per part" in prompts[-1] and prompts[-1].count('"subjective": ["finding"]') == segments
+    assert peak == 2
+    assert result["soap_note"] == SOAP_RESPONSE["soap_note"]
+    assert result["model_latency_ms"] == 20.0  # slowest segment + merge
+    assert again["cache_hit"] is True
+
+
+@pytest.mark.asyncio
+async def test_short_transcript_stays_single_shot(cache_db):
+    generate = AsyncMock(return_value=SOAP_RESPONSE)
+    with patch.object(GeminiService, "_generate_async", generate):
+        result = await GeminiService.generate_soap_note_async("", UTTERANCES, CONTEXT)
+    assert result["segments"] == 1 and generate.await_count == 1
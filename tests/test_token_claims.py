@@ -0,0 +1,39 @@
+from uuid import uuid4
+
+from sqlmodel import Session
+
+from app.core.db import engine
+from app.models.base import User
+
+
+def _signup_and_login(client, role):
+    email = f"claims_{uuid4().hex[:8]}@example.com"
+    r = client.post("/api/v1/auth/signup", json={
+        "email": email, "password": "pw123456", "role": role, "first_name": "Tok", "last_name": "En",
+    })
+    assert r.status_code == 200, r.text
+    user_id = r.json()["user_id"]
+    r = client.post("/api/v1/auth/login", data={"username": email, "password": "pw123456"})
+    return user_id, {"Authorization": f"Bearer {r.json()['access_token']}"}
+
+
+def test_role_gate_uses_token_claims(client):
+    _, patient = _signup_and_login(client, "PATIENT")
+    _, front_desk = _signup_and_login(client, "FRONT_DESK")
+    assert client.get("/api/v1/admin/triage_queue", headers=patient).status_code == 403
+    assert client.get("/api/v1/admin/triage_queue", headers=front_desk).status_code == 200
+
+
+def test_token_version_bump_revokes_tokens(client):
+    user_id, headers = _signup_and_login(client, "PATIENT")
+    assert client.get("/api/v1/appointments/me", headers=headers).status_code == 200
+
+    with Session(engine) as session:
+        user = session.get(User, user_id)
+        user.token_version += 1
+        session.add(user)
+        session.commit()
+
+    r = client.get("/api/v1/appointments/me", headers=headers)
+    assert r.status_code == 401 and r.json()["detail"] == "Token has been revoked"
+    assert client.get("/api/v1/auth/me", headers=headers).status_code == 401
@@ -0,0 +1,59 @@
+import os
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+import pytest
+from sqlmodel import Session
+
+from app.core.config import settings
+from app.models.base import TranscriptCacheEntry
+from app.services import stt_service
+from app.services.audio_preprocess import AudioPreprocessService
+from app.services.transcript_cache import config_fingerprint, sha256_file
+
+
+@pytest.fixture
+def cache_db(throwaway_db):
+    return throwaway_db("app.services.transcript_cache")
+
+
+def _fake_aai():
+    transcript = SimpleNamespace(
+        status="completed", error=None, text="Hello doctor.", confidence=0.93, id="tr_1",
+        utterances=[SimpleNamespace(speaker="A", text="Hello doctor.", start=0, end=900)],
+    )
+    transcriber = MagicMock()
+    transcriber.transcribe.return_value = transcript
+    aai = MagicMock()
+    aai.Transcriber.return_value = transcriber
+    aai.TranscriptStatus.error = "error"
+    return aai, transcriber
+
+
+@pytest.mark.asyncio
+async def test_identical_audio_is_transcribed_once(cache_db, tmp_path):
+    audio = tmp_path / "visit.wav"
+    audio.write_bytes(b"RIFF" + os.urandom(4096))
+    aai, transcriber = _fake_aai()
+
+    with patch.object(stt_service, "get_aai", return_value=aai), \
+         patch.object(settings, "ASSEMBLYAI_ASYNC_CLIENT", False):
+        first = await stt_service.AssemblyAIService.transcribe_audio_async(str(audio))
+        second = await stt_service.AssemblyAIService.transcribe_audio_async(str(audio), first["content_sha256"])
+
+    assert transcriber.transcribe.call_count == 1
+    assert first["cache_hit"] is False and second["cache_hit"] is True
+    assert first["content_sha256"] == sha256_file(str(audio))
+    assert second["text"] == "Hello doctor."
+    assert second["utterances"] == [{"speaker": "A", "text": "Hello doctor.", "start": 0, "end": 900}]
+
+    with Session(cache_db) as session:
+        entry = session.get(TranscriptCacheEntry, (first["content_sha256"], stt_service.TRANSCRIPTION_FINGERPRINT))
+        assert entry.hit_count == 1
+
+
+def test_fingerprint_tracks_transcription_params():
+    params = {**stt_service.TRANSCRIPTION_PARAMS, "audio": AudioPreprocessService.profile()}
+    assert config_fingerprint("assemblyai", params) == stt_service.TRANSCRIPTION_FINGERPRINT
+    params["word_boost"] = params["word_boost"] + ["Lamotrigine"]
+    assert config_fingerprint("assemblyai", params) != stt_service.TRANSCRIPTION_FINGERPRINT
@@ -0,0 +1,57 @@
+from app.services.transcript_compaction import clean_text, compact_transcript, estimate_tokens
+
+UTTERANCES = [
+    {"speaker": "A", "text": "Um, so, uh, what brings you in today?"},
+    {"speaker": "A", "text": "Um, so, uh, what brings you in today?"},
+    {"speaker": "B", "text": "I I I have had, um, headaches. My name is #### ######."},
+    {"speaker": "B", "text": "Uh."},
+    {"speaker": "B", "text": "Mm-hmm, every morning."},
+]
+
+
+def test_cleaning_keeps_meaningful_words():
+    assert clean_text("Um, so, uh, what brings you in today?") == "so what brings you in today?"
+    assert clean_text("Uh.") == ""
+    assert clean_text("The umbrella, er, hurts. Mm-hmm.") == "The umbrella hurts. Mm-hmm."
+    assert clean_text("Call #### ### at ###-####, please") == "Call [REDACTED] at [REDACTED], please"
+    assert clean_text("I I, I had had it") == "I had had it"
+
+
+def test_merges_turns_and_counts_tokens():
+    compacted = compact_transcript("", UTTERANCES, budget=0)
+    assert compacted.text == (
+        "Speaker A: so what brings you in today?\n"
+        "Speaker B: I have had headaches. My name is [REDACTED]. Mm-hmm, every morning."
+    )
+    assert compacted.tokens_after == estimate_tokens(compacted.text)
+    assert compacted.tokens_before > compacted.tokens_after
+
+
+def test_budget_drops_middle_turns_but_keeps_each_speakers_first_and_last():
+    utterances = [{"speaker": "AB"[i % 2], "text": f"Turn number {i} " + " ".join(f"word{j}" for j in range(20))} for i in range(20)]
+    compacted = compact_transcript("", utterances, budget=200)
+    lines = compacted.text.split("\n")
+
+    assert compacted.tokens_after <= 200
+    assert lines[0].startswith("Speaker A: Turn number 0 ") and lines[1].startswith("Speaker B: Turn number 1 ")
+    assert lines[-1].startswith("Speaker B: Turn number 19 ") and lines[-2].startswith("Speaker A: Turn number 18 ")
+    assert compacted.omitted_turns == 20 - (len(lines) - 1)
+    assert lines[2] == f"[... {compacted.omitted_turns} turns omitted ...]"
+
+
+def test_same_input_same_output():
+    assert compact_transcript("", UTTERANCES) == compact_transcript("", UTTERANCES)
+
+
+def test_clinical_content_survives():
+    assert clean_text("She was taken to the ER last night.") == "She was taken to the ER last night."
+    assert clean_text("UM is the abbreviation. Er, it hurts.") == "UM is the abbreviation. it hurts."
+    assert clean_text("BP was 120 over 80, 80 is fine.") == "BP was 120 over 80, 80 is fine."
+    assert clean_text("Take 10 10 mg tablets") == "Take 10 10 mg tablets"
+
+    compacted = compact_transcript("", [
+        {"speaker": "A", "text": "Are you allergic to penicillin?"},
+        {"speaker": "A", "text": "in?"},
+        {"speaker": "A", "text": "in?"},
+    ], budget=0)
+    assert compacted.text == "Speaker A: Are you allergic to penicillin? in?"
@@ -0,0 +1,51 @@
+import time
+from unittest.mock import AsyncMock, patch
+from uuid import uuid4
+
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.api.deps import TokenPayload, get_current_claims
+from app.api.v1 import consultations
+from app.core.db import engine
+from app.main import app
+from app.models.base import Consultation, ProcessingJob, UserRole
+
+
+def _consultation():
+    with Session(engine) as session:
+        consultation = Consultation(appointment_id=uuid4(), patient_id=uuid4(), doctor_id=uuid4())
+        session.add(consultation)
+        session.commit()
+        return consultation.id
+
+
+def _files():
+    return {"file": ("a.wav", b"RIFF" + b"\x00" * 100, "audio/wav")}
+
+
+def test_repeat_upload_is_409_and_leaves_no_file(client, tmp_path):
+    claims = TokenPayload(sub=uuid4(), role=UserRole.DOCTOR, exp=int(time.time()) + 60)
+    app.dependency_overrides[get_current_claims] = lambda: claims
+    first_id, raced_id = _consultation(), _consultation()
+    try:
+        with patch.object(consultations, "UPLOAD_DIR", str(tmp_path)), \
+             patch.object(consultations, "notify_enqueued"):
+            assert client.post(f"/api/v1/consultations/{first_id}/upload", files=_files()).status_code == 200
+            # Rejected before anything is written
+            second = client.post(f"/api/v1/consultations/{first_id}/upload", files=_files())
+            assert second.status_code == 409, second.text
+            assert len(list(tmp_path.iterdir())) == 1
+
+            # An upload that passes the checks but loses the race on the unique indexes removes its file
+            conflict = IntegrityError("INSERT", {}, Exception("uq_processing_jobs_active_consultation"))
+            with patch.object(AsyncSession, "commit", AsyncMock(side_effect=conflict)):
+                raced = client.post(f"/api/v1/consultations/{raced_id}/upload", files=_files())
+            assert raced.status_code == 409, raced.text
+            assert len(list(tmp_path.iterdir())) == 1
+    finally:
+        app.dependency_overrides.pop(get_current_claims, None)
+
+    with Session(engine) as session:
+        assert len(session.exec(select(ProcessingJob).where(ProcessingJob.consultation_id == first_id)).all()) == 1
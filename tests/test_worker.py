@@ -0,0 +1,41 @@
+import os
+import signal
+import subprocess
+import sys
+import time
+
+
+def test_worker_pool_drains_and_exits_on_sigterm():
+    """The multi-process launcher starts its children and stops them all cleanly on SIGTERM."""
+    env = dict(os.environ, JOB_POLL_INTERVAL_SECONDS="0.2")
+    supervisor = subprocess.Popen(
+        [sys.executable, "-m", "app.worker", "--processes", "2", "--concurrency", "1"],
+        env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True,
+    )
+    time.sleep(4)
+    assert supervisor.poll() is None, supervisor.stdout.read()
+    supervisor.send_signal(signal.SIGTERM)
+    output, _ = supervisor.communicate(timeout=20)
+    assert supervisor.returncode == 0, output
+    assert output.count("started (concurrency=1)") == 2, output
+    assert output.count("stopped") >= 2 and "All workers stopped" in output, output
+
+
+def test_worker_creates_full_schema_on_empty_database(tmp_path):
+    """Booting the worker first (before the API) on an empty database creates every table, not just alembic_version."""
+    import sqlite3
+
+    db_path = tmp_path / "empty.db"
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{db_path}", DB_AUTO_CREATE_SCHEMA="true", JOB_POLL_INTERVAL_SECONDS="0.2")
+    worker = subprocess.Popen(
+        [sys.executable, "-m", "app.worker", "--processes", "1", "--concurrency", "1"],
+        env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True,
+    )
+    time.sleep(4)
+    worker.send_signal(signal.SIGTERM)
+    output, _ = worker.communicate(timeout=20)
+
+    with sqlite3.connect(db_path) as conn:
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    assert {"processing_jobs", "consultations", "ai_logs", "alembic_version"} <= tables, output
+    assert "Claiming jobs failed" not in output, output
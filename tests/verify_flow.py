@@ -10,16 +10,19 @@ os.environ["JWT_SECRET"] = "test"
 os.environ["ASSEMBLYAI_API_KEY"] = "test"
 os.environ["GOOGLE_API_KEY"] = "test"
 
+import tempfile
+from sqlalchemy.ext.asyncio import create_async_engine
 from sqlmodel import Session, create_engine, SQLModel, select
 from app.models.base import Consultation, ConsultationStatus, AudioFile, Appointment, User, UserRole, SOAPNote # Added SOAPNote
 from app.services.consultation_processor import process_consultation_flow
 
-# Setup In-Memory DB for testing
-sqlite_url = "sqlite://"
-engine = create_engine(sqlite_url)
+# Setup a throwaway file DB: the sync setup code and the async pipeline need to see the same data
+db_path = os.path.join(tempfile.mkdtemp(), "verify_flow.db")
+engine = create_engine(f"sqlite:///{db_path}")
+async_engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}")
 SQLModel.metadata.create_all(engine)
 
-@patch("app.services.consultation_processor.engine", engine)
+@patch("app.services.consultation_processor.async_engine", async_engine)
 @patch("app.services.consultation_processor.AssemblyAIService")
 @patch("app.services.consultation_processor.GeminiService")
 async def test_flow(MockGemini, MockAssemblyAI):